@@ -0,0 +1,166 @@
+"""
+Adaptive (active learning) composition sampling.
+
+Instead of the full 19*11*6 factorial grid, the sweep starts from a coarse Sobol or Latin hypercube design
+over the same composition bounds. A random forest surrogate is fitted on the calculated points and new
+compositions are chosen where the spread of its trees (the surrogate uncertainty) is largest, with a bonus
+for candidates predicted to lie on the Pareto front of the targets (HCS, GRF, SR, PSC, ...).
+"""
+import os
+import sys
+
+import numpy as np
+from scipy.stats import qmc
+from sklearn.ensemble import RandomForestRegressor
+
+from sweep_engine import GridPoint, SweepPool, run_sweep
+
+# the Pareto filter is shared with the optimization scripts of the parent directory
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pareto import non_dominated  # noqa: E402
+
+
+# bounds of the factorial grid in mass percent: Cr 10-14.5, Co 0-5, C/N 0.15-0.4
+BOUNDS = np.array([[10.0, 14.5],
+                   [0.0, 5.0],
+                   [0.15, 0.4]])
+
+
+def initial_design(n, bounds=BOUNDS, method="sobol", seed=None):
+    """
+    Space-filling design of n compositions (rows of x_Cr, x_Co, x_C_N) inside the bounds.
+
+    Args:
+        method: "sobol" (scrambled, n is best a power of two) or "lhs" (Latin hypercube)
+    """
+    bounds = np.asarray(bounds, dtype=float)
+    if method == "sobol":
+        sampler = qmc.Sobol(d=len(bounds), scramble=True, seed=seed)
+    elif method == "lhs":
+        sampler = qmc.LatinHypercube(d=len(bounds), seed=seed)
+    else:
+        raise ValueError(f"unknown design method {method}")
+    return qmc.scale(sampler.random(n), bounds[:, 0], bounds[:, 1])
+
+
+def to_points(compositions, start_index=1):
+    return [GridPoint(start_index + i, float(x_Cr), float(x_Co), float(x_C_N))
+            for i, (x_Cr, x_Co, x_C_N) in enumerate(compositions)]
+
+
+class AdaptiveSampler:
+    """
+    Proposes the next batch of compositions from the points calculated so far.
+
+    Args:
+        bounds: (3, 2) array of composition bounds
+        senses: per target +1 to minimize or -1 to maximize, used for the Pareto relevance; None disables it
+        pareto_weight: acquisition bonus of candidates predicted on the Pareto front
+        n_candidates: size of the random candidate pool scored per batch
+    """
+
+    def __init__(self, bounds=BOUNDS, senses=None, pareto_weight=1.0, n_candidates=4096, n_estimators=100,
+                 seed=None):
+        self.bounds = np.asarray(bounds, dtype=float)
+        self.senses = None if senses is None else np.asarray(senses, dtype=float)
+        self.pareto_weight = pareto_weight
+        self.n_candidates = n_candidates
+        self.random = np.random.default_rng(seed)
+        self.model = RandomForestRegressor(n_estimators=n_estimators, random_state=seed, n_jobs=-1)
+        self._scale = None
+
+    def _normalize(self, compositions):
+        return (np.asarray(compositions) - self.bounds[:, 0]) / (self.bounds[:, 1] - self.bounds[:, 0])
+
+    def fit(self, compositions, targets):
+        targets = np.asarray(targets, dtype=float).reshape(len(compositions), -1)
+        # targets span many orders of magnitude (PSC ~1e20), so the uncertainty is measured in standard deviations
+        self._scale = targets.std(axis=0)
+        self._scale[self._scale == 0] = 1.0
+        self.model.fit(self._normalize(compositions), targets / self._scale)
+        return self
+
+    def predict(self, compositions):
+        """
+        Return the mean prediction and the spread of the trees, both in units of the target standard deviation.
+        """
+        x = self._normalize(compositions)
+        per_tree = np.stack([tree.predict(x).reshape(len(x), -1) for tree in self.model.estimators_])
+        return per_tree.mean(axis=0), per_tree.std(axis=0)
+
+    def acquisition(self, candidates):
+        mean, spread = self.predict(candidates)
+        score = spread.sum(axis=1)
+        if self.senses is not None and self.pareto_weight:
+            score = score + self.pareto_weight * non_dominated(mean * self.senses)
+        return score
+
+    def propose(self, batch_size, calculated=None, min_distance=0.05):
+        """
+        Choose batch_size new compositions with the highest acquisition, keeping them at least min_distance
+        apart (in normalized composition) from each other and from the already calculated points.
+        """
+        candidates = qmc.scale(self.random.random((self.n_candidates, len(self.bounds))),
+                               self.bounds[:, 0], self.bounds[:, 1])
+        score = self.acquisition(candidates)
+        normalized = self._normalize(candidates)
+        taken = [] if calculated is None else list(self._normalize(calculated))
+        chosen = []
+        for i in np.argsort(-score):
+            if len(chosen) == batch_size:
+                break
+            if taken and np.min(np.linalg.norm(np.asarray(taken) - normalized[i], axis=1)) < min_distance:
+                continue
+            chosen.append(i)
+            taken.append(normalized[i])
+        return candidates[chosen]
+
+
+def propose_points(sampler, points, targets, batch_size, start_index, min_distance=0.05):
+    """
+    Fit the sampler on the calculated points and return the next batch as GridPoints numbered from start_index.
+    Points with a non-finite target (e.g. no precipitation) are left out of the fit.
+
+    Args:
+        points: calculated GridPoints, in the unit of the sampler bounds
+        targets: (n, k) target values of the points
+    """
+    compositions = np.array([[point.x_Cr, point.x_Co, point.x_C_N] for point in points], dtype=float)
+    targets = np.asarray(targets, dtype=float).reshape(len(points), -1)
+    finite = np.all(np.isfinite(targets), axis=1)
+    if not finite.any():
+        raise ValueError("no calculated point has finite targets, the surrogate cannot be fitted")
+    sampler.fit(compositions[finite], targets[finite])
+    return to_points(sampler.propose(batch_size, compositions, min_distance), start_index)
+
+
+def adaptive_sweep(session, targets, n_initial=64, batch_size=32, max_points=400, method="sobol", senses=None,
+                   bounds=BOUNDS, processes=None, seed=None):
+    """
+    Run an adaptive sweep: calculate an initial design, then repeatedly fit the surrogate and calculate the
+    proposed batch until max_points compositions are done. Campaigns run the same rounds from their spec, see
+    the [adaptive] section of sweep_campaign.py.
+
+    Args:
+        session: calculator session of the sweep engine, points are in mass percent like the factorial grid
+        targets: function(result) -> list of target values (e.g. HCS, GRF, SR, PSC) of one point
+    Returns:
+        list of (GridPoint, result) of every calculated composition, and the fitted sampler
+    """
+    sampler = AdaptiveSampler(bounds, senses=senses, seed=seed)
+    points = to_points(initial_design(n_initial, bounds, method, seed))
+    calculated = []
+    # the workers (and their TC-Python sessions) are started once for all the rounds
+    with SweepPool(session, processes) as pool:
+        while True:
+            results = dict(run_sweep(points, session, pool=pool))
+            calculated.extend((point, results[point.index]) for point in points)
+            print(f"Adaptive sweep: {len(calculated)} of at most {max_points} points calculated")
+            if len(calculated) >= max_points:
+                break
+            points = propose_points(sampler, [point for point, _ in calculated],
+                                    [targets(result) for _, result in calculated],
+                                    min(batch_size, max_points - len(calculated)), len(calculated) + 1)
+            if not points:
+                break
+    return calculated, sampler
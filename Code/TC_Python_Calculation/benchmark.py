@@ -0,0 +1,311 @@
+"""
+Benchmark suite of the sweep machinery on the deterministic fake TC-Python backend (fake_tc_python.py).
+
+    sweep_<script>      the real configure/evaluate of pyex_01..04 over a slice of the grid, with the configured
+                        solver latency, through TCPythonSession and the process pool
+    io_<store>          result cache, checkpoint, curve store and result store writes/reads of synthetic results
+    metrics_<kind>      Scheil (HCS/GRF/SR) and kinetics metrics over batches of synthetic curves
+    surrogate_<step>    training and batched prediction of the surrogate models on ALL_data.csv
+    startup_<script>    a fresh interpreter importing the script, what a spawned worker or a job array task
+                        pays before its session starts
+
+Every benchmark is the best of `repeat` runs in seconds. The results of one run are saved as JSON together with
+the git commit, and two such files can be compared to report regressions:
+
+    python benchmark.py run --output benchmark_new.json
+    python benchmark.py compare benchmark_base.json benchmark_new.json --tolerance 0.1
+"""
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import fake_tc_python
+
+fake_tc_python.install()
+
+from checkpoint import SweepCheckpoint
+from curve_store import CurveStore
+from kinetics_metrics import kinetics_metrics
+from result_cache import ResultCache, cache_key, point_composition
+from result_store import ResultStore, family_table
+from scheil_metrics import scheil_metrics
+from sweep_engine import FunctionSession, TCPythonSession, default_grid, run_sweep
+
+
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS = {"equilibrium": "pyex_01_Single_equilibrium_Fe_Cr_Co_C_N.py",
+           "precipitation_M23C6": "pyex_02_Precipitation_Fe_Cr_Co_C_N_cementite-M7C3-M23C6.py",
+           "scheil": "pyex_03_Scheil_mole_fraction_of_solid_Fe_Cr_Co_C_N.py",
+           "precipitation_HCP_A3": "pyex_04_Precipitation_Fe_Cr_Co_C_N_HCP_A3#2.py"}
+# scale of default_grid for the composition unit of a script's settings
+GRID_SCALES = {"mass_percent": 100, "mass_fraction": 1}
+
+
+def load_script(name):
+    """
+    Import one of the sweep scripts (its main block does not run) under the module name "bench_<name>",
+    registered in sys.modules so its functions can be sent to the worker processes.
+    """
+    module_name = f"bench_{name}"
+    if module_name not in sys.modules:
+        spec = importlib.util.spec_from_file_location(module_name, os.path.join(DIRECTORY, SCRIPTS[name]))
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[module_name] = module
+        spec.loader.exec_module(module)
+    return sys.modules[module_name]
+
+
+def measure(function, repeat=3):
+    """
+    Best wall time of `repeat` calls of function() [s].
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=DIRECTORY, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# ---- synthetic results ------#
+def _precipitation_curves(points):
+    calculation = fake_tc_python.PrecipitationCalculation([]).with_matrix_phase(
+        fake_tc_python.MatrixPhase("BCC_A2").add_precipitate_phase(fake_tc_python.PrecipitatePhase("M23C6")))
+    curves = []
+    for point in points:
+        result = (calculation.set_composition("Cr", point.x_Cr).set_composition("Co", point.x_Co)
+                  .set_composition("C", point.x_C_N).set_composition("N", point.x_C_N).calculate())
+        curves.append(result.get_number_density_of("M23C6"))
+    return curves
+
+
+def _scheil_curves(points):
+    calculation = fake_tc_python.ScheilCalculation([])
+    curves = []
+    for point in points:
+        result = (calculation.set_composition("Cr", point.x_Cr).set_composition("Co", point.x_Co)
+                  .set_composition("C", point.x_C_N).set_composition("N", point.x_C_N).calculate())
+        sections = result.get_values_grouped_by_stable_phases_of("NS", "T")
+        curves.append({label: (sections[label].x, sections[label].y) for label in sections})
+    return curves
+
+
+def grid_unit(points):
+    """
+    Composition unit of default_grid points: the grid has 10-14.5 wt% Cr.
+    """
+    return "mass_percent" if max(point.x_Cr for point in points) > 1 else "mass_fraction"
+
+
+def script_points(module, n_points):
+    """
+    The first n_points of the default grid in the composition unit of a script's settings.
+    """
+    unit = module.settings["composition_unit"].lower()
+    if unit not in GRID_SCALES:
+        raise ValueError(f"{module.__name__}: no default grid in {unit}")
+    points = default_grid(scale=GRID_SCALES[unit])[:n_points]
+    assert grid_unit(points) == unit, f"{module.__name__} calculates in {unit}, the grid is in {grid_unit(points)}"
+    return points
+
+
+# ---- benchmarks ------#
+def bench_sweeps(n_points, processes, latency, repeat):
+    fake_tc_python.set_latency(**latency)
+    timings = {}
+    for name in SCRIPTS:
+        module = load_script(name)
+        points = script_points(module, n_points)
+        session = TCPythonSession(module.configure, module.evaluate)
+        timings[f"sweep_{name}"] = measure(lambda: run_sweep(points, session, processes), repeat)
+    # the pool and chunking overhead alone
+    points = default_grid()[:n_points]
+    timings["sweep_overhead"] = measure(lambda: run_sweep(points, FunctionSession(_identity), processes), repeat)
+    return timings
+
+
+def _identity(point):
+    return point.index
+
+
+def bench_io(n_points, repeat):
+    points = default_grid()[:n_points]
+    curves = _precipitation_curves(points)
+    results = [(point.index, curve) for point, curve in zip(points, curves)]
+    settings = {"benchmark": "io"}
+    timings = {}
+    with tempfile.TemporaryDirectory() as directory:
+        def cache():
+            path = os.path.join(directory, "cache.sqlite")
+            if os.path.exists(path):
+                os.remove(path)
+            with ResultCache(path) as result_cache:
+                keys = [cache_key(settings, point_composition(point)) for point in points]
+                for key, curve in zip(keys, curves):
+                    result_cache.put(key, curve)
+                for key in keys:
+                    result_cache.get(key)
+
+        def checkpoint():
+            path = os.path.join(directory, "checkpoint.sqlite")
+            if os.path.exists(path):
+                os.remove(path)
+            with SweepCheckpoint(path) as sweep_checkpoint:
+                for index, curve in results:
+                    sweep_checkpoint.add(index, curve)
+                sweep_checkpoint.results()
+
+        def curve_store():
+            path = os.path.join(directory, "curves.h5")
+            if os.path.exists(path):
+                os.remove(path)
+            with CurveStore(path) as store:
+                for index, (time_1, number_density) in results:
+                    store.write(index, {"time": time_1, "number_density": number_density})
+
+        def result_store():
+            store = ResultStore(os.path.join(directory, "result_store"))
+            store.write_family("benchmark", family_table(
+                [point.index for point in points], [point.x_Cr for point in points], [point.x_Co for point in points],
+                [point.x_C_N for point in points], {"final": [curve[1][-1] for curve in curves]}))
+            store.read_family("benchmark")
+
+        for name, function in [("cache", cache), ("checkpoint", checkpoint), ("curve_store", curve_store),
+                               ("result_store", result_store)]:
+            timings[f"io_{name}"] = measure(function, repeat)
+    return timings
+
+
+def bench_metrics(n_curves, repeat):
+    points = default_grid()
+    points = [points[i % len(points)] for i in range(n_curves)]
+    scheil_curves = _scheil_curves(points)
+    precipitation_curves = _precipitation_curves(points)
+    times = [curve[0] for curve in precipitation_curves]
+    densities = [curve[1] for curve in precipitation_curves]
+    return {"metrics_scheil": measure(lambda: scheil_metrics(scheil_curves, decimals=4), repeat),
+            "metrics_kinetics": measure(lambda: kinetics_metrics(times, densities), repeat)}
+
+
+def bench_surrogates(n_predictions, repeat):
+    sys.path.insert(0, os.path.dirname(DIRECTORY))
+    from surrogate import FEATURES, load_data, train_surrogates
+
+    data = load_data()
+    bundle = {}
+
+    def train():
+        bundle.update(train_surrogates(data, models=("DT", "KNN", "RF"), targets=("HCS", "GRF")))
+
+    timings = {"surrogate_training": measure(train, repeat)}
+    compositions = np.random.default_rng(0).uniform(data[FEATURES].min().to_numpy(), data[FEATURES].max().to_numpy(),
+                                                    (n_predictions, len(FEATURES)))
+    x_scaled = (compositions - bundle["mean"]) / bundle["scale"]
+    timings["surrogate_predict_RF"] = measure(lambda: bundle["models"][("RF", "HCS")].predict(x_scaled), repeat)
+    return timings
+
+
+def bench_startup(repeat):
+    timings = {}
+    for name, script in SCRIPTS.items():
+        code = ("import importlib.util, fake_tc_python; fake_tc_python.install(); "
+                f"spec = importlib.util.spec_from_file_location('bench_{name}', {script!r}); "
+                "spec.loader.exec_module(importlib.util.module_from_spec(spec))")
+        timings[f"startup_{name}"] = measure(
+            lambda: subprocess.run([sys.executable, "-c", code], cwd=DIRECTORY, check=True), repeat)
+    return timings
+
+
+def run_benchmarks(n_points=120, processes=2, latency=None, n_curves=5000, n_predictions=100000, repeat=3,
+                   surrogates=True):
+    """
+    Run every benchmark and return {"commit", "timestamp", "parameters", "timings"}.
+    """
+    if latency is None:
+        latency = {"startup": 0.0, "single_equilibrium": 0.001, "scheil": 0.001, "precipitation": 0.001}
+    timings = {}
+    timings.update(bench_sweeps(n_points, processes, latency, repeat))
+    timings.update(bench_io(n_points * 10, repeat))
+    timings.update(bench_metrics(n_curves, repeat))
+    timings.update(bench_startup(repeat))
+    if surrogates:
+        timings.update(bench_surrogates(n_predictions, repeat))
+    return {"commit": git_commit(), "timestamp": time.time(),
+            "parameters": {"n_points": n_points, "processes": processes, "latency": latency, "n_curves": n_curves,
+                           "n_predictions": n_predictions, "repeat": repeat},
+            "timings": timings}
+
+
+def compare(baseline, current, tolerance=0.1):
+    """
+    Compare the timings of two runs. Returns a list of (name, baseline [s], current [s], ratio, regressed),
+    a benchmark regressed when it is more than `tolerance` slower.
+    """
+    rows = []
+    for name in sorted(set(baseline["timings"]) | set(current["timings"])):
+        before, after = baseline["timings"].get(name), current["timings"].get(name)
+        ratio = after / before if before and after is not None else None
+        rows.append((name, before, after, ratio, ratio is not None and ratio > 1 + tolerance))
+    return rows
+
+
+def report(rows, baseline_commit=None, current_commit=None):
+    lines = [f"{'benchmark':<28}{str(baseline_commit):>12}{str(current_commit):>12}{'ratio':>8}"]
+    for name, before, after, ratio, regressed in rows:
+        columns = [f"{value:12.4f}" if value is not None else f"{'-':>12}" for value in (before, after)]
+        ratio_text = f"{ratio:8.2f}" if ratio is not None else f"{'-':>8}"
+        lines.append(f"{name:<28}" + "".join(columns) + ratio_text + ("  REGRESSION" if regressed else ""))
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmarks on the fake TC-Python backend")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run_parser = subparsers.add_parser("run", help="run the benchmarks and save the timings")
+    run_parser.add_argument("--output", default=None, help="JSON file, benchmark_<commit>.json by default")
+    run_parser.add_argument("--points", type=int, default=120, help="grid points per sweep benchmark")
+    run_parser.add_argument("--processes", type=int, default=2)
+    run_parser.add_argument("--latency", type=float, default=0.001, help="fake solver latency per point [s]")
+    run_parser.add_argument("--startup", type=float, default=0.0, help="fake TC-Python startup latency [s]")
+    run_parser.add_argument("--curves", type=int, default=5000, help="curves per metric benchmark")
+    run_parser.add_argument("--repeat", type=int, default=3)
+    run_parser.add_argument("--no-surrogates", action="store_true", help="skip the surrogate benchmarks")
+    compare_parser = subparsers.add_parser("compare", help="compare two saved runs")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--tolerance", type=float, default=0.1, help="allowed slowdown, 0.1 = 10 %%")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        latency = {"startup": args.startup, "single_equilibrium": args.latency, "scheil": args.latency,
+                   "precipitation": args.latency}
+        result = run_benchmarks(args.points, args.processes, latency, args.curves, repeat=args.repeat,
+                                surrogates=not args.no_surrogates)
+        output = args.output or f"benchmark_{result['commit']}.json"
+        with open(output, mode="w") as output_file:
+            json.dump(result, output_file, indent=2)
+        for name, seconds in result["timings"].items():
+            print(f"{name:<28}{seconds:12.4f} s")
+    else:
+        with open(args.baseline) as baseline_file, open(args.current) as current_file:
+            baseline, current = json.load(baseline_file), json.load(current_file)
+        rows = compare(baseline, current, args.tolerance)
+        print(report(rows, baseline["commit"], current["commit"]))
+        sys.exit(1 if any(row[4] for row in rows) else 0)
@@ -0,0 +1,147 @@
+"""
+Resumable, checkpointed sweeps.
+
+Completed points are written to a SQLite checkpoint keyed by grid index, in batches. When a sweep is
+restarted with the same checkpoint file only the missing indices are calculated again, and because the
+index is the primary key a point can never be stored twice.
+
+A checkpoint only answers the sweep it was written for: it stores the fingerprint of the sweep (hash of the
+calculation settings and of the index, composition and temperature of every point), and a checkpoint with
+another fingerprint is discarded when it is opened. With a result cache the points calculated before are then
+answered from the cache instead of the solver.
+"""
+import pickle
+import sqlite3
+
+from result_cache import settings_hash
+from sweep_engine import iter_sweep
+
+
+def checkpoint_fingerprint(points, settings=None, decimals=9):
+    """
+    Fingerprint of a sweep: hash of the settings (see result_cache.settings_hash) and of the index, composition
+    and temperature of every point, whatever the visiting order.
+    """
+    rows = sorted([int(point.index), round(float(point.x_Cr), decimals), round(float(point.x_Co), decimals),
+                   round(float(point.x_C_N), decimals), getattr(point, "temperature", None)] for point in points)
+    return settings_hash({"settings": None if settings is None else settings_hash(settings), "points": rows})
+
+
+class SweepCheckpoint:
+    """
+    Grid index -> result store of one sweep.
+
+    Args:
+        path: SQLite checkpoint file
+        batch_size: number of completed points buffered before they are committed
+        fingerprint: checkpoint_fingerprint of the sweep, stored points of another sweep are discarded on open
+    """
+
+    def __init__(self, path, batch_size=50, fingerprint=None):
+        self.path = path
+        self.batch_size = batch_size
+        self.fingerprint = fingerprint
+        self.discarded = 0
+        self._pending = []
+        self._connection = None
+
+    def open(self):
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, timeout=60)
+            self._connection.execute("CREATE TABLE IF NOT EXISTS points (point_index INTEGER PRIMARY KEY, value BLOB NOT NULL)")
+            self._connection.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            if self.fingerprint is not None:
+                self._check_fingerprint()
+            self._connection.commit()
+        return self
+
+    def _check_fingerprint(self):
+        row = self._connection.execute("SELECT value FROM meta WHERE name = 'fingerprint'").fetchone()
+        if row is not None and row[0] == self.fingerprint:
+            return
+        # written for another grid or other settings (or before checkpoints had a fingerprint)
+        self.discarded = self._connection.execute("SELECT COUNT(*) FROM points").fetchone()[0]
+        if self.discarded:
+            print(f"Checkpoint {self.path} belongs to another sweep (grid or settings changed), "
+                  f"discarding its {self.discarded} points")
+            self._connection.execute("DELETE FROM points")
+        self._connection.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('fingerprint', ?)",
+                                 (self.fingerprint,))
+
+    def close(self):
+        if self._connection is not None:
+            self.flush()
+            self._connection.close()
+            self._connection = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # also flushes on an exception, so everything that was calculated survives a crash
+        self.close()
+        return False
+
+    def completed_indices(self):
+        self.flush()
+        return {row[0] for row in self._connection.execute("SELECT point_index FROM points")}
+
+    def first_missing_index(self, indices):
+        """
+        First index of `indices` (in sweep order) that is not in the checkpoint, None when all are done.
+        """
+        completed = self.completed_indices()
+        for index in indices:
+            if index not in completed:
+                return index
+        return None
+
+    def add(self, index, result):
+        self._pending.append((int(index), pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self._pending:
+            self._connection.executemany("INSERT OR REPLACE INTO points (point_index, value) VALUES (?, ?)", self._pending)
+            self._connection.commit()
+            self._pending = []
+
+    def get(self, index):
+        self.flush()
+        row = self._connection.execute("SELECT value FROM points WHERE point_index = ?", (int(index),)).fetchone()
+        if row is None:
+            raise KeyError(index)
+        return pickle.loads(row[0])
+
+    def results(self, indices=None):
+        """
+        Return the stored (index, result) pairs sorted by index, optionally restricted to `indices`.
+        """
+        self.flush()
+        rows = self._connection.execute("SELECT point_index, value FROM points ORDER BY point_index")
+        if indices is not None:
+            indices = set(indices)
+            return [(index, pickle.loads(value)) for index, value in rows if index in indices]
+        return [(index, pickle.loads(value)) for index, value in rows]
+
+
+def run_checkpointed_sweep(points, session, path, processes=None, chunk_size=None, batch_size=50, settings=None):
+    """
+    Like sweep_engine.run_sweep, but every completed point is stored in the checkpoint at `path` and
+    points already in the checkpoint are not calculated again. settings (e.g. the result cache settings) are
+    part of the checkpoint fingerprint.
+
+    Returns the list of (index, result) of all the points, sorted by index.
+    """
+    points = list(points)
+    with SweepCheckpoint(path, batch_size, checkpoint_fingerprint(points, settings)) as checkpoint:
+        completed = checkpoint.completed_indices()
+        remaining = [point for point in points if point.index not in completed]
+        if remaining and len(remaining) < len(points):
+            first = checkpoint.first_missing_index(point.index for point in points)
+            print(f"Resuming from index {first}: {len(points) - len(remaining)} of {len(points)} points already done")
+        for chunk_result in iter_sweep(remaining, session, processes, chunk_size):
+            for index, result in chunk_result:
+                checkpoint.add(index, result)
+        return checkpoint.results(point.index for point in points)
@@ -0,0 +1,197 @@
+"""
+Spatial index over the calculated compositions, for off-grid lookups without TC-Python.
+
+    CompositionIndex      KD-tree over scattered compositions: batched nearest neighbours and radius searches
+    LatticeInterpolator   trilinear interpolation on the regular composition lattice (19*11*6 for default_grid)
+
+Distances are measured on scaled coordinates, (composition / scale), so elements with very different
+ranges (Cr ~ 0.1, C ~ 0.002) count alike. With p=inf and scale set to a per-element tolerance, "distance <= 1"
+means "every element within its tolerance", which is the "close enough" check of CachedSession.
+
+Both are saved as .npz files, the KD-tree is rebuilt on load (milliseconds for the full grid).
+"""
+import numpy as np
+from scipy.interpolate import RegularGridInterpolator
+from scipy.spatial import cKDTree
+
+
+ELEMENTS = ["Cr", "Co", "C"]
+
+
+def composition_array(compositions, elements=ELEMENTS):
+    """
+    (n, d) float array from an array or from a list of composition dictionaries (see point_composition).
+    """
+    if len(compositions) and isinstance(compositions[0], dict):
+        return np.array([[composition[element] for element in elements] for composition in compositions],
+                        dtype=np.float64)
+    return np.asarray(compositions, dtype=np.float64).reshape(-1, len(elements))
+
+
+class CompositionIndex:
+    """
+    KD-tree over compositions with optional values per composition.
+
+    Args:
+        compositions: (n, d) array or list of composition dictionaries
+        values: optional (n, ...) array returned along with the neighbours
+        scale: per-element divisor of the coordinates, the range of the compositions by default
+        elements: element of every column
+        p: Minkowski norm of the distance, np.inf for per-element tolerances
+    """
+
+    def __init__(self, compositions, values=None, scale=None, elements=ELEMENTS, p=2):
+        self.elements = list(elements)
+        self.compositions = composition_array(compositions, self.elements)
+        self.values = None if values is None else np.asarray(values)
+        if scale is None:
+            scale = np.ptp(self.compositions, axis=0) if len(self.compositions) else np.ones(len(self.elements))
+        elif isinstance(scale, dict):
+            scale = [scale[element] for element in self.elements]
+        scale = np.asarray(scale, dtype=np.float64)
+        self.scale = np.where(scale > 0, scale, 1.0)
+        self.p = p
+        self.tree = cKDTree(self.compositions / self.scale)
+
+    def __len__(self):
+        return len(self.compositions)
+
+    def _queries(self, queries):
+        return composition_array(queries, self.elements) / self.scale
+
+    def nearest(self, queries, k=1, max_distance=np.inf):
+        """
+        The k nearest compositions of every query.
+
+        Returns (distances, positions), (n,) arrays for k=1 and (n, k) otherwise. Missing neighbours (fewer
+        than k compositions or farther than max_distance) have distance inf and position len(self).
+        """
+        if not len(self):
+            shape = (len(composition_array(queries, self.elements)),) + ((k,) if k > 1 else ())
+            return np.full(shape, np.inf), np.zeros(shape, dtype=np.int64)
+        return self.tree.query(self._queries(queries), k=k, p=self.p, distance_upper_bound=max_distance)
+
+    def within(self, queries, radius):
+        """
+        Positions of all compositions within radius of every query, a list of sorted integer arrays.
+        """
+        if not len(self):
+            return [np.zeros(0, dtype=np.int64) for _ in composition_array(queries, self.elements)]
+        return [np.array(sorted(positions), dtype=np.int64)
+                for positions in self.tree.query_ball_point(self._queries(queries), radius, p=self.p)]
+
+    def save(self, path):
+        arrays = {"compositions": self.compositions, "scale": self.scale, "elements": np.array(self.elements),
+                  "p": np.array(self.p, dtype=np.float64)}
+        if self.values is not None:
+            arrays["values"] = self.values
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as arrays:
+            return cls(arrays["compositions"], arrays["values"] if "values" in arrays else None, arrays["scale"],
+                       [str(element) for element in arrays["elements"]], float(arrays["p"]))
+
+
+class LatticeInterpolator:
+    """
+    Trilinear interpolation of values on a regular composition lattice. Queries outside the lattice are
+    clamped to it, like surrogate.trilinear.
+
+    Args:
+        axes: the sorted levels of every element, e.g. the 19 Cr, 11 Co and 6 C/N levels of default_grid
+        values: (len(axes[0]), len(axes[1]), len(axes[2]), ...) array
+    """
+
+    def __init__(self, axes, values, elements=ELEMENTS):
+        self.axes = [np.asarray(axis, dtype=np.float64) for axis in axes]
+        self.values = np.asarray(values, dtype=np.float64)
+        self.elements = list(elements)
+        self._lower = np.array([axis[0] for axis in self.axes])
+        self._upper = np.array([axis[-1] for axis in self.axes])
+        self._interpolator = RegularGridInterpolator(self.axes, self.values, method="linear")
+
+    @classmethod
+    def from_points(cls, compositions, values, elements=ELEMENTS, decimals=9):
+        """
+        Lattice from scattered rows (e.g. the grid points of a sweep in any order). Raises a ValueError when
+        the compositions do not fill a complete lattice.
+        """
+        compositions = composition_array(compositions, elements)
+        values = np.asarray(values, dtype=np.float64)
+        rounded = np.round(compositions, decimals)
+        axes = [np.unique(rounded[:, column]) for column in range(rounded.shape[1])]
+        shape = tuple(len(axis) for axis in axes)
+        if len(rounded) != np.prod(shape):
+            raise ValueError(f"{len(rounded)} compositions do not fill a {'x'.join(map(str, shape))} lattice")
+        positions = tuple(np.searchsorted(axis, rounded[:, column]) for column, axis in enumerate(axes))
+        table = np.full(shape + values.shape[1:], np.nan)
+        filled = np.zeros(shape, dtype=bool)
+        table[positions] = values
+        filled[positions] = True
+        if not filled.all():
+            raise ValueError("duplicate compositions, the lattice is incomplete")
+        return cls(axes, table, elements)
+
+    def __call__(self, queries):
+        """
+        Interpolated values at the queries, an (n, ...) array.
+        """
+        queries = np.clip(composition_array(queries, self.elements), self._lower, self._upper)
+        return self._interpolator(queries)
+
+    def save(self, path):
+        arrays = {f"axis_{column}": axis for column, axis in enumerate(self.axes)}
+        np.savez(path, values=self.values, elements=np.array(self.elements), **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as arrays:
+            elements = [str(element) for element in arrays["elements"]]
+            return cls([arrays[f"axis_{column}"] for column in range(len(elements))], arrays["values"], elements)
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from result_store import ResultStore
+
+    parser = argparse.ArgumentParser(description="Build and query the composition index of a result store family")
+    parser.add_argument("store", help="result store directory")
+    parser.add_argument("family", help="column family to index")
+    parser.add_argument("--columns", nargs="+", default=None, help="value columns, all of the family by default")
+    parser.add_argument("--query", nargs=3, type=float, action="append", metavar=("CR", "CO", "C"),
+                        help="composition in mass fraction, repeatable")
+    parser.add_argument("--radius", type=float, default=None, help="also list the compositions within this "
+                        "scaled radius")
+    parser.add_argument("--output", default=None, help="save the index (and the lattice, when complete) here")
+    args = parser.parse_args()
+
+    table = ResultStore(args.store).read_family(args.family).to_pandas()
+    columns = args.columns or [column for column in table.columns if column not in ["Index"] + ELEMENTS]
+    index = CompositionIndex(table[ELEMENTS].to_numpy(), table[columns].to_numpy())
+    try:
+        lattice = LatticeInterpolator.from_points(table[ELEMENTS].to_numpy(), table[columns].to_numpy())
+    except ValueError as error:
+        lattice = None
+        print(f"no lattice interpolation: {error}")
+    if args.output:
+        index.save(args.output + "_index.npz")
+        if lattice is not None:
+            lattice.save(args.output + "_lattice.npz")
+    if args.query:
+        start = time.perf_counter()
+        distances, positions = index.nearest(args.query)
+        interpolated = lattice(args.query) if lattice is not None else None
+        print(f"{len(args.query)} queries in {1e3 * (time.perf_counter() - start):.3f} ms")
+        for row, query in enumerate(args.query):
+            print(f"{query}: nearest Index {int(table['Index'].iloc[positions[row]])} at {distances[row]:.4f}")
+            for column, value in zip(columns, index.values[positions[row]]):
+                line = f"    {column:<28}{value:14.6g}"
+                if interpolated is not None:
+                    line += f"{interpolated[row][columns.index(column)]:14.6g} (trilinear)"
+                print(line)
+            if args.radius is not None:
+                print(f"    within {args.radius}: Index {list(table['Index'].iloc[index.within([query], args.radius)[0]])}")
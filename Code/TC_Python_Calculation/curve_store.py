@@ -0,0 +1,230 @@
+"""
+Chunked, compressed storage of the raw curves of every grid point (Scheil sections, number density vs.
+time, ...) in one HDF5 file, indexed by grid index.
+
+Every quantity is kept as one flat, extendable, gzip compressed dataset plus the start and length of
+every row, so curves of different lengths are stored without padding. Plotting becomes an optional step
+that reads the curves back on demand instead of saving a figure for every point during the sweep.
+
+The sweeps stream every point (also the ones resumed from the checkpoint) into the store, so they open it
+with mode="w" and rewrite it on every run. A store extended with mode="a" keeps the replaced rows until it
+is compacted:
+
+    python curve_store.py pyex_02_..._curves.h5 --compact
+"""
+import os
+
+import h5py
+import numpy as np
+
+
+def flatten_sections(sections):
+    """
+    Turn {label: (x, y)} (e.g. Scheil sections grouped by stable phases) into flat curves and one label.
+    """
+    labels = list(sections)
+    curves = {"x": np.concatenate([np.asarray(sections[label][0], dtype=np.float64) for label in labels] or [[]]),
+              "y": np.concatenate([np.asarray(sections[label][1], dtype=np.float64) for label in labels] or [[]]),
+              "section_length": np.array([len(sections[label][0]) for label in labels], dtype=np.float64)}
+    return curves, "\n".join(labels)
+
+
+def split_sections(curves, label):
+    """
+    Inverse of flatten_sections: return {label: (x, y)}.
+    """
+    sections = {}
+    start = 0
+    for name, length in zip(label.split("\n"), curves["section_length"].astype(np.int64)):
+        sections[name] = (curves["x"][start:start + length], curves["y"][start:start + length])
+        start += length
+    return sections
+
+
+class CurveStore:
+    """
+    HDF5 file of ragged curves per grid index.
+
+    Args:
+        path: HDF5 file
+        mode: h5py file mode, "w" to create or truncate, "a" to create or extend, "r" to read only
+        batch_size: number of rows buffered before they are written
+        chunk_size: HDF5 chunk size (number of values) of the flat datasets
+    """
+
+    def __init__(self, path, mode="a", batch_size=100, chunk_size=16384, compression="gzip"):
+        self.path = path
+        self.mode = mode
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self.compression = compression
+        self._file = None
+        self._rows = None
+        self._pending = []
+
+    def open(self):
+        if self._file is None:
+            self._file = h5py.File(self.path, self.mode)
+            if "index" not in self._file and self.mode != "r":
+                self._file.create_dataset("index", shape=(0,), maxshape=(None,), dtype=np.int64, chunks=(1024,))
+                self._file.create_dataset("label", shape=(0,), maxshape=(None,), dtype=h5py.string_dtype(),
+                                          chunks=(1024,))
+                self._file.create_group("curves")
+        return self
+
+    def close(self):
+        if self._file is not None:
+            if self.mode != "r":
+                self.flush()
+            self._file.close()
+            self._file = None
+            self._rows = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def write(self, index, curves, label=""):
+        """
+        Store the curves of one grid index. A later write of the same index replaces the earlier one.
+
+        Args:
+            curves: dictionary quantity -> 1D array, e.g. {"time": ..., "number_density": ...}
+            label: free text stored with the row (e.g. the Scheil section labels)
+        """
+        self._pending.append((int(index), {name: np.asarray(values, dtype=np.float64).ravel()
+                                           for name, values in curves.items()}, label))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def _dataset(self, name):
+        group = self._file["curves"]
+        if name not in group:
+            quantity = group.create_group(name)
+            quantity.create_dataset("data", shape=(0,), maxshape=(None,), dtype=np.float64,
+                                    chunks=(self.chunk_size,), compression=self.compression, shuffle=True)
+            rows = len(self._file["index"])
+            # rows written before this quantity existed have no values for it
+            for column in ("start", "length"):
+                quantity.create_dataset(column, shape=(rows,), maxshape=(None,), dtype=np.int64, chunks=(1024,),
+                                        fillvalue=0)
+        return group[name]
+
+    @staticmethod
+    def _extend(dataset, values):
+        start = len(dataset)
+        dataset.resize((start + len(values),))
+        dataset[start:] = values
+        return start
+
+    def flush(self):
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        names = sorted({name for _, curves, _ in pending for name in curves})
+        for name in names:
+            self._dataset(name)
+        row = len(self._file["index"])
+        self._extend(self._file["index"], np.array([index for index, _, _ in pending], dtype=np.int64))
+        self._extend(self._file["label"], np.array([label for _, _, label in pending], dtype=object))
+        for name in self._file["curves"]:
+            quantity = self._file["curves"][name]
+            values = [curves.get(name, np.empty(0)) for _, curves, _ in pending]
+            lengths = np.array([len(value) for value in values], dtype=np.int64)
+            offset = self._extend(quantity["data"], np.concatenate(values))
+            starts = offset + np.concatenate([[0], np.cumsum(lengths)[:-1]])
+            for column, column_values in (("start", starts), ("length", lengths)):
+                quantity[column].resize((row + len(pending),))
+                quantity[column][row:] = column_values
+        self._rows = None
+
+    def _row_of(self):
+        if self._rows is None:
+            index = self._file["index"][:]
+            # last row wins when an index was written more than once
+            self._rows = {int(value): row for row, value in enumerate(index)}
+        return self._rows
+
+    def indices(self):
+        if self.mode != "r":
+            self.flush()
+        return sorted(self._row_of())
+
+    def __contains__(self, index):
+        return int(index) in self._row_of()
+
+    def read(self, index, names=None):
+        """
+        Return (curves, label) of one grid index, reading only the requested quantities.
+        """
+        if self.mode != "r":
+            self.flush()
+        row = self._row_of()[int(index)]
+        curves = {}
+        for name in names or list(self._file["curves"]):
+            quantity = self._file["curves"][name]
+            start, length = quantity["start"][row], quantity["length"][row]
+            curves[name] = quantity["data"][start:start + length]
+        label = self._file["label"][row]
+        return curves, label.decode("utf-8") if isinstance(label, bytes) else label
+
+
+def compact(path, batch_size=100):
+    """
+    Rewrite a curve store without the rows replaced by later writes of the same index, in index order.
+    Returns the number of rows before and after.
+    """
+    temporary_path = path + ".tmp"
+    with CurveStore(path, mode="r") as store, h5py.File(path, "r") as source:
+        rows_before = len(source["index"])
+        chunk_size = next((quantity["data"].chunks[0] for quantity in source["curves"].values()), 16384)
+        with CurveStore(temporary_path, "w", batch_size, chunk_size) as compacted:
+            indices = store.indices()
+            for index in indices:
+                compacted.write(index, *store.read(index))
+    os.replace(temporary_path, path)
+    return rows_before, len(indices)
+
+
+def plot_curve(store, index, x_name, y_name, path=None, logx=False, resolution=150):
+    """
+    Plot one stored curve on demand, shown on screen or saved to `path`.
+    """
+    import matplotlib.pyplot as plt
+
+    curves, label = store.read(index, [x_name, y_name])
+    fig, ax = plt.subplots(1)
+    fig.suptitle(f"Index {index}", fontsize=14, fontweight='bold')
+    plot = ax.semilogx if logx else ax.plot
+    plot(curves[x_name], curves[y_name], 'g-', label=y_name)
+    ax.set_xlabel(x_name)
+    ax.set_ylabel(y_name)
+    ax.legend()
+    if path is None:
+        plt.show()
+    else:
+        plt.savefig(path, dpi=resolution)
+    plt.close("all")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Plot stored curves of some grid indices")
+    parser.add_argument("store", help="HDF5 curve store")
+    parser.add_argument("indices", nargs="*", type=int, help="grid indices to plot")
+    parser.add_argument("--compact", action="store_true", help="drop the replaced rows of the store first")
+    parser.add_argument("--x", default="time", help="quantity on the x axis")
+    parser.add_argument("--y", default="number_density", help="quantity on the y axis")
+    parser.add_argument("--logx", action="store_true", help="logarithmic x axis")
+    parser.add_argument("--save", action="store_true", help="save <index>.png instead of showing the figure")
+    args = parser.parse_args()
+    if args.compact:
+        rows_before, rows_after = compact(args.store)
+        print(f"{args.store}: {rows_before} rows compacted to {rows_after}")
+    with CurveStore(args.store, mode="r") as store:
+        for index in args.indices:
+            plot_curve(store, index, args.x, args.y, f"{index}.png" if args.save else None, args.logx)
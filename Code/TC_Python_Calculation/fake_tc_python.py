@@ -0,0 +1,321 @@
+"""
+Deterministic local stand-in for the part of the TC-Python API used by the sweeps, for benchmarks and
+regression tests without a Thermo-Calc licence.
+
+    TCPython() -> set_cache_folder / select_database_and_elements /
+                  select_thermodynamic_and_kinetic_databases_with_elements -> get_system /
+                  get_system_for_scheil_calculations
+        .with_single_equilibrium_calculation()        get_value_of("BM" | "VM" | "NP(<phase>)"), get_stable_phases()
+        .with_scheil_calculation()                    get_values_grouped_by_stable_phases_of(x, y)
+        .with_isothermal_precipitation_calculation()  get_number_density_of, get_volume_fraction_of,
+                                                      get_mean_radius_of
+
+The results are smooth synthetic functions of the composition (no physics), identical for identical input.
+Every calculate() sleeps for the configured latency, and TCPython() for the startup latency, so sweeps can be
+timed under realistic solver costs:
+
+    import fake_tc_python
+    fake_tc_python.set_latency(single_equilibrium=0.05, startup=2.0)
+    fake_tc_python.install()   # "import tc_python" now returns this module, e.g. in TCPythonSession
+"""
+import sys
+import time
+import zlib
+
+import numpy as np
+
+
+LATENCY = {"startup": 0.0, "single_equilibrium": 0.0, "scheil": 0.0, "precipitation": 0.0}
+MOLAR_MASS = {"Fe": 55.845, "Cr": 51.996, "Co": 58.933, "C": 12.011, "N": 14.007}
+
+
+def set_latency(**latency):
+    """
+    Set the latency [s] of "startup" (TCPython()) and of one calculate() of "single_equilibrium", "scheil"
+    and "precipitation". Set it before the worker processes are started.
+    """
+    unknown = set(latency) - set(LATENCY)
+    if unknown:
+        raise ValueError(f"unknown latency {sorted(unknown)}")
+    LATENCY.update(latency)
+
+
+def install():
+    """
+    Make "import tc_python" (and "from tc_python import *") resolve to this module.
+    """
+    sys.modules["tc_python"] = sys.modules[__name__]
+
+
+def _seed(*values):
+    return zlib.crc32(repr(values).encode())
+
+
+# ---- enumerations and quantities ------#
+class CompositionUnit:
+    MASS_PERCENT = "MASS_PERCENT"
+    MASS_FRACTION = "MASS_FRACTION"
+    MOLE_PERCENT = "MOLE_PERCENT"
+    MOLE_FRACTION = "MOLE_FRACTION"
+
+
+class ThermodynamicQuantity:
+    @staticmethod
+    def temperature():
+        return "T"
+
+    @staticmethod
+    def mole_fraction_of_a_component(component):
+        return f"X({component})"
+
+    @staticmethod
+    def mass_fraction_of_a_component(component):
+        return f"W({component})"
+
+
+class ScheilQuantity:
+    @staticmethod
+    def temperature():
+        return "T"
+
+    @staticmethod
+    def mole_fraction_of_all_solid_phases():
+        return "NS"
+
+
+class _Fluent:
+    """
+    Records every set_*/enable_*/disable_*/add_* call and returns itself, like the TC-Python builders.
+    """
+
+    def __init__(self, *args):
+        self.args = args
+        self.options = {}
+
+    def __getattr__(self, name):
+        if name.startswith(("set_", "enable_", "disable_", "add_")):
+            def option(*args):
+                self.options[name] = args
+                return self
+            return option
+        raise AttributeError(name)
+
+
+class MatrixPhase(_Fluent):
+    def __init__(self, phase):
+        super().__init__(phase)
+        self.phase = phase
+        self.precipitates = []
+
+    def add_precipitate_phase(self, precipitate):
+        self.precipitates.append(precipitate)
+        return self
+
+
+class PrecipitatePhase(_Fluent):
+    def __init__(self, phase):
+        super().__init__(phase)
+        self.phase = phase
+
+
+class NumericalParameters(_Fluent):
+    pass
+
+
+# ---- session and system ------#
+class TCPython:
+    def __enter__(self):
+        time.sleep(LATENCY["startup"])
+        return SetUp()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+class SetUp(_Fluent):
+    def select_database_and_elements(self, database, elements):
+        return SystemBuilder([database], elements)
+
+    def select_thermodynamic_and_kinetic_databases_with_elements(self, thermodynamic, kinetic, elements):
+        return SystemBuilder([thermodynamic, kinetic], elements)
+
+
+class SystemBuilder(_Fluent):
+    def __init__(self, databases, elements):
+        super().__init__()
+        self.databases = databases
+        self.elements = list(dict.fromkeys(elements))
+
+    def get_system(self):
+        return System(self.elements)
+
+    def get_system_for_scheil_calculations(self):
+        return System(self.elements)
+
+
+class System:
+    def __init__(self, elements):
+        self.elements = elements
+
+    def with_single_equilibrium_calculation(self):
+        return SingleEquilibriumCalculation(self.elements)
+
+    def with_scheil_calculation(self):
+        return ScheilCalculation(self.elements)
+
+    def with_isothermal_precipitation_calculation(self):
+        return PrecipitationCalculation(self.elements)
+
+
+# ---- calculations ------#
+class _Calculation(_Fluent):
+    def __init__(self, elements):
+        super().__init__()
+        self.elements = elements
+        self.unit = CompositionUnit.MASS_PERCENT
+        self.composition = {}
+
+    def set_composition_unit(self, unit):
+        self.unit = unit
+        return self
+
+    def set_composition(self, element, value):
+        self.composition[element] = float(value)
+        return self
+
+    def fractions(self):
+        """
+        Mass fractions of the alloying elements, whatever unit they were given in.
+        """
+        scale = 100.0 if self.unit in (CompositionUnit.MASS_PERCENT, CompositionUnit.MOLE_PERCENT) else 1.0
+        return {element: self.composition.get(element, 0.0) / scale for element in ("Cr", "Co", "C", "N")}
+
+
+class SingleEquilibriumCalculation(_Calculation):
+    def __init__(self, elements):
+        super().__init__(elements)
+        self.conditions = {}
+
+    def set_condition(self, quantity, value):
+        self.conditions[quantity] = float(value)
+        return self
+
+    def calculate(self):
+        time.sleep(LATENCY["single_equilibrium"])
+        fractions = {element: self.conditions.get(f"X({element})", self.conditions.get(f"W({element})", 0.0))
+                     for element in ("Cr", "Co", "C", "N")}
+        return SingleEquilibriumResult(fractions, self.conditions.get("T", 300.0))
+
+
+class SingleEquilibriumResult:
+    def __init__(self, fractions, temperature):
+        x = fractions
+        interstitial = x["C"] + x["N"]
+        mass = MOLAR_MASS["Fe"] * (1 - sum(x.values())) + sum(MOLAR_MASS[element] * x[element] for element in x)
+        density = 7874.0 - 900.0 * x["Cr"] + 1100.0 * x["Co"] - 4000.0 * interstitial
+        self.values = {"BM": mass, "VM": 1e-3 * mass / density, "T": temperature}
+        carbide = min(0.3, max(0.0, 5.5 * x["C"] - 0.002 + 0.05 * x["Cr"] * x["C"] * 100))
+        nitride = min(0.1, max(0.0, 2.0 * x["N"] - 0.003))
+        sigma = max(0.0, x["Cr"] - 0.135) * 0.5
+        amounts = {"BCC_A2": 1.0 - carbide - nitride - sigma, "M23C6": carbide, "HCP_A3#2": nitride,
+                   "SIGMA": sigma}
+        self.amounts = {phase: amount for phase, amount in amounts.items() if amount > 0}
+
+    def get_stable_phases(self):
+        return list(self.amounts)
+
+    def get_value_of(self, quantity):
+        if quantity.startswith("NP("):
+            return self.amounts.get(quantity[3:-1], 0.0)
+        return self.values[quantity]
+
+
+class ScheilCalculation(_Calculation):
+    def calculate(self):
+        time.sleep(LATENCY["scheil"])
+        return ScheilResult(self.fractions())
+
+
+class _Curve:
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+
+class ScheilResult:
+    def __init__(self, fractions):
+        w = fractions
+        liquidus = 1811.0 - 1500.0 * w["Cr"] - 400.0 * w["Co"] - 8000.0 * w["C"] - 5000.0 * w["N"]
+        solidus = liquidus - 60.0 - 25000.0 * (w["C"] + w["N"]) - 200.0 * w["Cr"]
+        exponent = 3.0 + 40.0 * w["C"]
+        n = 40 + _seed(round(w["Cr"], 6), round(w["Co"], 6), round(w["C"], 6)) % 40
+        solid = np.linspace(0.0, 1.0, n)
+        temperature = liquidus - (liquidus - solidus) * solid**exponent
+        # three sections sharing their end points, like the grouped TC-Python result
+        bounds = [0, n // 3, 2 * n // 3, n - 1]
+        labels = ["LIQUID", "LIQUID + BCC_A2", "LIQUID + BCC_A2 + M23C6"]
+        self.sections = {label: _Curve(list(solid[start:end + 1]), list(temperature[start:end + 1]))
+                         for label, start, end in zip(labels, bounds[:-1], bounds[1:])}
+
+    def get_values_grouped_by_stable_phases_of(self, x_quantity, y_quantity):
+        if (x_quantity, y_quantity) != ("NS", "T"):
+            raise NotImplementedError(f"{x_quantity} vs {y_quantity}")
+        return self.sections
+
+
+class PrecipitationCalculation(_Calculation):
+    def __init__(self, elements):
+        super().__init__(elements)
+        self.matrix = None
+        self.temperature = 773.15
+        self.simulation_time = 300.0
+
+    def with_matrix_phase(self, matrix):
+        self.matrix = matrix
+        return self
+
+    def with_numerical_parameters(self, parameters):
+        self.options["numerical_parameters"] = parameters
+        return self
+
+    def set_temperature(self, temperature):
+        self.temperature = float(temperature)
+        return self
+
+    def set_simulation_time(self, simulation_time):
+        self.simulation_time = float(simulation_time)
+        return self
+
+    def calculate(self):
+        time.sleep(LATENCY["precipitation"])
+        phases = [precipitate.phase for precipitate in self.matrix.precipitates] if self.matrix else []
+        return PrecipitationResult(self.fractions(), phases, self.temperature, self.simulation_time)
+
+
+class PrecipitationResult:
+    def __init__(self, fractions, phases, temperature, simulation_time):
+        w = fractions
+        self.time = np.geomspace(1e-4, simulation_time, 120)
+        self.curves = {}
+        for phase in phases:
+            factor = 1.0 + (_seed(phase) % 100) / 100.0
+            peak = 1e22 * factor * (w["C"] + w["N"]) * 100 * (1 + 5 * w["Co"])
+            peak_time = simulation_time * (0.05 + 0.3 * w["Cr"]) / factor
+            ratio = self.time / peak_time
+            number_density = peak * ratio**2 * np.exp(2 * (1 - ratio))
+            volume_fraction = 0.02 * factor * (w["C"] + w["N"]) * 100 * (1 - np.exp(-self.time / peak_time))
+            mean_radius = 1e-9 * (1 + self.time / peak_time) ** (1 / 3)
+            self.curves[phase] = {"number_density": number_density, "volume_fraction": volume_fraction,
+                                  "mean_radius": mean_radius}
+
+    def _get(self, phase, quantity):
+        return list(self.time), list(self.curves[phase][quantity])
+
+    def get_number_density_of(self, phase):
+        return self._get(phase, "number_density")
+
+    def get_volume_fraction_of(self, phase):
+        return self._get(phase, "volume_fraction")
+
+    def get_mean_radius_of(self, phase):
+        return self._get(phase, "mean_radius")
@@ -0,0 +1,89 @@
+"""
+Vectorized precipitation kinetics metrics over whole batches of number density curves.
+
+The ragged curves of a batch are padded with NaN into 2D arrays and every metric is computed for all the
+curves at once, in one pass over the array:
+
+    peak_number_density   maximum number density [m-3]
+    time_to_peak          time of the (first) maximum [s]
+    peak_speed            peak_number_density / time_to_peak [m-3 s-1], the "precipitation speed" of pyex_04
+    incubation_time       time at which the number density first reaches incubation_fraction of its peak,
+                          linearly interpolated between the samples [s]
+    final_volume_fraction last volume fraction of the curve (when volume fractions are given)
+
+Degenerate curves are well defined instead of raising:
+
+    empty or all-NaN curve     every metric is NaN
+    no precipitation (peak<=0) peak 0, peak_speed 0, time_to_peak and incubation_time NaN
+    peak at time <= 0          peak_speed NaN
+"""
+import numpy as np
+
+
+def pad_ragged(curves, fill=np.nan):
+    """
+    Pad a list of 1D sequences into an (n, m) float array, returns the array and the length of every row.
+    """
+    lengths = np.array([len(curve) for curve in curves], dtype=np.int64)
+    m = max(int(lengths.max()) if len(lengths) else 0, 1)
+    padded = np.full((len(curves), m), fill, dtype=np.float64)
+    for row, curve in enumerate(curves):
+        padded[row, :len(curve)] = np.asarray(curve, dtype=np.float64)
+    return padded, lengths
+
+
+def kinetics_metrics(times, number_densities, volume_fractions=None, incubation_fraction=0.01):
+    """
+    Kinetics metrics of every curve.
+
+    Args:
+        times: list of time arrays
+        number_densities: list of number density arrays, same lengths as the times
+        volume_fractions: optional list of volume fraction arrays
+        incubation_fraction: fraction of the peak that ends the incubation
+    Returns:
+        dictionary metric name -> array (see the module docstring)
+    """
+    T, lengths = pad_ragged(times)
+    N, density_lengths = pad_ragged(number_densities)
+    if not np.array_equal(lengths, density_lengths):
+        raise ValueError("times and number densities differ in length")
+    n = len(lengths)
+    rows = np.arange(n)
+    valid = np.isfinite(N) & np.isfinite(T)
+    densities = np.where(valid, N, -np.inf)
+
+    position = np.argmax(densities, axis=1)
+    peak = densities[rows, position]
+    empty = ~valid.any(axis=1)
+    precipitated = ~empty & (peak > 0)
+
+    peak_number_density = np.where(empty, np.nan, np.where(precipitated, peak, 0.0))
+    time_to_peak = np.where(precipitated, T[rows, position], np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        peak_speed = np.where(time_to_peak > 0, peak_number_density / time_to_peak, np.nan)
+    peak_speed[~empty & ~precipitated] = 0.0
+
+    # first sample at or above the threshold, interpolated from the sample before it
+    threshold = incubation_fraction * peak_number_density
+    above = valid & (densities >= threshold[:, None])
+    first = np.argmax(above, axis=1)
+    before = np.maximum(first - 1, 0)
+    t0, t1 = T[rows, before], T[rows, first]
+    n0, n1 = densities[rows, before], densities[rows, first]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rise = n1 - n0
+        weight = np.where((first > 0) & (rise > 0) & np.isfinite(n0), (threshold - n0) / rise, 1.0)
+    incubation_time = np.where(precipitated, t0 + np.clip(weight, 0.0, 1.0) * (t1 - t0), np.nan)
+
+    final_volume_fraction = np.full(n, np.nan)
+    if volume_fractions is not None:
+        V, volume_lengths = pad_ragged(volume_fractions)
+        has_values = volume_lengths > 0
+        final_volume_fraction[has_values] = V[rows[has_values], volume_lengths[has_values] - 1]
+
+    return {"peak_number_density": peak_number_density,
+            "time_to_peak": time_to_peak,
+            "peak_speed": peak_speed,
+            "incubation_time": incubation_time,
+            "final_volume_fraction": final_volume_fraction}
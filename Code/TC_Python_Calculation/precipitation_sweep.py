@@ -0,0 +1,173 @@
+"""
+Precipitation sweeps with several precipitate phases in one BCC_A2 matrix.
+
+All precipitates of a sweep are added to the same MatrixPhase, so every grid point needs one calculate() and
+every worker loads the databases once, instead of one full sweep (and system setup) per phase. The calculation
+is built from the same settings dictionary that keys the result cache, so the two cannot drift apart:
+
+    settings = {"databases": ["TCFE9", "MOBFE5"], "elements": ["Fe", "Cr", "Co", "C", "N"],
+                "composition_unit": "MASS_PERCENT", "matrix": {"phase": "BCC_A2", "grain_radius": 1.e-4},
+                "precipitates": [{"phase": "M23C6", "interfacial_energy": 0.252, "nucleation": "grain_boundaries"},
+                                 {"phase": "HCP_A3#2", "interfacial_energy_estimation_prefactor": 1.0,
+                                  "nucleation": "bulk"}],
+                "temperature": 763.15, "simulation_time": 300}
+    simulation = PrecipitationSimulation(settings, cache_folder)
+    session = TCPythonSession(simulation.configure, simulation.evaluate)
+
+Every point returns {phase: {"time", "number_density", "volume_fraction", "mean_radius"}} as plain lists. A point
+with a temperature (see sweep_engine.temperature_grid) is simulated at that temperature instead of the one of the
+settings. Results at several times come from one long simulation: the isothermal curves up to a time are what a
+simulation ending there would return, so slice_curves cuts them instead of running the point again.
+"""
+import numpy as np
+
+from kinetics_metrics import kinetics_metrics
+from sweep_profiler import phase
+
+
+QUANTITIES = ("number_density", "volume_fraction", "mean_radius")
+NUCLEATION_SITES = {"bulk": "set_nucleation_in_bulk",
+                    "grain_boundaries": "set_nucleation_at_grain_boundaries",
+                    "dislocations": "set_nucleation_at_dislocations"}
+
+
+def build_precipitate(precipitate):
+    """
+    Build one PrecipitatePhase from its settings entry.
+    """
+    from tc_python import PrecipitatePhase
+
+    precipitate_phase = PrecipitatePhase(precipitate["phase"])
+    if "interfacial_energy" in precipitate:
+        precipitate_phase = precipitate_phase.set_interfacial_energy(precipitate["interfacial_energy"])
+    else:
+        precipitate_phase = precipitate_phase.set_interfacial_energy_estimation_prefactor(
+            precipitate.get("interfacial_energy_estimation_prefactor", 1.0))
+    nucleation = precipitate.get("nucleation", "bulk")
+    if nucleation not in NUCLEATION_SITES:
+        raise ValueError(f"unknown nucleation site {nucleation} of {precipitate['phase']}")
+    return getattr(precipitate_phase, NUCLEATION_SITES[nucleation])()
+
+
+class PrecipitationSimulation:
+    """
+    configure/evaluate pair for TCPythonSession simulating all precipitates of the settings in one run.
+
+    Args:
+        settings: calculation settings (see the module docstring), also used as result cache key
+        cache_folder: TC-Python cache folder
+    """
+
+    def __init__(self, settings, cache_folder):
+        self.settings = settings
+        self.cache_folder = cache_folder
+        self.phases = [precipitate["phase"] for precipitate in settings["precipitates"]]
+        if len(set(self.phases)) != len(self.phases):
+            raise ValueError(f"precipitate phases are not unique: {self.phases}")
+
+    def configure(self, start):
+        """
+        Create and configure the precipitation calculation, called once per sweep worker.
+        """
+        from tc_python import CompositionUnit, MatrixPhase, NumericalParameters
+
+        settings = self.settings
+        matrix = MatrixPhase(settings["matrix"]["phase"])
+        if "grain_radius" in settings["matrix"]:
+            matrix = matrix.set_grain_radius(settings["matrix"]["grain_radius"])
+        for precipitate in settings["precipitates"]:
+            matrix = matrix.add_precipitate_phase(build_precipitate(precipitate))
+        calculation = (start
+                       .set_cache_folder(self.cache_folder)
+                       .select_thermodynamic_and_kinetic_databases_with_elements(*settings["databases"],
+                                                                                 settings["elements"])
+                       .get_system()
+                       .with_isothermal_precipitation_calculation()
+                       .set_composition_unit(getattr(CompositionUnit, settings["composition_unit"]))
+                       )
+        if "max_time_step" in settings:
+            calculation = calculation.with_numerical_parameters(NumericalParameters()
+                                                                .set_max_time_step(settings["max_time_step"]))
+        calculation = calculation.with_matrix_phase(matrix).set_simulation_time(settings["simulation_time"])
+        if "temperature" in settings:
+            calculation = calculation.set_temperature(settings["temperature"])
+        return calculation
+
+    def evaluate(self, calculation, point):
+        """
+        Simulate one grid point and return the curves of every precipitate.
+        """
+        if point.temperature is not None:
+            calculation = calculation.set_temperature(point.temperature)
+        with phase("calculate"):
+            sim_results = (calculation
+                           .set_composition("Cr", point.x_Cr)
+                           .set_composition("Co", point.x_Co)
+                           .set_composition("C", point.x_C_N)
+                           .set_composition("N", point.x_C_N)
+                           .calculate()
+                           )
+        with phase("extract"):
+            curves = {}
+            for name in self.phases:
+                time, number_density = sim_results.get_number_density_of(name)
+                _, volume_fraction = sim_results.get_volume_fraction_of(name)
+                _, mean_radius = sim_results.get_mean_radius_of(name)
+                curves[name] = {"time": list(time), "number_density": list(number_density),
+                                "volume_fraction": list(volume_fraction), "mean_radius": list(mean_radius)}
+            return curves
+
+
+def flatten_phases(curves):
+    """
+    {phase: {quantity: values}} -> {"phase:quantity": values} for CurveStore.write.
+    """
+    return {f"{name}:{quantity}": values for name, phase_curves in curves.items()
+            for quantity, values in phase_curves.items()}
+
+
+def slice_curves(curves, end_time):
+    """
+    The curves of every phase up to end_time [s]: the samples before it plus a sample at end_time, linearly
+    interpolated. Curves ending before end_time are returned whole.
+    """
+    sliced = {}
+    for name, phase_curves in curves.items():
+        time = np.asarray(phase_curves["time"], dtype=np.float64)
+        count = int(np.searchsorted(time, end_time, side="right"))
+        interpolate = 0 < count < len(time) and time[count - 1] < end_time
+        sliced[name] = {"time": time[:count].tolist() + ([float(end_time)] if interpolate else [])}
+        for quantity, values in phase_curves.items():
+            if quantity == "time":
+                continue
+            values = np.asarray(values, dtype=np.float64)
+            sliced[name][quantity] = values[:count].tolist() + ([float(np.interp(end_time, time, values))]
+                                                                 if interpolate else [])
+    return sliced
+
+
+def final_values(results, phases, times=None):
+    """
+    Result store columns over the (index, curves) results of a sweep: the final number density, volume fraction
+    and mean radius of every phase ("<phase>_final_<quantity>") and its kinetics metrics ("<phase>_<metric>",
+    see kinetics_metrics.py).
+
+    With times [s], the columns are computed on the curves sliced at every time and named with a "_<time>s"
+    suffix, e.g. "M23C6_final_volume_fraction_60s".
+    """
+    if times is not None:
+        columns = {}
+        for end_time in times:
+            sliced = [(index, slice_curves(curves, end_time)) for index, curves in results]
+            columns.update((f"{name}_{end_time:g}s", values) for name, values in final_values(sliced, phases).items())
+        return columns
+    columns = {}
+    for name in phases:
+        for quantity in QUANTITIES:
+            columns[f"{name}_final_{quantity}"] = np.array(
+                [curves[name][quantity][-1] if len(curves[name][quantity]) else np.nan for index, curves in results])
+        kinetics = kinetics_metrics([curves[name]["time"] for index, curves in results],
+                                    [curves[name]["number_density"] for index, curves in results])
+        for metric in ("peak_number_density", "time_to_peak", "peak_speed", "incubation_time"):
+            columns[f"{name}_{metric}"] = kinetics[metric]
+    return columns
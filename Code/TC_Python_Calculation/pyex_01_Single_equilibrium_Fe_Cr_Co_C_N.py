@@ -1,8 +1,12 @@
-from mpl_toolkits.mplot3d import Axes3D
-import matplotlib.pyplot as plt
-from matplotlib import cm
 import numpy as np
-from tc_python import *
+import os
+from result_cache import CachedSession
+from result_store import ResultStore, family_table
+from sweep_engine import TCPythonSession, composition_grid
+from sweep_pipeline import ColumnSink, run_pipeline
+from sweep_profiler import (ProfiledSession, SweepProfiler, checkpoint_completed, load_records, new_run, phase,
+                            report, summarize)
+from sweep_order import WarmStartEvaluate, serpentine_order
 
 """
 This program create a single equilibrium calculation from a "Fe" system, loop every element "Cr", "Co", "Co", "C", "N"
@@ -14,6 +18,10 @@ def plot_3d(list_of_x, list_of_y, list_of_z, xlabel, ylabel, zlabel, title):
     """
     Plot a 3d figure using matplotlib given data and labels on the three axes.
     """
+    # plotting (and tc_python) is imported where it is used, so the sweep workers start without it
+    import matplotlib.pyplot as plt
+    from matplotlib import cm
+    from mpl_toolkits.mplot3d import Axes3D # registers the 3d projection
     fig = plt.figure()
     fig.suptitle(title, fontsize=14, fontweight='bold')
     ax = fig.gca(projection='3d')
@@ -60,73 +68,144 @@ def list_stable_phases(calc_result):
 
 
 
-with TCPython() as start:
-    # create and configure a single equilibrium calculation
+# everything except the composition that changes the result of a point: builds the calculation and keys the
+# result cache, so the two cannot drift apart. The grid is in mass percent, the conditions are mass fractions (W),
+# like the Scheil and precipitation sweeps the equilibrium family is joined with.
+settings = {"calculation": "single_equilibrium", "database": "TCFE9", "elements": ["Fe", "Cr", "Co", "C", "N"],
+            "temperature": 300, "global_minimization": "warm_start", "composition_unit": "mass_percent"}
+
+
+def configure(start):
+    """
+    Create and configure the single equilibrium calculation of `settings`, called once per sweep worker.
+    """
+    from tc_python import ThermodynamicQuantity
     calculation = (
         start
             .set_cache_folder(os.path.basename(__file__) + "_cache")
-            .select_database_and_elements("TCFE9", ["Fe", "Cr", "Co", "C", "N"])
+            .select_database_and_elements(settings["database"], settings["elements"])
             .get_system()
             .with_single_equilibrium_calculation()
-            .set_condition(ThermodynamicQuantity.temperature(), 300) # room temperature
-            .disable_global_minimization()
-            # .with_matrix_phase(MatrixPhase("BCC_A2")
-            #                    .set_grain_radius(1.e-4)
-            #                     .add_precipitate_phase(PrecipitatePhase("M23C6")
-            #                                         .set_interfacial_energy(0.252)
-            #                                         .set_nucleation_at_grain_boundaries()
-            #                                         )
-            #                    )
+            .set_condition(ThermodynamicQuantity.temperature(), settings["temperature"]) # room temperature
     )
+    if settings["global_minimization"] == "warm_start":
+        # every solve starts from the previous equilibrium, see WarmStartEvaluate
+        calculation = calculation.disable_global_minimization()
+    return calculation
+
+
+def calculate_point(calculation, point):
+    """
+    Calculate the equilibrium of one grid point.
+    """
+    from tc_python import ThermodynamicQuantity
+    quantity = (ThermodynamicQuantity.mole_fraction_of_a_component if settings["composition_unit"].startswith("mole")
+                else ThermodynamicQuantity.mass_fraction_of_a_component)
+    scale = 100 if settings["composition_unit"].endswith("_percent") else 1
+    with phase("calculate"):
+        calc_result = (calculation
+                       .set_condition(quantity("Cr"), point.x_Cr/scale)
+                       .set_condition(quantity("Co"), point.x_Co/scale)
+                       .set_condition(quantity("C"), point.x_C_N/scale)
+                       .set_condition(quantity("N"), point.x_C_N/scale)
+                       .calculate()
+                       )
+        return calc_result
+
+
+def extract(calc_result):
+    """
+    Return the density and the stable phase amounts of an equilibrium.
+    """
+    with phase("extract"):
+        mass = calc_result.get_value_of('BM')
+        volume = calc_result.get_value_of('VM')
+        density = 1e-3 * mass / volume
+        phase_amounts, phase_string, phase_string_2 = list_stable_phases(calc_result)
+        return density, phase_amounts
+
+
+# every solve starts from the previous equilibrium of the worker, with a global minimization fallback
+# when the stable phases change
+evaluate = WarmStartEvaluate(calculate_point, extract)
+
+
+def metrics(batch):
+    """
+    Output records of a batch of (point, timed result), runs in the metric stage of the pipeline. Points
+    answered from the result cache have no timing (NaN).
+    """
+    records = []
+    with phase("format"):
+        for point, value in batch:
+            density, phase_amounts = value["result"]
+            timing = value.get("timing", {})
+            x_Cr, x_Co, x_C_N = point.x_Cr, point.x_Co, point.x_C_N
+            output_string_1 = f"Index: {point.index}" + ", X(Cr)={0:.2f}".format(x_Cr) + " , X(Co)={0:.2f}".format(x_Co) + " , X(C/N)={0:.2f}".format(x_C_N) + ", Density = {0:.4f}".format(density) + "[kg/m3]"
+            phase_string = ', '.join(phase + " = {0:.4f}".format(amount) for phase, amount in phase_amounts.items())
+            phase_string_2 = ", ".join("{0:.4f}".format(amount) for amount in phase_amounts.values())
+            string_2 = f"{point.index}" + ", {0:.2f}".format(x_Cr) + ", {0:.2f}".format(x_Co) + ", {0:.4f}".format(x_C_N) + ", {0:.4f}".format(density)
+            records.append({"index": point.index, "x_Cr": x_Cr, "x_Co": x_Co, "x_C_N": x_C_N, "density": density,
+                            "phase_amounts": phase_amounts, "solve_time": timing.get("solve_time", np.nan),
+                            "global_minimization": timing.get("global_minimization", np.nan),
+                            "output_string": ', '.join([output_string_1, phase_string]),
+                            "output_string_2": ", ".join([string_2, phase_string_2])})
+    return records
+
+
+if __name__ == "__main__":
     # in total: 19*11*6 = 1254 combinations
     list_of_x_Cr = np.linspace(10e-2, 145e-3, 19)*100 # (start, stop, number of points). Cr: 19 levels (10-14wt%)
     list_of_x_Co = np.linspace(0, 5e-2, 11)*100 # Co: 11 levels (0-5 wt%)
     list_of_x_C_N = np.linspace(15e-4, 4e-3, 6)*100 # C and N has the same percentage. C/N: 6 levels (0.15-0.4 wt%)
-    list_of_density = []
-    list_of_index = []
-    list_of_element_Cr = []
-    list_of_element_Co = []
-    list_of_element_C_N = []
-    index = 1
-    for x_Cr in list_of_x_Cr:
-        for x_Co in list_of_x_Co:
-            for x_C_N in list_of_x_C_N:
-                calc_result = (calculation
-                               .set_condition(ThermodynamicQuantity.mole_fraction_of_a_component("Cr"), x_Cr/100)
-                               .set_condition(ThermodynamicQuantity.mole_fraction_of_a_component("Co"), x_Co/100)
-                               .set_condition(ThermodynamicQuantity.mole_fraction_of_a_component("C"), x_C_N/100)
-                               .set_condition(ThermodynamicQuantity.mole_fraction_of_a_component("N"), x_C_N/100)
-                            .calculate()
-                            )
-
-
-                mass = calc_result.get_value_of('BM')
-                volume = calc_result.get_value_of('VM')
-                density = 1e-3 * mass / volume
-                list_of_density.append(density)
-                list_of_index.append(index)
-                list_of_element_Cr.append(x_Cr)
-                list_of_element_Co.append(x_Co)
-                list_of_element_C_N.append(x_C_N)
-                
-                output_string_list = []
-                output_string_1 = f"Index: {index}" + ", X(Cr)={0:.2f}".format(x_Cr) + " , X(Co)={0:.2f}".format(x_Co) + " , X(C/N)={0:.2f}".format(x_C_N) + ", Density = {0:.4f}".format(density) + "[kg/m3]"  
-                output_string_list.append(output_string_1)
-                phase_amounts, phase_string, phase_string_2 = list_stable_phases(calc_result)
-                output_string_list.append(phase_string)
-
-                output_string = ', '.join(output_string_list)
-                print(output_string)
-
-                save_file = open("single_equalibrium.txt", mode = "a")
-                save_file.write(output_string + "\n")
-
-                string_2 = f"{index}" + ", {0:.2f}".format(x_Cr) + ", {0:.2f}".format(x_Co) + ", {0:.4f}".format(x_C_N) + ", {0:.4f}".format(density)
-                output_string_2 = ", ".join([string_2, phase_string_2])
-                save_file_2 = open("single_equalibrium_numerical_result.txt", mode = "a")
-                save_file_2.write(output_string_2 + "\n")
-
-                index +=1
+    points = composition_grid(list_of_x_Cr, list_of_x_Co, list_of_x_C_N)
+    # per-point timing of the workers, inspect a running sweep with: python sweep_profiler.py <profile directory>
+    profile_directory = new_run(os.path.basename(__file__) + "_profile")
+    session = ProfiledSession(CachedSession(TCPythonSession(configure, evaluate), os.path.basename(__file__) + "_results.sqlite", settings),
+                              profile_directory)
+    columns = ColumnSink(["index", "x_Cr", "x_Co", "x_C_N", "density", "phase_amounts", "solve_time", "global_minimization"])
+    # results stream from the workers through metrics() into the writers, in sweep order (also after a resume)
+    with SweepProfiler(profile_directory), open("single_equalibrium.txt", mode = "w") as save_file, open("single_equalibrium_numerical_result.txt", mode = "w") as save_file_2:
+        def write_text(records):
+            with phase("write"):
+                for record in records:
+                    print(record["output_string"])
+                    save_file.write(record["output_string"] + "\n")
+                    save_file_2.write(record["output_string_2"] + "\n")
+
+        # serpentine order: consecutive points (and the points of every chunk) are grid neighbours
+        run_pipeline(serpentine_order(points, (19, 11, 6)), session, os.path.basename(__file__) + "_checkpoint.sqlite",
+                     metrics, [write_text, columns], settings=settings)
+    print(report(summarize(load_records(profile_directory), len(points),
+                           checkpoint_completed(os.path.basename(__file__) + "_checkpoint.sqlite"))))
+    solve_times = np.array(columns.columns["solve_time"], dtype=np.float64)
+    fallbacks = np.array(columns.columns["global_minimization"], dtype=np.float64)
+    solved = ~np.isnan(solve_times)
+    if solved.any():
+        print("Total solve time = {0:.1f} s, mean per point = {1:.3f} s, global minimization fallbacks = {2} "
+              "({3} of {4} points solved, the others from the result cache)".format(
+              solve_times[solved].sum(), solve_times[solved].mean(), int(fallbacks[solved].sum()), int(solved.sum()),
+              len(solve_times)))
+
+    # full precision column family for the joined ALL_data.csv, composition in the unit of the conditions
+    unit = settings["composition_unit"].split("_")[0] + "_fraction"
+    list_of_index = columns.columns["index"]
+    list_of_element_Cr = columns.columns["x_Cr"]
+    list_of_element_Co = columns.columns["x_Co"]
+    list_of_element_C_N = columns.columns["x_C_N"]
+    list_of_phase_amounts = columns.columns["phase_amounts"]
+    phases = sorted({phase for phase_amounts in list_of_phase_amounts for phase in phase_amounts})
+    family_columns = {"Density": columns.columns["density"]}
+    for phase in phases:
+        family_columns[phase] = [phase_amounts.get(phase, 0.0) for phase_amounts in list_of_phase_amounts]
+    ResultStore("result_store").write_family("equilibrium", family_table(
+        list_of_index, np.array(list_of_element_Cr)/100, np.array(list_of_element_Co)/100,
+        np.array(list_of_element_C_N)/100, family_columns, unit))
+    # timings of the points solved in this run only, cache hits were not timed
+    ResultStore("result_store").write_family("equilibrium_timing", family_table(
+        np.array(list_of_index)[solved], np.array(list_of_element_Cr)[solved]/100,
+        np.array(list_of_element_Co)[solved]/100, np.array(list_of_element_C_N)[solved]/100,
+        {"solve_time": solve_times[solved], "global_minimization": fallbacks[solved]}, unit))
 
     # single_equalibrium_data = np.asarray(list(zip(list_of_index, list_of_element_Cr, list_of_element_Co, list_of_element_C_N, list_of_density)))
     # np.savetxt("single_equalibrium.txt", single_equalibrium_data) #fmt='%.f'  
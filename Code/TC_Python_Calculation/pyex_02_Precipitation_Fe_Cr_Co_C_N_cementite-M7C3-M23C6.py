@@ -1,7 +1,13 @@
-from tc_python import *
-import matplotlib.pyplot as plt
 import numpy as np
 import os
+from result_cache import CachedSession
+from curve_store import CurveStore
+from precipitation_sweep import PrecipitationSimulation
+from result_store import ResultStore, family_table
+from sweep_engine import TCPythonSession, composition_grid
+from sweep_pipeline import ColumnSink, run_pipeline
+from sweep_profiler import (ProfiledSession, SweepProfiler, checkpoint_completed, load_records, new_run, phase,
+                            report, summarize)
 
 """
 This program simulates the kinetics of precipitation of both stable and metastable carbides from ferrite phase.
@@ -13,6 +19,7 @@ def plot_result(x_time, y_number_density, index, fig_extension="PNG", resolution
     # save_path = os.path.join(os.path.basename(__file__) + "_cache_", "Figures")
     save_path = os.path.join(".", "preciptation_figures")
     path = os.path.join(save_path, str(index) + "." + fig_extension)
+    import matplotlib.pyplot as plt # only imported when figures are saved
     fig, ax = plt.subplots(1)
     fig.suptitle('Three carbides precipitation', fontsize=14, fontweight='bold')
     ax.set_xlabel('Time [s]')
@@ -28,70 +35,108 @@ def plot_result(x_time, y_number_density, index, fig_extension="PNG", resolution
     # plt.cla()
 
 
+# everything except the composition that changes the result of a point: builds the calculation (see
+# precipitation_sweep.py) and keys the result cache, so the two cannot drift apart
+settings = {"calculation": "isothermal_precipitation", "databases": ["TCFE9", "MOBFE5"],
+            "elements": ["Fe", "Cr", "Co", "C", "N"], "composition_unit": "MASS_PERCENT",
+            "matrix": {"phase": "BCC_A2", "grain_radius": 1.e-4},
+            "precipitates": [{"phase": "M23C6", "interfacial_energy": 0.252, "nucleation": "grain_boundaries"}],
+            "temperature": 763.15, "simulation_time": 300, "quantity": "number_density"}
+
+
+def configure(start):
+    """
+    Create and configure the precipitation calculation of `settings`, called once per sweep worker.
+    """
+    return PrecipitationSimulation(settings, os.path.basename(__file__) + "_cache").configure(start)
+
+
+def evaluate(calculation, point):
+    """
+    Simulate one grid point and return the time and number density of M23C6 as lists.
+    """
+    with phase("calculate"):
+        sim_results = (calculation
+                    .set_composition("Cr", point.x_Cr)
+                    .set_composition("Co", point.x_Co)
+                    .set_composition("C", point.x_C_N)
+                    .set_composition("N", point.x_C_N)
+                    .calculate()
+                    )
+    with phase("extract"):
+        time_1, number_density = sim_results.get_number_density_of("M23C6")
+        return list(time_1), list(number_density)
+
+
 ##############----------------------updated implementation -----------------------------################
-with TCPython() as start:
-    # create and configure a single equilibrium calculation
-    calculation = ( start
-                   .set_cache_folder(os.path.basename(__file__) + "_cache")
-                   .select_thermodynamic_and_kinetic_databases_with_elements("TCFE9", "MOBFE5", ["Fe", "Cr", "Co", "C", "N"])
-                   .get_system()
-                   .with_isothermal_precipitation_calculation()
-                   .set_composition_unit(CompositionUnit.MASS_PERCENT)
-                   .with_matrix_phase(MatrixPhase("BCC_A2")
-                                     .set_grain_radius(1.e-4)
-                                    #  .add_precipitate_phase(PrecipitatePhase("CEMENTITE")
-                                    #                        .set_interfacial_energy(0.167)
-                                    #                        .set_nucleation_at_grain_boundaries()
-                                    #                         )
-                                    #  .add_precipitate_phase(PrecipitatePhase("M7C3")
-                                    #                        .set_interfacial_energy(0.282)
-                                    #                        .set_nucleation_at_grain_boundaries()
-                                    #                         )
-                                    .add_precipitate_phase(PrecipitatePhase("M23C6")
-                                                            .set_interfacial_energy(0.252)
-                                                            .set_nucleation_at_grain_boundaries()
-                                                           )
-                                     )
-                   .set_temperature(763.15) # 490 degree
-                   .set_simulation_time(300)
-                #    .calculate()
-                   )
-    
+def metrics(batch):
+    """
+    Output records of a batch of (point, (time, number density)), runs in the metric stage of the pipeline.
+    """
+    return [{"point": point, "index": point.index, "time": time_1, "number_density": number_density,
+             "final_number_density": number_density[-1]} for point, (time_1, number_density) in batch]
+
+
+# the raw curves of every point are kept in the curve store (see curve_store.py for on-demand plots),
+# saving a figure per point during the sweep is optional
+save_figures = False
+
+
+if __name__ == "__main__":
     # in total: 19*11*6 = 1254 combinations
     list_of_x_Cr = np.linspace(10e-2, 145e-3, 19)*100 # (start, stop, number of points). Cr: 19 levels (10-14wt%)
     list_of_x_Co = np.linspace(0, 5e-2, 11)*100 # Co: 11 levels (0-5 wt%)
     list_of_x_C_N = np.linspace(15e-4, 4e-3, 6)*100 # C and N has the same percentage. C/N: 6 levels (0.15-0.4 wt%)
-    list_of_density = []
-    index = 1
-    for x_Cr in list_of_x_Cr:
-        for x_Co in list_of_x_Co:
-            for x_C_N in list_of_x_C_N:
-                sim_results = (calculation
-                            #    .set_condition(ThermodynamicQuantity.mole_fraction_of_a_component("Cr"), x_Cr)
-                            #    .set_condition(ThermodynamicQuantity.mole_fraction_of_a_component("Co"), x_Co)
-                            #    .set_condition(ThermodynamicQuantity.mole_fraction_of_a_component("C"), x_C_N)
-                            #    .set_condition(ThermodynamicQuantity.mole_fraction_of_a_component("N"), x_C_N)
-                            .set_composition("Cr", x_Cr)
-                            .set_composition("Co", x_Co)
-                            .set_composition("C", x_C_N)
-                            .set_composition("N", x_C_N)
-                            .calculate()
-                            )
-                time_1, number_density = sim_results.get_number_density_of("M23C6")
-                list_of_density.append(number_density[-1])
-                output_string = f"Index: {index}" + ", X(Cr)={0:.2f}".format(x_Cr) + " , X(Co)={0:.2f}".format(x_Co) + " , X(C/N)={0:.4f}".format(x_C_N) + ", Volum fraction of M23C6 at 300s = {0:.4f}".format(number_density[-1]) + "[kg/m3]"
-                print(output_string)
-                save_file = open("precipitation_data.txt", mode = "a")
-                save_file.write(output_string + "\n")
-                string_2 = f"{index}" + ", {0:.2f}".format(x_Cr) + ", {0:.2f}".format(x_Co) + ", {0:.4f}".format(x_C_N) + ", {0:.4f}".format(number_density[-1])
-                save_file_2 = open("precipitation_data_numerical.txt", mode = "a")
-                save_file_2.write(string_2 + "\n")
-
-                # save the plot
-                plot_result(time_1, number_density, index)
-                index += 1
-
-    np.savetxt("precipitation_data_2(volum fraction only).txt", list_of_density, fmt='%.4f')  
+    points = composition_grid(list_of_x_Cr, list_of_x_Co, list_of_x_C_N)
+    # per-point timing of the workers, inspect a running sweep with: python sweep_profiler.py <profile directory>
+    profile_directory = new_run(os.path.basename(__file__) + "_profile")
+    session = ProfiledSession(CachedSession(TCPythonSession(configure, evaluate), os.path.basename(__file__) + "_results.sqlite", settings),
+                              profile_directory)
+    columns = ColumnSink(["final_number_density"])
+    if save_figures:
+        import matplotlib
+        matplotlib.use("Agg") # the figures are saved from the writer thread of the pipeline
+    # results stream from the workers through metrics() into the writers, in grid order (also after a resume)
+    with SweepProfiler(profile_directory), open("precipitation_data.txt", mode = "w") as save_file, open("precipitation_data_numerical.txt", mode = "w") as save_file_2, \
+            CurveStore(os.path.basename(__file__) + "_curves.h5", mode="w") as curve_store:
+        def write_text(records):
+            lines = []
+            with phase("format"):
+                for record in records:
+                    point, index, final_number_density = record["point"], record["index"], record["final_number_density"]
+                    x_Cr, x_Co, x_C_N = point.x_Cr, point.x_Co, point.x_C_N
+                    output_string = f"Index: {index}" + ", X(Cr)={0:.2f}".format(x_Cr) + " , X(Co)={0:.2f}".format(x_Co) + " , X(C/N)={0:.4f}".format(x_C_N) + ", Volum fraction of M23C6 at 300s = {0:.4f}".format(final_number_density) + "[kg/m3]"
+                    string_2 = f"{index}" + ", {0:.2f}".format(x_Cr) + ", {0:.2f}".format(x_Co) + ", {0:.4f}".format(x_C_N) + ", {0:.4f}".format(final_number_density)
+                    lines.append((output_string, string_2))
+            with phase("write"):
+                for output_string, string_2 in lines:
+                    print(output_string)
+                    save_file.write(output_string + "\n")
+                    save_file_2.write(string_2 + "\n")
+
+        def write_curves(records):
+            with phase("write"):
+                for record in records:
+                    curve_store.write(record["index"], {"time": record["time"], "number_density": record["number_density"]})
+
+        def write_figures(records):
+            with phase("plot"):
+                for record in records:
+                    plot_result(record["time"], record["number_density"], record["index"])
+
+        sinks = [write_text, write_curves, columns] + ([write_figures] if save_figures else [])
+        run_pipeline(points, session, os.path.basename(__file__) + "_checkpoint.sqlite", metrics, sinks,
+                     settings=settings)
+    print(report(summarize(load_records(profile_directory), len(points),
+                           checkpoint_completed(os.path.basename(__file__) + "_checkpoint.sqlite"))))
+
+    # full precision column family (mass fraction composition) for the joined ALL_data.csv
+    list_of_density = columns.columns["final_number_density"]
+    ResultStore("result_store").write_family("precipitation_M23C6", family_table(
+        [point.index for point in points], [point.x_Cr/100 for point in points], [point.x_Co/100 for point in points],
+        [point.x_C_N/100 for point in points], {"final_number_density": list_of_density}))
+
+    np.savetxt("precipitation_data_2(volum fraction only).txt", list_of_density, fmt='%.4f')
 
 ##############----------------------original implementation -----------------------------################
 # with TCPython():
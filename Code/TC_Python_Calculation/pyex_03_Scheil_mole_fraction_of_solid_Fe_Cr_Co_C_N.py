@@ -1,6 +1,13 @@
 import numpy as np
-import matplotlib.pyplot as plt
-from tc_python import *
+import os
+from result_cache import CachedSession
+from curve_store import CurveStore, flatten_sections
+from result_store import ResultStore, family_table
+from scheil_metrics import scheil_metrics
+from sweep_engine import TCPythonSession, composition_grid
+from sweep_pipeline import ColumnSink, run_pipeline
+from sweep_profiler import (ProfiledSession, SweepProfiler, checkpoint_completed, load_records, new_run, phase,
+                            report, summarize)
 
 """
 Shows the basic usage of Scheil-calculations in TC-Python and mixing them with equilibrium calculations.
@@ -8,43 +15,15 @@ Shows the basic usage of Scheil-calculations in TC-Python and mixing them with e
 
 
 
-def hot_cracking_susceptibility(x_mole_fraction_list, y_temperature_list):
-    '''
-    calculate the HCS based on scheil curve. 
-    x_mole_fraction_list: mole fraction of solid
-    y_temperature_list: the temperature values from scheil calculation
-    '''
-    # interperate y value from x value: y_interp np.interp(x_val, x, y)
-    y_interp_09 = round(np.interp(0.9, x_mole_fraction_list, y_temperature_list), 4)
-    y_interp_10 = round(np.interp(1.0, x_mole_fraction_list, y_temperature_list), 4)
-    y_interp_04 = round(np.interp(0.4, x_mole_fraction_list, y_temperature_list), 4)
-    y_interp_00 = round(np.interp(0, x_mole_fraction_list, y_temperature_list), 4)
-
-    t_09 = (y_interp_00 - y_interp_09)/100
-    t_10 = (y_interp_00 - y_interp_10)/100
-    t_04 = (y_interp_00 - y_interp_04)/100 
-    hcs = (t_09 - t_10)/(t_04 - t_09)
-    return hcs
-
-def growth_restriction_factor(x_mole_fraction_list, y_temperature_list):
-    """
-    calculate the GRF based on scheil curve. The GRF is the slope of the curve approach to zero
-    """
-    y_interp_005 = round(np.interp(0.05, x_mole_fraction_list, y_temperature_list), 4)
-    y_interp_00 = round(np.interp(0, x_mole_fraction_list, y_temperature_list), 4)
-    grf = (y_interp_005 - y_interp_00)/0.05
-    return abs(grf)
-
-
 def plot_scheil_curve(scheil_curve, index, fig_extension="PNG", resolution=150):
     save_path = os.path.join(".", "scheil_curve_figures")
     path = os.path.join(save_path, str(index) + "." + fig_extension)
 
+    import matplotlib.pyplot as plt # only imported when figures are saved
     fig, ax = plt.subplots(1)
     for label in scheil_curve:
-        section = scheil_curve[label]
-        x = section.x  
-        y = np.array(section.y) - 273.15
+        x, y = scheil_curve[label]
+        y = np.array(y) - 273.15
         ax.plot(x, y,  label=label)
 
     ax.set_xlabel("Mole fraction of all solid phases [-]")
@@ -61,71 +40,118 @@ def plot_scheil_curve(scheil_curve, index, fig_extension="PNG", resolution=150):
 database = "TCFE9" 
 dependent_element = "Fe" 
 elements = ["Fe", "Cr", "Co", "C", "N"]
+# everything except the composition that changes the result of a point: builds the calculation and keys the
+# result cache, so the two cannot drift apart
+settings = {"calculation": "scheil", "database": database, "elements": [dependent_element] + elements,
+            "composition_unit": "MASS_PERCENT"}
 
-with TCPython() as session:
+
+def configure(session):
+    """
+    Create the Scheil calculation of `settings`, called once per sweep worker.
+    """
+    from tc_python import CompositionUnit
     system = (session.
               set_cache_folder(os.path.basename(__file__) + "_cache").
-              select_database_and_elements(database, [dependent_element] + elements).
+              select_database_and_elements(settings["database"], settings["elements"]).
               get_system_for_scheil_calculations())
 
     scheil_calculation = (system.
                           with_scheil_calculation().
-                          set_composition_unit(CompositionUnit.MASS_PERCENT)
-                        #   .set_composition("Cr", 14)
-                        #   .set_composition("Co", 2)
-                        #   .set_composition("C", 0.2)
-                        #   .set_composition("N", 0.2)
+                          set_composition_unit(getattr(CompositionUnit, settings["composition_unit"]))
                         )
+    return scheil_calculation
+
+
+def evaluate(scheil_calculation, point):
+    """
+    Calculate the Scheil curve of one grid point, returned as {label: (x, y)} with plain lists.
+    """
+    from tc_python import ScheilQuantity
+    with phase("calculate"):
+        solidification_results = (scheil_calculation
+                                .set_composition("Cr", point.x_Cr)
+                                .set_composition("Co", point.x_Co)
+                                .set_composition("C", point.x_C_N)
+                                .set_composition("N", point.x_C_N)
+                                .calculate()
+                                 )
+    with phase("extract"):
+        # --- solidification curve (mole fraction solid phases vs. T) including the equilibrium ------
+        scheil_curve = solidification_results.get_values_grouped_by_stable_phases_of(
+            ScheilQuantity.mole_fraction_of_all_solid_phases(),
+            ScheilQuantity.temperature())
+        return {label: (list(scheil_curve[label].x), list(scheil_curve[label].y)) for label in scheil_curve}
+
+
+def metrics(batch):
+    """
+    HCS, GRF and SR of a batch of (point, scheil curve) in one vectorized pass, runs in the metric stage of the
+    pipeline. The temperatures are rounded to 4 decimals as before.
+    """
+    batch_metrics = scheil_metrics([scheil_curve for point, scheil_curve in batch], decimals=4)
+    return [{"point": point, "index": point.index, "scheil_curve": scheil_curve, "HCS": batch_metrics["HCS"][row],
+             "GRF": batch_metrics["GRF"][row], "SR": batch_metrics["SR"][row]}
+            for row, (point, scheil_curve) in enumerate(batch)]
+
+
+# the raw curves of every point are kept in the curve store (see curve_store.py for on-demand plots),
+# saving a figure per point during the sweep is optional
+save_figures = False
 
 
+if __name__ == "__main__":
     # in total: 19*11*6 = 1254 combinations
     list_of_x_Cr = np.linspace(10e-2, 145e-3, 19)*100 # (start, stop, number of points). Cr: 19 levels (10-14wt%)
     list_of_x_Co = np.linspace(0, 5e-2, 11)*100 # Co: 11 levels (0-5 wt%)
     list_of_x_C_N = np.linspace(15e-4, 4e-3, 6)*100 # C and N has the same percentage. C/N: 6 levels (0.15-0.4 wt%)
-    list_of_time = []
-    list_of_density = []
-    index = 1
-    for x_Cr in list_of_x_Cr:
-        for x_Co in list_of_x_Co:
-            for x_C_N in list_of_x_C_N:
-                solidification_results = (scheil_calculation
-                                        .set_composition("Cr", x_Cr)
-                                        .set_composition("Co", x_Co)
-                                        .set_composition("C", x_C_N)
-                                        .set_composition("N", x_C_N)
-                                        .calculate()
-                                         )
-                # --- solidification curve (mole fraction solid phases vs. T) including the equilibrium ------
-                scheil_curve = solidification_results.get_values_grouped_by_stable_phases_of(
-                    ScheilQuantity.mole_fraction_of_all_solid_phases(),
-                    ScheilQuantity.temperature())
-
-                temp_min = 1e6
-                temp_max = -1e6
-                x_mole_fraction_list = []
-                y_temperature_list = []
-                for label in scheil_curve:
-                    section = scheil_curve[label]
-                    temp_min = min(np.min(section.y), temp_min)
-                    temp_max = max(np.max(section.y), temp_max)
-
-                    x_mole_fraction_list.extend(section.x)
-                    y_temperature_list.extend(section.y)
-                
-                # plot and save figure
-                plot_scheil_curve(scheil_curve, index)
-
-                hcs = hot_cracking_susceptibility(x_mole_fraction_list, y_temperature_list )
-                grf = growth_restriction_factor(x_mole_fraction_list, y_temperature_list)
-                output_string =  f"Index: {index}" + ", X(Cr)={0:.2f}".format(x_Cr) + " , X(Co)={0:.2f}".format(x_Co) + " , X(C/N)={0:.4f}".format(x_C_N) + " , Hot cracking susceptibility (HCS) = {0:.4f}".format(hcs) + ", Growth restriction factor (GRF)= {0:.4f}".format(grf) 
-                print(output_string)
-                save_file = open("scheil_curve_calculation.txt", mode = "a")
-                save_file.write(output_string + "\n")
-
-                string_2 = f"{index}" + ", {0:.2f}".format(x_Cr) + ", {0:.2f}".format(x_Co) + ", {0:.4f}".format(x_C_N) + ", {0:.4f}".format(hcs) + ", {0:.4f}".format(grf) 
-                save_file_2 = open("scheil_curve_calculation_numerical_results.txt", mode = "a")
-                save_file_2.write(string_2 + "\n")
-                index += 1
+    points = composition_grid(list_of_x_Cr, list_of_x_Co, list_of_x_C_N)
+    # per-point timing of the workers, inspect a running sweep with: python sweep_profiler.py <profile directory>
+    profile_directory = new_run(os.path.basename(__file__) + "_profile")
+    session = ProfiledSession(CachedSession(TCPythonSession(configure, evaluate), os.path.basename(__file__) + "_results.sqlite", settings),
+                              profile_directory)
+    columns = ColumnSink(["HCS", "GRF", "SR"])
+    if save_figures:
+        import matplotlib
+        matplotlib.use("Agg") # the figures are saved from the writer thread of the pipeline
+    # results stream from the workers through metrics() into the writers, in grid order (also after a resume)
+    with SweepProfiler(profile_directory), open("scheil_curve_calculation.txt", mode = "w") as save_file, open("scheil_curve_calculation_numerical_results.txt", mode = "w") as save_file_2, \
+            CurveStore(os.path.basename(__file__) + "_curves.h5", mode="w") as curve_store:
+        def write_text(records):
+            lines = []
+            with phase("format"):
+                for record in records:
+                    point, index, hcs, grf = record["point"], record["index"], record["HCS"], record["GRF"]
+                    x_Cr, x_Co, x_C_N = point.x_Cr, point.x_Co, point.x_C_N
+                    output_string =  f"Index: {index}" + ", X(Cr)={0:.2f}".format(x_Cr) + " , X(Co)={0:.2f}".format(x_Co) + " , X(C/N)={0:.4f}".format(x_C_N) + " , Hot cracking susceptibility (HCS) = {0:.4f}".format(hcs) + ", Growth restriction factor (GRF)= {0:.4f}".format(grf) 
+                    string_2 = f"{index}" + ", {0:.2f}".format(x_Cr) + ", {0:.2f}".format(x_Co) + ", {0:.4f}".format(x_C_N) + ", {0:.4f}".format(hcs) + ", {0:.4f}".format(grf) 
+                    lines.append((output_string, string_2))
+            with phase("write"):
+                for output_string, string_2 in lines:
+                    print(output_string)
+                    save_file.write(output_string + "\n")
+                    save_file_2.write(string_2 + "\n")
+
+        def write_curves(records):
+            with phase("write"):
+                for record in records:
+                    curve_store.write(record["index"], *flatten_sections(record["scheil_curve"]))
+
+        def write_figures(records):
+            with phase("plot"):
+                for record in records:
+                    plot_scheil_curve(record["scheil_curve"], record["index"])
+
+        sinks = [write_text, write_curves, columns] + ([write_figures] if save_figures else [])
+        run_pipeline(points, session, os.path.basename(__file__) + "_checkpoint.sqlite", metrics, sinks,
+                     settings=settings)
+    print(report(summarize(load_records(profile_directory), len(points),
+                           checkpoint_completed(os.path.basename(__file__) + "_checkpoint.sqlite"))))
+
+    # full precision column family (mass fraction composition) for the joined ALL_data.csv
+    ResultStore("result_store").write_family("scheil", family_table(
+        [point.index for point in points], [point.x_Cr/100 for point in points], [point.x_Co/100 for point in points],
+        [point.x_C_N/100 for point in points], columns.columns))
 
 
 
@@ -1,7 +1,14 @@
-from tc_python import *
-import matplotlib.pyplot as plt
 import numpy as np
 import os
+from result_cache import CachedSession
+from curve_store import CurveStore
+from kinetics_metrics import kinetics_metrics
+from precipitation_sweep import PrecipitationSimulation
+from result_store import ResultStore, family_table
+from sweep_engine import TCPythonSession, composition_grid
+from sweep_pipeline import ColumnSink, run_pipeline
+from sweep_profiler import (ProfiledSession, SweepProfiler, checkpoint_completed, load_records, new_run, phase,
+                            report, summarize)
 
 """
 This program simulates the kinetics of precipitation of both stable and metastable carbides from ferrite phase.
@@ -13,6 +20,7 @@ def plot_result(x_time, y_number_density, index, precipitate, fig_extension="PNG
     # save_path = os.path.join(os.path.basename(__file__) + "_cache_", "Figures")
     save_path = os.path.join(".", "preciptation_figures", precipitate)
     path = os.path.join(save_path, str(index) + "_" + precipitate + "." + fig_extension)
+    import matplotlib.pyplot as plt # only imported when figures are saved
     fig, ax = plt.subplots(1)
     fig.suptitle('Precipitation', fontsize=14, fontweight='bold')
     ax.set_xlabel('Time [s]')
@@ -28,74 +36,131 @@ def plot_result(x_time, y_number_density, index, precipitate, fig_extension="PNG
     # plt.cla()
 
 
+# everything except the composition that changes the result of a point: builds the calculation (see
+# precipitation_sweep.py) and keys the result cache, so the two cannot drift apart
+settings = {"calculation": "isothermal_precipitation", "databases": ["TCFE9", "MOBFE5"],
+            "elements": ["Fe", "Cr", "Co", "C", "N"], "composition_unit": "MASS_FRACTION", "max_time_step": 10,
+            "matrix": {"phase": "BCC_A2"},
+            "precipitates": [{"phase": "HCP_A3#2", "interfacial_energy_estimation_prefactor": 1.0, "nucleation": "bulk"}],
+            "temperature": 763.15, "simulation_time": 600, "quantity": "number_density"}
+
+
+def configure(start):
+    """
+    Create and configure the precipitation calculation of `settings`, called once per sweep worker.
+    """
+    return PrecipitationSimulation(settings, os.path.basename(__file__) + "_cache").configure(start)
+
+
+def evaluate(calculation, point):
+    """
+    Simulate one grid point and return the time and number density of HCP_A3#2 as lists.
+    """
+    with phase("calculate"):
+        sim_results = (calculation
+                    .set_composition("Cr", point.x_Cr)
+                    .set_composition("Co", point.x_Co)
+                    .set_composition("C", point.x_C_N)
+                    .set_composition("N", point.x_C_N)
+                    .calculate()
+                    )
+    with phase("extract"):
+        # time_1, number_density_M23C6 = sim_results.get_number_density_of("M23C6")
+        time_2, number_density_HCP_A3 = sim_results.get_number_density_of("HCP_A3#2")
+        return list(time_2), list(number_density_HCP_A3)
+
+
 ##############----------------------updated implementation -----------------------------################
-with TCPython() as start:
-    # create and configure a single equilibrium calculation
-    calculation = ( start
-                   .set_cache_folder(os.path.basename(__file__) + "_cache")
-                   .select_thermodynamic_and_kinetic_databases_with_elements("TCFE9", "MOBFE5", ["Fe", "Cr", "Co", "C", "N"])
-                   .get_system()
-                   .with_isothermal_precipitation_calculation()
-                   .set_composition_unit(CompositionUnit.MASS_FRACTION)
-                   .with_numerical_parameters(NumericalParameters()
-                                                .set_max_time_step(10)
-                                             )
-                   
-                   .with_matrix_phase(MatrixPhase("BCC_A2")
-                                    #  .add_precipitate_phase(PrecipitatePhase("M23C6")
-                                    #                         .set_interfacial_energy_estimation_prefactor(1.0)
-                                    #                         .set_nucleation_in_bulk()
-                                    #                        )
-                                     .add_precipitate_phase(PrecipitatePhase("HCP_A3#2")
-                                                            .set_interfacial_energy_estimation_prefactor(1.0)
-                                                            .set_nucleation_in_bulk()
-                                                           )
-                                     )
-                   .set_temperature(763.15) # 490 degree
-                   .set_simulation_time(600)
-                #    .calculate()
-                   )
-    
+def metrics(batch):
+    """
+    Output records of a batch of (point, (time, number density)), runs in the metric stage of the pipeline.
+    The maximum number density and the precipitation speed (maximum / time of the maximum) of the whole batch
+    come from one vectorized pass, see kinetics_metrics.py for the handling of curves without precipitation.
+    """
+    kinetics = kinetics_metrics([time_2 for point, (time_2, number_density) in batch],
+                                [number_density for point, (time_2, number_density) in batch])
+    return [{"point": point, "index": point.index, "time": time_2, "number_density": number_density_HCP_A3,
+             "max_number_density": kinetics["peak_number_density"][row],
+             "precipitation_speed": kinetics["peak_speed"][row],
+             "time_to_peak": kinetics["time_to_peak"][row],
+             "incubation_time": kinetics["incubation_time"][row]}
+            for row, (point, (time_2, number_density_HCP_A3)) in enumerate(batch)]
+
+
+# result store families written by this script and their columns. The precipitation_HCP_A3 campaign writes
+# "precipitation_HCP_A3#2_kinetics" with other columns, so the names must not overlap.
+FAMILIES = {"precipitation_HCP_A3#2": ["max_number_density", "precipitation_speed"],
+            "precipitation_HCP_A3#2_timing": ["time_to_peak", "incubation_time"]}
+
+
+def write_families(store, points, columns):
+    """
+    Write the full precision column families of the sweep (the grid is already in mass fraction): the
+    ALL_data.csv columns, and the other kinetics metrics in their own family so the layout of ALL_data.csv stays
+    the same.
+    """
+    for family, names in FAMILIES.items():
+        store.write_family(family, family_table(
+            [point.index for point in points], [point.x_Cr for point in points], [point.x_Co for point in points],
+            [point.x_C_N for point in points], {name: columns[name] for name in names}))
+
+
+# the raw curves of every point are kept in the curve store (see curve_store.py for on-demand plots),
+# saving a figure per point during the sweep is optional
+save_figures = False
+
+
+if __name__ == "__main__":
     # in total: 19*11*6 = 1254 combinations
     list_of_x_Cr = np.linspace(10e-2, 145e-3, 19) # (start, stop, number of points). Cr: 19 levels (10-14 wt%)
     list_of_x_Co = np.linspace(0, 5e-2, 11) # Co: 11 levels (0-5 wt%)
     list_of_x_C_N = np.linspace(5e-4, 2e-3, 6) # C and N has the same percentage. C/N: 6 levels (0.1-0.4 wt%) --> 0.05 - 0.2, 
+    points = composition_grid(list_of_x_Cr, list_of_x_Co, list_of_x_C_N)
     # list_of_density_M23C6 = []
-    list_of_density_HCP_A3 = []
-    index = 1
-    for x_Cr in list_of_x_Cr:
-        for x_Co in list_of_x_Co:
-            for x_C_N in list_of_x_C_N:
-                sim_results = (calculation
-                            #    .set_condition(ThermodynamicQuantity.mole_fraction_of_a_component("Cr"), x_Cr)
-                            #    .set_condition(ThermodynamicQuantity.mole_fraction_of_a_component("Co"), x_Co)
-                            #    .set_condition(ThermodynamicQuantity.mole_fraction_of_a_component("C"), x_C_N)
-                            #    .set_condition(ThermodynamicQuantity.mole_fraction_of_a_component("N"), x_C_N)
-                            .set_composition("Cr", x_Cr)
-                            .set_composition("Co", x_Co)
-                            .set_composition("C", x_C_N)
-                            .set_composition("N", x_C_N)
-                            .calculate()
-                            )
-                # time_1, number_density_M23C6 = sim_results.get_number_density_of("M23C6")
-                time_2, number_density_HCP_A3 = sim_results.get_number_density_of("HCP_A3#2")
-          
-                # list_of_density_M23C6.append(number_density_M23C6[-1])
-                # list_of_density_HCP_A3.append(number_density_HCP_A3[-1])
-                output_string = f"Index: {index}" + ", X(Cr)={0:.4f}".format(x_Cr) + " , X(Co)={0:.4f}".format(x_Co) + " , X(C/N)={0:.6f}".format(x_C_N) +  ", Maximum number density of HCP_A3#2 = {0:.4f}".format(max(number_density_HCP_A3)) + "[m-3]" + ", Precipitation speed of HCP_A3#2 = {0:.4f}".format(max(number_density_HCP_A3)/time_2[number_density_HCP_A3.index(max(number_density_HCP_A3))]) + "[m-3 s-1]"
-                # output_string = f"Index: {index}" + ", X(Cr)={0:.4f}".format(x_Cr) + " , X(Co)={0:.4f}".format(x_Co) + " , X(C/N)={0:.6f}".format(x_C_N) + ", Number density of M23C6 at 600s = {0:.4f}".format(number_density_M23C6[-1]) + "[m-3]" +  ", Number density of HCP_A3#2 at 600s = {0:.4f}".format(number_density_HCP_A3[-1]) + "[m-3]"
-                print(output_string)
-                save_file = open("precipitation_data_HCPA3.txt", mode = "a")
-                save_file.write(output_string + "\n")
-                string_2 = f"{index}" + ", {0:.4f}".format(x_Cr) + ", {0:.4f}".format(x_Co) + ", {0:.6f}".format(x_C_N) + ", {0:.4f}".format(max(number_density_HCP_A3))+ ", {0:.4f}".format(max(number_density_HCP_A3)/time_2[number_density_HCP_A3.index(max(number_density_HCP_A3))])
-                # string_2 = f"{index}" + ", {0:.4f}".format(x_Cr) + ", {0:.4f}".format(x_Co) + ", {0:.6f}".format(x_C_N) + ", {0:.4f}".format(number_density_M23C6[-1]) + ", {0:.4f}".format(number_density_HCP_A3[-1])
-                save_file_2 = open("precipitation_data_numerical_HCPA3.txt", mode = "a")
-                save_file_2.write(string_2 + "\n")
-
-                # # save the plot
-                # plot_result(time_1, number_density_M23C6, index, "M23C6")
-                plot_result(time_2, number_density_HCP_A3, index, "HCP_A3")
-                index += 1
+    # per-point timing of the workers, inspect a running sweep with: python sweep_profiler.py <profile directory>
+    profile_directory = new_run(os.path.basename(__file__) + "_profile")
+    session = ProfiledSession(CachedSession(TCPythonSession(configure, evaluate), os.path.basename(__file__) + "_results.sqlite", settings),
+                              profile_directory)
+    columns = ColumnSink(["max_number_density", "precipitation_speed", "time_to_peak", "incubation_time"])
+    if save_figures:
+        import matplotlib
+        matplotlib.use("Agg") # the figures are saved from the writer thread of the pipeline
+    # results stream from the workers through metrics() into the writers, in grid order (also after a resume)
+    with SweepProfiler(profile_directory), open("precipitation_data_HCPA3.txt", mode = "w") as save_file, open("precipitation_data_numerical_HCPA3.txt", mode = "w") as save_file_2, \
+            CurveStore(os.path.basename(__file__) + "_curves.h5", mode="w") as curve_store:
+        def write_text(records):
+            lines = []
+            with phase("format"):
+                for record in records:
+                    point, index = record["point"], record["index"]
+                    x_Cr, x_Co, x_C_N = point.x_Cr, point.x_Co, point.x_C_N
+                    output_string = f"Index: {index}" + ", X(Cr)={0:.4f}".format(x_Cr) + " , X(Co)={0:.4f}".format(x_Co) + " , X(C/N)={0:.6f}".format(x_C_N) +  ", Maximum number density of HCP_A3#2 = {0:.4f}".format(record["max_number_density"]) + "[m-3]" + ", Precipitation speed of HCP_A3#2 = {0:.4f}".format(record["precipitation_speed"]) + "[m-3 s-1]"
+                    string_2 = f"{index}" + ", {0:.4f}".format(x_Cr) + ", {0:.4f}".format(x_Co) + ", {0:.6f}".format(x_C_N) + ", {0:.4f}".format(record["max_number_density"])+ ", {0:.4f}".format(record["precipitation_speed"])
+                    lines.append((output_string, string_2))
+            with phase("write"):
+                for output_string, string_2 in lines:
+                    print(output_string)
+                    save_file.write(output_string + "\n")
+                    save_file_2.write(string_2 + "\n")
+
+        def write_curves(records):
+            with phase("write"):
+                for record in records:
+                    curve_store.write(record["index"], {"time": record["time"], "number_density": record["number_density"]})
+
+        def write_figures(records):
+            with phase("plot"):
+                for record in records:
+                    # plot_result(time_1, number_density_M23C6, index, "M23C6")
+                    plot_result(record["time"], record["number_density"], record["index"], "HCP_A3")
+
+        sinks = [write_text, write_curves, columns] + ([write_figures] if save_figures else [])
+        run_pipeline(points, session, os.path.basename(__file__) + "_checkpoint.sqlite", metrics, sinks,
+                     settings=settings)
+    print(report(summarize(load_records(profile_directory), len(points),
+                           checkpoint_completed(os.path.basename(__file__) + "_checkpoint.sqlite"))))
+
+    write_families(ResultStore("result_store"), points, columns.columns)
 
     # np.savetxt("precipitation_data_2(M23C6).txt", list_of_density_M23C6, fmt='%.4f')  
     # np.savetxt("precipitation_data_HCPA3_2(HCP_A3).txt", list_of_density_M23C6, fmt='%.4f') 
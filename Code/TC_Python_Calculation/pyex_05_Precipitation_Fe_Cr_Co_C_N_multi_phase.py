@@ -0,0 +1,74 @@
+import numpy as np
+import os
+from result_cache import CachedSession
+from checkpoint import run_checkpointed_sweep
+from curve_store import CurveStore
+from precipitation_sweep import PrecipitationSimulation, final_values, flatten_phases
+from result_store import ResultStore, family_table
+from sweep_engine import TCPythonSession, composition_grid
+from sweep_profiler import (ProfiledSession, SweepProfiler, checkpoint_completed, load_records, new_run, phase,
+                            report, summarize)
+
+"""
+Simulates the precipitation of all the carbides and nitrides of pyex_02 and pyex_04 (CEMENTITE, M7C3, M23C6 and
+HCP_A3#2) from ferrite in one run per grid point: the precipitates share one BCC_A2 matrix, so the databases are
+loaded once per worker and every point needs a single calculate(). Number density, volume fraction and mean radius
+of every phase are kept in the curve store, their final values in the result store.
+"""
+
+
+##############----------------------updated implementation -----------------------------################
+# everything except the composition that changes the result of a point, used as result cache key
+# and to build the calculation (see precipitation_sweep.py)
+settings = {"calculation": "isothermal_precipitation", "databases": ["TCFE9", "MOBFE5"],
+            "elements": ["Fe", "Cr", "Co", "C", "N"], "composition_unit": "MASS_PERCENT",
+            "matrix": {"phase": "BCC_A2", "grain_radius": 1.e-4},
+            "precipitates": [{"phase": "CEMENTITE", "interfacial_energy": 0.167, "nucleation": "grain_boundaries"},
+                             {"phase": "M7C3", "interfacial_energy": 0.282, "nucleation": "grain_boundaries"},
+                             {"phase": "M23C6", "interfacial_energy": 0.252, "nucleation": "grain_boundaries"},
+                             {"phase": "HCP_A3#2", "interfacial_energy_estimation_prefactor": 1.0, "nucleation": "bulk"}],
+            "temperature": 763.15, "simulation_time": 300, "quantity": "number_density,volume_fraction,mean_radius"}
+
+simulation = PrecipitationSimulation(settings, os.path.basename(__file__) + "_cache")
+
+
+if __name__ == "__main__":
+    # in total: 19*11*6 = 1254 combinations
+    list_of_x_Cr = np.linspace(10e-2, 145e-3, 19)*100 # (start, stop, number of points). Cr: 19 levels (10-14wt%)
+    list_of_x_Co = np.linspace(0, 5e-2, 11)*100 # Co: 11 levels (0-5 wt%)
+    list_of_x_C_N = np.linspace(15e-4, 4e-3, 6)*100 # C and N has the same percentage. C/N: 6 levels (0.15-0.4 wt%)
+    points = composition_grid(list_of_x_Cr, list_of_x_Co, list_of_x_C_N)
+    # per-point timing of the workers, inspect a running sweep with: python sweep_profiler.py <profile directory>
+    profile_directory = new_run(os.path.basename(__file__) + "_profile")
+    session = ProfiledSession(CachedSession(TCPythonSession(simulation.configure, simulation.evaluate),
+                                            os.path.basename(__file__) + "_results.sqlite", settings),
+                              profile_directory)
+    results = run_checkpointed_sweep(points, session, os.path.basename(__file__) + "_checkpoint.sqlite",
+                                     settings=settings)
+    columns = final_values(results, simulation.phases)
+    # results are complete and sorted, so the text output is rewritten in one go
+    with SweepProfiler(profile_directory), open("precipitation_data_multi_phase.txt", mode = "w") as save_file, \
+            CurveStore(os.path.basename(__file__) + "_curves.h5", mode="w") as curve_store:
+        with phase("write"):
+            for index, curves in results:
+                curve_store.write(index, flatten_phases(curves))
+        with phase("format"):
+            lines = []
+            for row, (point, (index, curves)) in enumerate(zip(points, results)):
+                output_string = f"Index: {index}" + ", X(Cr)={0:.2f}".format(point.x_Cr) + " , X(Co)={0:.2f}".format(point.x_Co) + " , X(C/N)={0:.4f}".format(point.x_C_N)
+                for name in simulation.phases:
+                    output_string += ", {0}: N = {1:.4e} [m-3], f = {2:.4e}, r = {3:.4e} [m]".format(
+                        name, columns[f"{name}_final_number_density"][row], columns[f"{name}_final_volume_fraction"][row],
+                        columns[f"{name}_final_mean_radius"][row])
+                lines.append(output_string)
+        with phase("write"):
+            for output_string in lines:
+                print(output_string)
+                save_file.write(output_string + "\n")
+    print(report(summarize(load_records(profile_directory), len(points),
+                           checkpoint_completed(os.path.basename(__file__) + "_checkpoint.sqlite"))))
+
+    # full precision column family (mass fraction composition)
+    ResultStore("result_store").write_family("precipitation_multi_phase", family_table(
+        [point.index for point in points], [point.x_Cr/100 for point in points], [point.x_Co/100 for point in points],
+        [point.x_C_N/100 for point in points], columns))
@@ -0,0 +1,300 @@
+"""
+Persistent per-point result cache for the composition sweeps.
+
+The TC-Python cache folder (set_cache_folder) only caches databases and systems. This cache stores the
+result of every calculated grid point in a SQLite file, keyed by a hash of the calculation settings
+(databases, elements, temperature, simulation time, matrix/precipitate settings, ...) and the rounded
+composition, so a repeated point is answered without calling the calculator.
+
+With a composition tolerance, CachedSession also answers a point from the nearest cached composition of the
+same settings when every element is within its tolerance (see composition_index.py). Such a point is counted
+as a near hit, neither as a hit nor as a miss.
+
+The last access times of the hits, which order the least recently used eviction, are kept in memory and written
+in one transaction when the cache evicts, is closed or reports its stats, so the hits of concurrent workers do
+not each wait for a write lock.
+
+Timings describe a calculation, not its result: the "timing" entry of a dictionary result (e.g. of
+sweep_order.WarmStartEvaluate) is returned when the point is calculated but not cached, so a cache hit has none.
+"""
+import hashlib
+import json
+import pickle
+import sqlite3
+import time
+
+import numpy as np
+
+
+TIMING_KEY = "timing"
+_MISSING = object()
+
+
+def settings_hash(settings):
+    """
+    Stable hash of a settings dictionary (must be JSON serializable).
+    """
+    text = json.dumps(settings, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def cache_key(settings, composition, decimals=6):
+    """
+    Key of one point: hash of the settings and of the composition rounded to `decimals`.
+
+    Args:
+        settings: dictionary (or precomputed settings_hash string) describing the calculation
+        composition: dictionary element -> amount, e.g. {"Cr": 12.0, "Co": 2.5, "C": 0.2, "N": 0.2}
+    """
+    if not isinstance(settings, str):
+        settings = settings_hash(settings)
+    rounded = {element: round(float(amount), decimals) + 0.0 for element, amount in composition.items()}
+    return settings_hash({"settings": settings, "composition": rounded})
+
+
+def point_composition(point):
+    """
+    Composition dictionary of a GridPoint (C and N share the same amount).
+    """
+    return {"Cr": point.x_Cr, "Co": point.x_Co, "C": point.x_C_N, "N": point.x_C_N}
+
+
+def point_conditions(point):
+    """
+    Composition dictionary of a GridPoint plus its temperature "T" when the point has one.
+    """
+    conditions = point_composition(point)
+    if getattr(point, "temperature", None) is not None:
+        conditions["T"] = point.temperature
+    return conditions
+
+
+def without_timing(result):
+    """
+    The result as it is cached: a dictionary result without its TIMING_KEY entry.
+    """
+    if isinstance(result, dict) and TIMING_KEY in result:
+        return {name: value for name, value in result.items() if name != TIMING_KEY}
+    return result
+
+
+class ResultCache:
+    """
+    SQLite backed key -> result store with least recently used eviction.
+
+    Args:
+        path: SQLite file, shared by all the sweep workers
+        max_entries: keep at most this many results, None for no limit
+        max_bytes: keep at most this many bytes of pickled results, None for no limit
+    """
+
+    def __init__(self, path, max_entries=None, max_bytes=None):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.near_hits = 0
+        self._accessed = {}
+        self._connection = None
+
+    def open(self):
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, timeout=60)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("CREATE TABLE IF NOT EXISTS results ("
+                                     "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, "
+                                     "last_access REAL NOT NULL)")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS results_last_access ON results (last_access)")
+            self._connection.execute("CREATE TABLE IF NOT EXISTS compositions ("
+                                     "key TEXT PRIMARY KEY, settings TEXT NOT NULL, composition TEXT NOT NULL)")
+            self._connection.execute("CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            self._connection.commit()
+        return self
+
+    def close(self):
+        if self._connection is not None:
+            self._flush_access()
+            self._flush_stats()
+            self._connection.close()
+            self._connection = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def lookup(self, key, default=None):
+        """
+        Cached result of a key, default when there is none, without counting a hit or a miss.
+        """
+        row = self._connection.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return default
+        self._accessed[key] = time.time()
+        return pickle.loads(row[0])
+
+    def get(self, key, default=None):
+        result = self.lookup(key, _MISSING)
+        if result is _MISSING:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return result
+
+    def __contains__(self, key):
+        return self._connection.execute("SELECT 1 FROM results WHERE key = ?", (key,)).fetchone() is not None
+
+    def put(self, key, value, settings=None, composition=None):
+        """
+        Store a result. With the settings hash and the composition, the point is also listed by compositions().
+        """
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        self._connection.execute("INSERT OR REPLACE INTO results (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                                 (key, blob, len(blob), time.time()))
+        if composition is not None:
+            self._connection.execute("INSERT OR REPLACE INTO compositions (key, settings, composition) VALUES (?, ?, ?)",
+                                     (key, settings, json.dumps(composition, sort_keys=True)))
+        self.evict()
+        self._connection.commit()
+
+    def compositions(self, settings):
+        """
+        Compositions (dictionaries) of the cached results calculated with the given settings hash.
+        """
+        rows = self._connection.execute("SELECT c.composition FROM compositions c JOIN results r ON c.key = r.key "
+                                        "WHERE c.settings = ?", (settings,)).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def evict(self):
+        """
+        Delete the least recently used results until the size limits are met.
+        """
+        self._flush_access()
+        if self.max_entries is not None:
+            self._connection.execute("DELETE FROM results WHERE key IN (SELECT key FROM results "
+                                     "ORDER BY last_access DESC LIMIT -1 OFFSET ?)", (self.max_entries,))
+        if self.max_bytes is not None:
+            total = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+            if total > self.max_bytes:
+                rows = self._connection.execute("SELECT key, size FROM results ORDER BY last_access").fetchall()
+                stale = []
+                for key, size in rows:
+                    if total <= self.max_bytes:
+                        break
+                    stale.append((key,))
+                    total -= size
+                self._connection.executemany("DELETE FROM results WHERE key = ?", stale)
+        self._connection.execute("DELETE FROM compositions WHERE key NOT IN (SELECT key FROM results)")
+
+    def _flush_access(self):
+        """
+        Write the last access times of the hits since the previous flush (not committed).
+        """
+        if self._accessed:
+            self._connection.executemany("UPDATE results SET last_access = MAX(last_access, ?) WHERE key = ?",
+                                         [(accessed, key) for key, accessed in self._accessed.items()])
+            self._accessed = {}
+
+    def _flush_stats(self):
+        for name, value in (("hits", self.hits), ("misses", self.misses), ("near_hits", self.near_hits)):
+            self._connection.execute("INSERT INTO stats (name, value) VALUES (?, ?) "
+                                     "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value", (name, value))
+        self._connection.commit()
+        self.hits = 0
+        self.misses = 0
+        self.near_hits = 0
+
+    def stats(self):
+        """
+        Hit, near hit and miss counters accumulated over all sessions plus the current entry count and size. The
+        hit rate is the fraction of the lookups answered by the exact key.
+        """
+        self._flush_access()
+        self._flush_stats()
+        stats = dict(self._connection.execute("SELECT name, value FROM stats").fetchall())
+        entries, size = self._connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        hits, misses, near_hits = stats.get("hits", 0), stats.get("misses", 0), stats.get("near_hits", 0)
+        lookups = hits + misses + near_hits
+        return {"hits": hits, "misses": misses, "near_hits": near_hits, "hit_rate": hits / lookups if lookups else 0.0,
+                "entries": entries, "bytes": size}
+
+
+class CachedSession:
+    """
+    Wrap a calculator session (see sweep_engine) so that cached points skip the calculator.
+
+    Args:
+        session: the wrapped session, only entered when the first cache miss happens
+        path: SQLite cache file
+        settings: dictionary describing everything except the composition that changes the result
+        decimals: composition rounding used in the key
+        tolerance: optional dictionary element -> largest difference still answered by the nearest cached
+            composition, e.g. {"Cr": 0.05, "Co": 0.05, "C": 0.002, "N": 0.002} in the unit of the points.
+            The neighbours are those cached before the session was entered, at the same temperature.
+    """
+
+    def __init__(self, session, path, settings, decimals=6, max_entries=None, max_bytes=None, tolerance=None):
+        self.session = session
+        self.path = path
+        self.settings = settings
+        self.decimals = decimals
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.tolerance = tolerance
+        self.cache = None
+        self.index = None
+        self._neighbours = []
+        self._calculator = None
+        self._settings_hash = settings_hash(settings)
+
+    def __enter__(self):
+        self.cache = ResultCache(self.path, self.max_entries, self.max_bytes).open()
+        if self.tolerance is not None:
+            from composition_index import CompositionIndex
+
+            self._neighbours = self.cache.compositions(self._settings_hash)
+            self.index = CompositionIndex(self._neighbours, scale=self.tolerance, elements=list(self.tolerance),
+                                          p=np.inf)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.cache.close()
+        calculator, self._calculator = self._calculator, None
+        if calculator is not None:
+            return self.session.__exit__(exc_type, exc_value, traceback)
+        return False
+
+    def nearby(self, composition):
+        """
+        Cached result of the nearest composition within the tolerance, _MISSING when there is none.
+        """
+        positions = [position for position in self.index.within([composition], 1.0)[0]
+                     if self._neighbours[position].get("T") == composition.get("T")]
+        if not positions:
+            return _MISSING
+        query = np.array([composition[element] for element in self.index.elements])
+        distances = np.abs((self.index.compositions[positions] - query) / self.index.scale).max(axis=1)
+        neighbour = self._neighbours[positions[int(np.argmin(distances))]]
+        return self.cache.lookup(cache_key(self._settings_hash, neighbour, self.decimals), _MISSING)
+
+    def calculate(self, point):
+        composition = point_conditions(point)
+        key = cache_key(self._settings_hash, composition, self.decimals)
+        result = self.cache.lookup(key, _MISSING)
+        if result is not _MISSING:
+            self.cache.hits += 1
+        elif self.index is not None:
+            result = self.nearby(composition)
+            if result is not _MISSING:
+                self.cache.near_hits += 1
+        if result is _MISSING:
+            self.cache.misses += 1
+            if self._calculator is None:
+                self._calculator = self.session.__enter__()
+            result = self._calculator.calculate(point)
+            self.cache.put(key, without_timing(result), self._settings_hash, composition)
+        return result
+
@@ -0,0 +1,239 @@
+"""
+Typed columnar result store for the sweep outputs.
+
+Every script writes its own column family (equilibrium, scheil, precipitation, ...) into one store
+directory as an Arrow IPC file with full float64 precision. A family always holds the composition index
+"Index" and the composition columns "Cr", "Co", "C" as fractions, in mass fraction unless its schema metadata
+records "composition_unit" = "mole_fraction" (a campaign calculated in mole units). The sweeps use different
+grids, so the families are joined on the (rounded) composition, not on their indices, and only families of
+the same unit are joined. ALL_data.csv is produced by
+export_all_data_csv instead of stitching the text outputs together by hand.
+
+Arrow IPC files are read with memory mapping, so the ML stage can open large stores without copying.
+"""
+import os
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv
+import pyarrow.parquet
+
+
+KEY_COLUMN = "Index"
+COMPOSITION_COLUMNS = ["Cr", "Co", "C"]
+COMPOSITION_UNITS = ("mass_fraction", "mole_fraction")
+
+# column families joined into ALL_data.csv, in the ALL_data.csv column order. Every entry lists alternative
+# (family, columns) sources, the first one in the store with all its columns is used; columns None takes all
+# the columns of the family, a dictionary selects and renames them. The precipitation columns come from
+# pyex_04 or from the precipitation_HCP_A3 campaign.
+ALL_DATA_SOURCES = [
+    [("equilibrium", None)],
+    [("scheil", None)],
+    [("precipitation_HCP_A3#2", {"max_number_density": "Maximum nunmber density",
+                                 "precipitation_speed": "Precipitation speed"}),
+     ("precipitation_HCP_A3#2_kinetics", {"HCP_A3#2_peak_number_density": "Maximum nunmber density",
+                                          "HCP_A3#2_peak_speed": "Precipitation speed"})],
+]
+
+
+def family_table(index, x_Cr, x_Co, x_C, columns, unit="mass_fraction"):
+    """
+    Build the Arrow table of one column family.
+
+    Args:
+        index: composition index of every row
+        x_Cr, x_Co, x_C: composition of every row in `unit`
+        columns: dictionary column name -> values, missing values as NaN
+        unit: "mass_fraction" or "mole_fraction", recorded in the schema metadata
+    """
+    if unit not in COMPOSITION_UNITS:
+        raise ValueError(f"composition unit must be one of {COMPOSITION_UNITS}, got {unit!r}")
+    arrays = {KEY_COLUMN: pa.array(np.asarray(index, dtype=np.int64)),
+              "Cr": pa.array(np.asarray(x_Cr, dtype=np.float64)),
+              "Co": pa.array(np.asarray(x_Co, dtype=np.float64)),
+              "C": pa.array(np.asarray(x_C, dtype=np.float64))}
+    for name, values in columns.items():
+        arrays[name] = pa.array(np.asarray(values, dtype=np.float64))
+    return pa.table(arrays, metadata={"composition_unit": unit})
+
+
+def composition_unit(table):
+    """
+    Composition unit of a family table, mass fraction when it records none.
+    """
+    metadata = table.schema.metadata or {}
+    return metadata.get(b"composition_unit", b"mass_fraction").decode()
+
+
+class ResultStore:
+    """
+    Directory with one Arrow IPC file per column family.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def path(self, family):
+        return os.path.join(self.directory, family + ".arrow")
+
+    def families(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name[:-len(".arrow")] for name in os.listdir(self.directory) if name.endswith(".arrow"))
+
+    def write_family(self, family, table):
+        """
+        Write (replace) a column family. The rows are sorted by index and must be unique.
+        """
+        for column in [KEY_COLUMN] + COMPOSITION_COLUMNS:
+            if column not in table.column_names:
+                raise ValueError(f"column family {family} has no {column} column")
+        index = table.column(KEY_COLUMN).to_numpy()
+        if len(np.unique(index)) != len(index):
+            raise ValueError(f"column family {family} has duplicated indices")
+        table = table.take(pa.array(np.argsort(index, kind="stable")))
+        os.makedirs(self.directory, exist_ok=True)
+        temporary_path = self.path(family) + ".tmp"
+        with pa.OSFile(temporary_path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(temporary_path, self.path(family))
+
+    def read_family(self, family, columns=None):
+        """
+        Read a column family through a memory map, optionally only some columns.
+        """
+        source = pa.memory_map(self.path(family), "r")
+        table = pa.ipc.open_file(source).read_all()
+        if columns is not None:
+            table = table.select(list(columns))
+        return table
+
+    def join(self, families, how="inner", decimals=9, columns=None):
+        """
+        Join several column families on the composition, i.e. Cr, Co, C rounded to `decimals`. The families
+        may come from different grids (pyex_04 uses another C/N range than pyex_01/03) and number their points
+        independently, so their own indices are not compared.
+
+        Args:
+            families: column families to join
+            how: "inner" keeps the compositions present in every family, "outer" all of them with the missing
+                values as nulls
+            decimals: rounding of the mass fractions in the composition key
+            columns: optional dictionary family -> {column: output name} selecting (and renaming) the columns
+                of some families; the other families contribute all their columns
+
+        Returns the joined table. Its rows are sorted by Cr, Co, C and its Index numbers them from 1, like
+        ALL_data.csv. Raises a ValueError when the families differ in composition unit, a family holds a
+        composition more than once (e.g. a temperature axis) or a column is in more than one family.
+        """
+        if how not in ("inner", "outer"):
+            raise ValueError(f"unknown join {how!r}, use 'inner' or 'outer'")
+        columns = columns or {}
+        tables = [self.read_family(family) for family in families]
+        units = {composition_unit(table) for table in tables}
+        if len(units) > 1:
+            raise ValueError(f"cannot join families with different composition units {sorted(units)}")
+        keys = []
+        for family, table in zip(families, tables):
+            key = np.round(np.column_stack([table.column(column).to_numpy() for column in COMPOSITION_COLUMNS]),
+                           decimals)
+            if len(np.unique(key, axis=0)) != len(key):
+                raise ValueError(f"column family {family} holds a composition more than once")
+            keys.append(key)
+
+        # unique compositions (sorted by Cr, Co, C) and the row of every family for each of them
+        compositions, inverse = np.unique(np.concatenate(keys), axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        rows, start = [], 0
+        for key in keys:
+            family_rows = np.full(len(compositions), -1, dtype=np.int64)
+            family_rows[inverse[start:start + len(key)]] = np.arange(len(key))
+            rows.append(family_rows)
+            start += len(key)
+        if how == "inner":
+            keep = np.all([family_rows >= 0 for family_rows in rows], axis=0)
+            compositions = compositions[keep]
+            rows = [family_rows[keep] for family_rows in rows]
+
+        arrays = {KEY_COLUMN: pa.array(np.arange(1, len(compositions) + 1, dtype=np.int64))}
+        for position, column in enumerate(COMPOSITION_COLUMNS):
+            arrays[column] = pa.array(compositions[:, position])
+        for family, table, family_rows in zip(families, tables, rows):
+            selected = columns.get(family, {column: column for column in table.column_names
+                                            if column not in [KEY_COLUMN] + COMPOSITION_COLUMNS})
+            taken = table.select(list(selected)).take(pa.array(family_rows, mask=family_rows < 0))
+            for column, name in selected.items():
+                if name in arrays:
+                    raise ValueError(f"column {name} is in more than one family")
+                arrays[name] = taken.column(column)
+        return pa.table(arrays, metadata={"composition_unit": units.pop() if units else "mass_fraction"})
+
+    def to_parquet(self, path, families=None, how="outer"):
+        """
+        Join the families (all by default) into one Parquet file, see join.
+        """
+        pyarrow.parquet.write_table(self.join(families or self.families(), how), path)
+
+
+def all_data_sources(store, sources=ALL_DATA_SOURCES):
+    """
+    The (family, columns) source of every ALL_data.csv entry found in the store.
+    Raises a ValueError naming the alternatives when an entry has none.
+    """
+    selected = []
+    for alternatives in sources:
+        for family, columns in alternatives:
+            if family in store.families() and (columns is None or set(columns) <= set(
+                    store.read_family(family).column_names)):
+                selected.append((family, columns))
+                break
+        else:
+            raise ValueError("the result store has none of the column families "
+                             + ", ".join(family for family, columns in alternatives))
+    return selected
+
+
+def all_data_table(store, how="inner", decimals=9):
+    """
+    The ALL_data.csv table: the ALL_data families joined on the composition. The default inner join keeps the
+    compositions calculated by every family, so the data set has no missing values.
+    """
+    sources = all_data_sources(store)
+    table = store.join([family for family, columns in sources], how, decimals,
+                       {family: columns for family, columns in sources if columns is not None})
+    if composition_unit(table) != "mass_fraction":
+        raise ValueError("ALL_data.csv needs the compositions in mass fraction, the families use "
+                         + composition_unit(table))
+    return table
+
+
+def export_all_data_csv(store, path, how="inner", decimals=9):
+    """
+    Produce ALL_data.csv (Index, Cr, Co, C, Density, phase amounts, HCS, GRF, SR, maximum number density,
+    precipitation speed) from the equilibrium, scheil and precipitation families of the store, see
+    all_data_table. Returns the table written.
+    """
+    table = all_data_table(store, how, decimals)
+    with open(path, "wb") as csv_file:
+        # unquoted header like the original ALL_data.csv
+        csv_file.write((",".join(table.column_names) + "\n").encode("utf-8"))
+        pyarrow.csv.write_csv(table, csv_file, pyarrow.csv.WriteOptions(include_header=False))
+    return table
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Join the column families of a result store into ALL_data.csv")
+    parser.add_argument("store", nargs="?", default="result_store", help="result store directory")
+    parser.add_argument("output", nargs="?", default="ALL_data.csv", help="output CSV file")
+    parser.add_argument("--how", choices=["inner", "outer"], default="inner",
+                        help="inner: compositions calculated by every family, outer: all (missing values empty)")
+    args = parser.parse_args()
+    store = ResultStore(args.store)
+    table = export_all_data_csv(store, args.output, args.how)
+    for family, columns in all_data_sources(store):
+        print(f"{family}: {store.read_family(family, [KEY_COLUMN]).num_rows} compositions")
+    print(f"{table.num_rows} compositions written to {args.output} ({args.how} join)")
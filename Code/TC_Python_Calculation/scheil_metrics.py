@@ -0,0 +1,128 @@
+"""
+Vectorized Scheil-curve metrics over whole batches of curves.
+
+A Scheil curve is the mole fraction of all solid phases (x) vs. temperature (y), given either as one pair of
+arrays or as sections grouped by stable phases. The sections are concatenated, sorted by solid fraction and
+deduplicated (np.interp silently requires increasing x), padded into 2D arrays and interpolated for every
+curve at once:
+
+    T(f)  temperature at solid fraction f, clamped to the ends of the curve like np.interp
+    HCS   hot cracking susceptibility (t_0.9 - t_1.0)/(t_0.4 - t_0.9), t_f = (T(0) - T(f))/100
+    GRF   growth restriction factor |T(0.05) - T(0)|/0.05
+    SR    solidification range T(0) - T(1)
+"""
+import numpy as np
+
+
+def curve_from_sections(sections):
+    """
+    Concatenate {label: (x, y)} sections into one (x, y) pair of arrays.
+    """
+    x = np.concatenate([np.asarray(section[0], dtype=np.float64) for section in sections.values()] or [[]])
+    y = np.concatenate([np.asarray(section[1], dtype=np.float64) for section in sections.values()] or [[]])
+    return x, y
+
+
+def prepare_curve(x, y):
+    """
+    Sort one curve by solid fraction and drop repeated fractions (the first point in solidification order is kept,
+    i.e. the one shared with the previous section).
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    valid = np.isfinite(x) & np.isfinite(y)
+    x, y = x[valid], y[valid]
+    order = np.argsort(x, kind="stable")
+    x, y = x[order], y[order]
+    keep = np.ones(len(x), dtype=bool)
+    keep[1:] = x[1:] != x[:-1]
+    return x[keep], y[keep]
+
+
+def pad_curves(curves):
+    """
+    Prepare a list of ragged (x, y) curves and pad them into (n, m) arrays by repeating the last point.
+    Returns X, Y and the length of every curve.
+    """
+    prepared = [prepare_curve(x, y) for x, y in curves]
+    lengths = np.array([len(x) for x, _ in prepared], dtype=np.int64)
+    if np.any(lengths == 0):
+        raise ValueError(f"empty Scheil curve at position {int(np.argmin(lengths))}")
+    m = int(lengths.max()) if len(lengths) else 1
+    X = np.empty((len(prepared), m))
+    Y = np.empty((len(prepared), m))
+    for row, (x, y) in enumerate(prepared):
+        X[row, :len(x)], X[row, len(x):] = x, x[-1]
+        Y[row, :len(y)], Y[row, len(y):] = y, y[-1]
+    return X, Y, lengths
+
+
+def interpolate(fractions, X, Y, lengths):
+    """
+    Interpolate every padded curve at every fraction in one pass, returns an (n, k) array of temperatures.
+    """
+    fractions = np.atleast_1d(np.asarray(fractions, dtype=np.float64))
+    n, m = X.shape
+    rows = np.arange(n)
+    lower, upper = X[:, 0], X[rows, lengths - 1]
+    query = np.clip(fractions[None, :], lower[:, None], upper[:, None])
+    # shift every row into its own disjoint range, so one searchsorted on the flat array serves all curves
+    step = (np.max(X) - np.min(X)) + 1.0 if X.size else 1.0
+    offset = rows * step
+    flat = (X + offset[:, None]).ravel()
+    position = np.searchsorted(flat, (query + offset[:, None]).ravel(), side="right") - 1
+    position = position.reshape(n, -1) - (rows * m)[:, None]
+    position = np.clip(position, 0, np.maximum(lengths - 2, 0)[:, None])
+    following = np.minimum(position + 1, m - 1)
+    x0, x1 = X[rows[:, None], position], X[rows[:, None], following]
+    y0, y1 = Y[rows[:, None], position], Y[rows[:, None], following]
+    width = x1 - x0
+    weight = np.divide(query - x0, width, out=np.zeros_like(query), where=width > 0)
+    return y0 + weight * (y1 - y0)
+
+
+def temperatures_at(curves, fractions):
+    """
+    Temperature at the given solid fractions for every curve, (n, k) array.
+    """
+    return interpolate(fractions, *pad_curves(curves))
+
+
+def scheil_metrics(curves, decimals=None):
+    """
+    HCS, GRF and SR of every curve.
+
+    Args:
+        curves: list of (x, y) pairs or of {label: (x, y)} section dictionaries
+        decimals: round the interpolated temperatures first, 4 reproduces the values of ALL_data.csv
+    Returns:
+        dictionary "HCS", "GRF", "SR" -> arrays
+    """
+    curves = [curve_from_sections(curve) if isinstance(curve, dict) else curve for curve in curves]
+    temperatures = temperatures_at(curves, [0.0, 0.05, 0.4, 0.9, 1.0])
+    if decimals is not None:
+        temperatures = np.round(temperatures, decimals)
+    t_00, t_005, t_04, t_09, t_10 = temperatures.T
+    dt_09 = (t_00 - t_09)/100
+    dt_10 = (t_00 - t_10)/100
+    dt_04 = (t_00 - t_04)/100
+    with np.errstate(divide="ignore", invalid="ignore"):
+        hcs = (dt_09 - dt_10)/(dt_04 - dt_09)
+    return {"HCS": hcs,
+            "GRF": np.abs((t_005 - t_00)/0.05),
+            "SR": t_00 - t_10}
+
+
+def metrics_from_curve_store(path, decimals=None):
+    """
+    Re-derive the metrics of every point stored by pyex_03 in a curve store, returns (indices, metrics).
+    """
+    from curve_store import CurveStore
+
+    with CurveStore(path, mode="r") as store:
+        indices = store.indices()
+        curves = []
+        for index in indices:
+            stored, _ = store.read(index, ["x", "y"])
+            curves.append((stored["x"], stored["y"]))
+    return np.array(indices), scheil_metrics(curves, decimals)
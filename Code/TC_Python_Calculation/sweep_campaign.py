@@ -0,0 +1,579 @@
+"""
+Declarative sweep campaigns: one entry point for equilibrium, Scheil and precipitation sweeps, driven by a
+TOML or YAML spec instead of a hand-edited script (see the campaigns directory for the pyex_01..04 sweeps).
+
+    [campaign]       name (prefix of the cache, checkpoint, curve and text files), result store and family,
+                     text output, curve store on/off
+    [composition]    unit of the values and either a factorial grid (Cr, Co, C_N = [start, stop, levels])
+                     or a sampler ("sobol"/"lhs" with points and seed inside bounds), visiting order
+    [calculation]    type ("single_equilibrium", "scheil", "precipitation"), databases, elements, the
+                     composition unit handed to TC-Python, temperature, precipitation matrix/precipitates, ...
+                     temperatures = [...] sweeps every composition at each temperature [K]; output_times = [...]
+                     reports precipitation metrics at each time [s], sliced from one simulation_time run
+    [adaptive]       optional active learning rounds after a sampler design (see adaptive_sampling.py): rounds,
+                     batch_size, targets (result columns the surrogate is fitted on), acquisition = {senses
+                     (+1 minimize, -1 maximize, for the Pareto bonus), pareto_weight, candidates, min_distance}
+    [parallel]       processes, chunk size, pipeline batch size, per-point profiling, cache_tolerance =
+                     {Cr, Co, C_N} answers a point from the nearest cached composition within these
+                     differences (in the composition unit of the spec) instead of calculating it
+
+Compositions are converted from the unit of the spec to the unit of the calculation (percent/fraction), and
+equilibrium conditions use mass (W) or mole (X) fractions according to that unit, so a spec can never feed mass
+percent into a mole fraction condition. The result store family keeps the compositions as fractions of that
+basis and records the unit (mass or mole fraction). The spec is validated completely before anything is
+started. Every worker builds its TC-Python session once, the results
+stream through the pipeline of sweep_pipeline.py into the outputs.
+
+    python sweep_campaign.py campaigns/scheil.toml [--processes 8] [--dry-run] [--fake]
+"""
+import contextlib
+
+import numpy as np
+
+from curve_store import CurveStore, flatten_sections
+from kinetics_metrics import kinetics_metrics
+from precipitation_sweep import PrecipitationSimulation, flatten_phases, slice_curves
+from result_cache import CachedSession
+from result_store import ResultStore, family_table
+from scheil_metrics import scheil_metrics
+from sweep_engine import GridPoint, SweepPool, TCPythonSession, composition_grid, temperature_grid
+from sweep_order import WarmStartEvaluate, hilbert_order, serpentine_order
+from sweep_pipeline import run_pipeline
+from sweep_profiler import (ProfiledSession, SweepProfiler, checkpoint_completed, load_records, new_run, phase,
+                            report, summarize)
+
+
+UNITS = ("mass_percent", "mass_fraction", "mole_percent", "mole_fraction")
+CALCULATIONS = ("single_equilibrium", "scheil", "precipitation")
+# GridPoint field -> elements set to that value (C and N always have the same content)
+COMPONENTS = {"x_Cr": ("Cr",), "x_Co": ("Co",), "x_C_N": ("C", "N")}
+
+
+def load_spec(path):
+    """
+    Read a campaign spec from a .toml, .yaml or .yml file.
+    """
+    if path.endswith(".toml"):
+        try:
+            import tomllib
+        except ImportError:
+            # Python < 3.11: the tomli backport (requirements.txt)
+            import tomli as tomllib
+        with open(path, "rb") as spec_file:
+            return tomllib.load(spec_file)
+    if path.endswith((".yaml", ".yml")):
+        import yaml
+        with open(path) as spec_file:
+            return yaml.safe_load(spec_file)
+    raise ValueError(f"unknown spec format of {path}, expected .toml, .yaml or .yml")
+
+
+# ---- units ------#
+def convert_composition(values, from_unit, to_unit):
+    """
+    Convert an (n, 3) array of Cr, Co, C/N contents between percent and fraction of the same basis.
+
+    Mass and mole units cannot be converted into each other here: C and N share one content value, which
+    is no longer true for both of them in the other basis.
+    """
+    if from_unit.split("_")[0] != to_unit.split("_")[0]:
+        raise ValueError(f"cannot convert {from_unit} to {to_unit}, C and N would no longer have the same content")
+    values = np.asarray(values, dtype=np.float64).reshape(-1, 3)
+    fractions = values / 100 if from_unit.endswith("_percent") else values
+    return fractions * 100 if to_unit.endswith("_percent") else fractions.copy()
+
+
+def _convert_points(points, from_unit, to_unit):
+    values = convert_composition([[point.x_Cr, point.x_Co, point.x_C_N] for point in points], from_unit, to_unit)
+    return [point._replace(x_Cr=float(row[0]), x_Co=float(row[1]), x_C_N=float(row[2]))
+            for point, row in zip(points, values)]
+
+
+# ---- validation ------#
+def validate_spec(spec):
+    """
+    Check the whole spec and raise ValueError listing every problem.
+    """
+    problems = []
+    campaign = spec.get("campaign", {})
+    composition = spec.get("composition", {})
+    calculation = spec.get("calculation", {})
+    if "name" not in campaign:
+        problems.append("campaign.name is missing")
+
+    unit = composition.get("unit")
+    if unit not in UNITS:
+        problems.append(f"composition.unit must be one of {UNITS}, got {unit!r}")
+    if "sampler" in composition:
+        if composition["sampler"] not in ("sobol", "lhs"):
+            problems.append(f"composition.sampler must be 'sobol' or 'lhs', got {composition['sampler']!r}")
+        if int(composition.get("points", 0)) < 1:
+            problems.append("composition.points must be a positive number of samples")
+        ranges = [composition.get("bounds", {}).get(name) for name in ("Cr", "Co", "C_N")]
+        if any(bounds is None or len(bounds) != 2 for bounds in ranges):
+            problems.append("composition.bounds needs [lower, upper] for Cr, Co and C_N")
+            ranges = []
+    else:
+        ranges = [composition.get(name) for name in ("Cr", "Co", "C_N")]
+        if any(levels is None or len(levels) != 3 or int(levels[2]) < 1 for levels in ranges):
+            problems.append("composition needs Cr, Co and C_N as [start, stop, levels] (or a sampler)")
+            ranges = []
+    order = composition.get("order", "grid")
+    if order not in ("grid", "serpentine", "hilbert"):
+        problems.append(f"composition.order must be 'grid', 'serpentine' or 'hilbert', got {order!r}")
+    if order == "serpentine" and "sampler" in composition:
+        problems.append("composition.order = 'serpentine' needs a factorial grid, use 'hilbert' for a sampler")
+    if unit in UNITS and ranges:
+        limit = 100.0 if unit.endswith("_percent") else 1.0
+        lowest = np.array([min(values[0], values[1]) for values in ranges])
+        highest = np.array([max(values[0], values[1]) for values in ranges])
+        if np.any(lowest < 0) or np.any(highest > limit):
+            problems.append(f"composition values must lie in [0, {limit:g}] for unit {unit}")
+        # C and N are both set to the C/N value, Fe is the balance
+        if highest[0] + highest[1] + 2*highest[2] >= limit:
+            problems.append(f"composition leaves no Fe balance (Cr + Co + 2 C/N >= {limit:g} {unit})")
+
+    kind = calculation.get("type")
+    if kind not in CALCULATIONS:
+        problems.append(f"calculation.type must be one of {CALCULATIONS}, got {kind!r}")
+    target_unit = calculation.get("composition_unit", unit)
+    if target_unit not in UNITS:
+        problems.append(f"calculation.composition_unit must be one of {UNITS}")
+    elif unit in UNITS and unit.split("_")[0] != target_unit.split("_")[0]:
+        problems.append(f"composition.unit {unit} and calculation.composition_unit {target_unit} mix mass and mole "
+                        f"units")
+    elements = calculation.get("elements", [])
+    missing = {"Fe", "Cr", "Co", "C", "N"} - set(elements)
+    if missing:
+        problems.append(f"calculation.elements lacks {sorted(missing)}")
+    databases = calculation.get("databases", [])
+    if kind == "precipitation" and len(databases) != 2:
+        problems.append("a precipitation calculation needs [thermodynamic, kinetic] databases")
+    elif kind in ("single_equilibrium", "scheil") and len(databases) != 1:
+        problems.append(f"a {kind} calculation needs one database")
+    if kind in ("single_equilibrium", "precipitation") and ("temperature" in calculation) == \
+            ("temperatures" in calculation):
+        problems.append(f"a {kind} calculation needs either a temperature or a list of temperatures [K]")
+    if "temperatures" in calculation:
+        temperatures = calculation["temperatures"]
+        if kind == "scheil":
+            problems.append("a scheil calculation has no temperature axis")
+        elif not temperatures or any(temperature <= 0 for temperature in temperatures):
+            problems.append("calculation.temperatures must be a non-empty list of positive temperatures [K]")
+        elif len(set(temperatures)) != len(temperatures):
+            problems.append("calculation.temperatures must not repeat a temperature")
+    if "output_times" in calculation:
+        output_times = calculation["output_times"]
+        if kind != "precipitation":
+            problems.append("calculation.output_times needs a precipitation calculation")
+        elif not output_times or any(time <= 0 for time in output_times):
+            problems.append("calculation.output_times must be a non-empty list of positive times [s]")
+        elif max(output_times) > calculation.get("simulation_time", np.inf):
+            problems.append("calculation.output_times must not exceed the simulation_time, they are sliced from it")
+    if kind == "precipitation":
+        if "simulation_time" not in calculation:
+            problems.append("a precipitation calculation needs a simulation_time [s]")
+        if not calculation.get("precipitates"):
+            problems.append("a precipitation calculation needs at least one precipitate")
+        if "matrix" not in calculation:
+            problems.append("a precipitation calculation needs a matrix phase")
+
+    adaptive = spec.get("adaptive")
+    if adaptive is not None:
+        acquisition = adaptive.get("acquisition", {})
+        if "sampler" not in composition:
+            problems.append("adaptive rounds need a sampler design (composition.sampler and bounds)")
+        if "temperatures" in calculation:
+            problems.append("adaptive rounds sample compositions only, not a list of temperatures")
+        if int(adaptive.get("rounds", 0)) < 1 or int(adaptive.get("batch_size", 0)) < 1:
+            problems.append("adaptive.rounds and adaptive.batch_size must be at least 1")
+        if not adaptive.get("targets"):
+            problems.append("adaptive.targets must list the result columns the surrogate is fitted on")
+        senses = acquisition.get("senses")
+        if senses is not None and (len(senses) != len(adaptive.get("targets") or []) or
+                                   any(sense not in (1, -1) for sense in senses)):
+            problems.append("adaptive.acquisition.senses needs +1 (minimize) or -1 (maximize) for every target")
+        if float(acquisition.get("min_distance", 0.05)) < 0 or int(acquisition.get("candidates", 4096)) < 1:
+            problems.append("adaptive.acquisition needs a min_distance >= 0 and at least one candidate")
+
+    processes = spec.get("parallel", {}).get("processes")
+    if processes is not None and int(processes) < 1:
+        problems.append("parallel.processes must be at least 1")
+    tolerance = spec.get("parallel", {}).get("cache_tolerance")
+    if tolerance is not None and (not isinstance(tolerance, dict) or set(tolerance) != {"Cr", "Co", "C_N"}
+                                  or not all(isinstance(value, (int, float)) and value > 0
+                                             for value in tolerance.values())):
+        problems.append("parallel.cache_tolerance needs positive Cr, Co and C_N differences")
+    if problems:
+        raise ValueError("invalid campaign spec:\n  " + "\n  ".join(problems))
+
+
+def campaign_points(spec):
+    """
+    Grid points of the campaign in the composition unit of the calculation, in visiting order.
+    """
+    composition = spec["composition"]
+    if "sampler" in composition:
+        from adaptive_sampling import initial_design, to_points
+
+        bounds = [composition["bounds"][name] for name in ("Cr", "Co", "C_N")]
+        points = to_points(initial_design(int(composition["points"]), bounds, composition["sampler"],
+                                          composition.get("seed")))
+    else:
+        levels = [np.linspace(start, stop, int(number)) for start, stop, number in
+                  (composition[name] for name in ("Cr", "Co", "C_N"))]
+        points = composition_grid(*levels)
+    points = _convert_points(points, composition["unit"], calculation_unit(spec))
+    order = composition.get("order", "grid")
+    if order == "serpentine":
+        points = serpentine_order(points, tuple(int(composition[name][2]) for name in ("Cr", "Co", "C_N")))
+    elif order == "hilbert":
+        points = hilbert_order(points)
+    if "temperatures" in spec["calculation"]:
+        points = temperature_grid(points, spec["calculation"]["temperatures"])
+    return points
+
+
+def adaptive_sampler(spec):
+    """
+    AdaptiveSampler of the [adaptive] section, over the sampler bounds in the composition unit of the
+    calculation (the unit of the points).
+    """
+    from adaptive_sampling import AdaptiveSampler
+
+    composition = spec["composition"]
+    acquisition = spec["adaptive"].get("acquisition", {})
+    bounds = np.array([composition["bounds"][name] for name in ("Cr", "Co", "C_N")], dtype=np.float64)
+    bounds = convert_composition(bounds.T, composition["unit"], calculation_unit(spec)).T
+    return AdaptiveSampler(bounds, acquisition.get("senses"), acquisition.get("pareto_weight", 1.0),
+                           int(acquisition.get("candidates", 4096)), seed=composition.get("seed"))
+
+
+def adaptive_targets(spec, collector):
+    """
+    (n, k) values of the adaptive.targets columns of every collected point.
+    """
+    columns = collector.columns()
+    missing = [target for target in spec["adaptive"]["targets"] if target not in columns]
+    if missing:
+        raise ValueError(f"adaptive.targets {missing} are not result columns, the campaign has {sorted(columns)}")
+    return np.column_stack([np.asarray(columns[target], dtype=np.float64) for target in spec["adaptive"]["targets"]])
+
+
+def calculation_unit(spec):
+    return spec["calculation"].get("composition_unit", spec["composition"]["unit"])
+
+
+def cache_tolerance(spec):
+    """
+    Composition tolerance of the result cache (see CachedSession) in the unit of the points, None without one.
+    """
+    tolerance = spec.get("parallel", {}).get("cache_tolerance")
+    if tolerance is None:
+        return None
+    values = convert_composition([[tolerance[name] for name in ("Cr", "Co", "C_N")]], spec["composition"]["unit"],
+                                 calculation_unit(spec))[0]
+    return {element: float(values[column]) for column, field in enumerate(COMPONENTS)
+            for element in COMPONENTS[field]}
+
+
+# ---- calculations ------#
+class EquilibriumSimulation:
+    """
+    Single equilibrium configure/evaluate pair, returns {"density" [kg/m3], "phase_amounts"} per point
+    (plus the "timing" of WarmStartEvaluate with warm_start, which the result cache does not store).
+    """
+
+    def __init__(self, settings, cache_folder):
+        self.settings = settings
+        self.cache_folder = cache_folder
+        self.warm_start = WarmStartEvaluate(self.calculate_point, self.extract) if settings.get("warm_start") else None
+
+    def configure(self, start):
+        from tc_python import ThermodynamicQuantity
+
+        calculation = (start
+                       .set_cache_folder(self.cache_folder)
+                       .select_database_and_elements(self.settings["databases"][0], self.settings["elements"])
+                       .get_system()
+                       .with_single_equilibrium_calculation()
+                       )
+        if "temperature" in self.settings:
+            calculation = calculation.set_condition(ThermodynamicQuantity.temperature(), self.settings["temperature"])
+        if self.warm_start is not None:
+            calculation = calculation.disable_global_minimization()
+        return calculation
+
+    def calculate_point(self, calculation, point):
+        from tc_python import ThermodynamicQuantity
+
+        # conditions are fractions; the unit decides between mole (X) and mass (W) fractions
+        unit = self.settings["composition_unit"]
+        quantity = (ThermodynamicQuantity.mole_fraction_of_a_component if unit.startswith("mole")
+                    else ThermodynamicQuantity.mass_fraction_of_a_component)
+        scale = 100 if unit.endswith("_percent") else 1
+        if point.temperature is not None:
+            calculation = calculation.set_condition(ThermodynamicQuantity.temperature(), point.temperature)
+        with phase("calculate"):
+            for field, elements in COMPONENTS.items():
+                for element in elements:
+                    calculation = calculation.set_condition(quantity(element), getattr(point, field) / scale)
+            return calculation.calculate()
+
+    def extract(self, calc_result):
+        with phase("extract"):
+            density = 1e-3 * calc_result.get_value_of("BM") / calc_result.get_value_of("VM")
+            phase_amounts = {name: calc_result.get_value_of("NP(" + name + ")")
+                             for name in calc_result.get_stable_phases()}
+            return {"density": density, "phase_amounts": phase_amounts}
+
+    def evaluate(self, calculation, point):
+        if self.warm_start is None:
+            return self.extract(self.calculate_point(calculation, point))
+        value = self.warm_start(calculation, point)
+        return dict(value["result"], timing=value["timing"])
+
+
+class ScheilSimulation:
+    """
+    Scheil configure/evaluate pair, returns the curve {label: (x, y)} of every point.
+    """
+
+    def __init__(self, settings, cache_folder):
+        self.settings = settings
+        self.cache_folder = cache_folder
+
+    def configure(self, start):
+        from tc_python import CompositionUnit
+
+        return (start
+                .set_cache_folder(self.cache_folder)
+                .select_database_and_elements(self.settings["databases"][0], self.settings["elements"])
+                .get_system_for_scheil_calculations()
+                .with_scheil_calculation()
+                .set_composition_unit(getattr(CompositionUnit, self.settings["composition_unit"].upper()))
+                )
+
+    def evaluate(self, calculation, point):
+        from tc_python import ScheilQuantity
+
+        with phase("calculate"):
+            for field, elements in COMPONENTS.items():
+                for element in elements:
+                    calculation = calculation.set_composition(element, getattr(point, field))
+            result = calculation.calculate()
+        with phase("extract"):
+            curve = result.get_values_grouped_by_stable_phases_of(ScheilQuantity.mole_fraction_of_all_solid_phases(),
+                                                                  ScheilQuantity.temperature())
+            return {label: (list(curve[label].x), list(curve[label].y)) for label in curve}
+
+
+def calculation_settings(spec):
+    """
+    Everything except the composition that changes the result of a point: builds the calculation and keys the
+    result cache. The temperature axis is part of the points (and of their cache keys) and the output times
+    only concern the metrics, so neither is part of the settings.
+    """
+    settings = dict(spec["calculation"])
+    settings.pop("temperatures", None)
+    settings.pop("output_times", None)
+    settings["calculation"] = settings.pop("type")
+    settings["composition_unit"] = calculation_unit(spec)
+    return settings
+
+
+def make_simulation(spec, cache_folder):
+    settings = calculation_settings(spec)
+    kind = settings["calculation"]
+    if kind == "single_equilibrium":
+        return EquilibriumSimulation(settings, cache_folder)
+    if kind == "scheil":
+        return ScheilSimulation(settings, cache_folder)
+    return PrecipitationSimulation(dict(settings, composition_unit=settings["composition_unit"].upper()),
+                                   cache_folder)
+
+
+# ---- metrics ------#
+def make_metrics(spec):
+    """
+    metrics(batch) of the pipeline: records with the result store columns and the curves of every point.
+    """
+    kind = spec["calculation"]["type"]
+    output_times = spec["calculation"].get("output_times")
+
+    def metrics(batch):
+        if kind == "single_equilibrium":
+            columns = []
+            for point, value in batch:
+                # the solve times of a warm start stay in the profile records
+                row = {"Density": value["density"]}
+                row.update(value["phase_amounts"])
+                columns.append(row)
+            curves = [None] * len(batch)
+        elif kind == "scheil":
+            batch_metrics = scheil_metrics([value for point, value in batch], decimals=4)
+            columns = [{name: batch_metrics[name][row] for name in ("HCS", "GRF", "SR")} for row in range(len(batch))]
+            curves = [flatten_sections(value) for point, value in batch]
+        else:
+            columns = [{} for _ in batch]
+            # the metrics at every output time, on the curves sliced from the one simulation of the point
+            for end_time in output_times or [None]:
+                values = [value if end_time is None else slice_curves(value, end_time) for point, value in batch]
+                suffix = "" if end_time is None else f"_{end_time:g}s"
+                for name in values[0]:
+                    kinetics = kinetics_metrics([value[name]["time"] for value in values],
+                                                [value[name]["number_density"] for value in values],
+                                                [value[name]["volume_fraction"] for value in values])
+                    for row, value in enumerate(values):
+                        for metric, metric_values in kinetics.items():
+                            columns[row][f"{name}_{metric}{suffix}"] = metric_values[row]
+                        columns[row][f"{name}_final_mean_radius{suffix}"] = (value[name]["mean_radius"][-1]
+                                                                             if value[name]["mean_radius"] else np.nan)
+            curves = [(flatten_phases(value), "") for point, value in batch]
+        return [{"point": point, "index": point.index, "columns": row, "curves": curve}
+                for (point, value), row, curve in zip(batch, columns, curves)]
+
+    return metrics
+
+
+class FamilyCollector:
+    """
+    Sink collecting the columns of the records; rows without a column get `fill` (0 for phase amounts).
+    With `leading`, those columns come first and the others (e.g. phases) follow in alphabetical order.
+    """
+
+    def __init__(self, fill=np.nan, leading=None):
+        self.fill = fill
+        self.leading = leading
+        self.points = []
+        self.rows = []
+
+    def __call__(self, records):
+        for record in records:
+            self.points.append(record["point"])
+            self.rows.append(record["columns"])
+
+    def columns(self):
+        names = list(dict.fromkeys(name for row in self.rows for name in row))
+        if self.leading is not None:
+            names = list(self.leading) + sorted(set(names) - set(self.leading))
+        return {name: [row.get(name, self.fill) for row in self.rows] for name in names}
+
+
+def run_campaign(spec, processes=None):
+    """
+    Validate and run one campaign, returns the collected result store columns.
+    """
+    validate_spec(spec)
+    campaign = spec["campaign"]
+    parallel = spec.get("parallel", {})
+    name = campaign["name"]
+    points = campaign_points(spec)
+    settings = calculation_settings(spec)
+    simulation = make_simulation(spec, name + "_cache")
+    session = CachedSession(TCPythonSession(simulation.configure, simulation.evaluate), name + "_results.sqlite",
+                            settings, tolerance=cache_tolerance(spec))
+    profile = contextlib.nullcontext()
+    if parallel.get("profile", True):
+        profile_directory = new_run(name + "_profile")
+        session = ProfiledSession(session, profile_directory, parallel.get("profile_every"))
+        profile = SweepProfiler(profile_directory)
+
+    kind = spec["calculation"]["type"]
+    collector = FamilyCollector(0.0, ["Density"]) if kind == "single_equilibrium" else FamilyCollector()
+    sinks = [collector]
+    adaptive = spec.get("adaptive")
+    processes = processes or parallel.get("processes")
+    # adaptive rounds share one pool, its workers (and their TC-Python sessions) are started once
+    workers = SweepPool(session, processes) if adaptive is not None else contextlib.nullcontext()
+    with profile, open(campaign.get("text", name + ".txt"), mode="w") as save_file, \
+            CurveStore(name + "_curves.h5", mode="w") as curve_store, workers as pool:
+        def write_text(records):
+            lines = []
+            with phase("format"):
+                for record in records:
+                    point = record["point"]
+                    output_string = f"Index: {record['index']}" + ", X(Cr)={0:.4f}".format(point.x_Cr) + ", X(Co)={0:.4f}".format(point.x_Co) + ", X(C/N)={0:.6f}".format(point.x_C_N)
+                    if point.temperature is not None:
+                        output_string += ", T = {0:.2f} K".format(point.temperature)
+                    output_string += "".join(", {0} = {1:.4g}".format(column, value) for column, value in record["columns"].items())
+                    lines.append(output_string)
+            with phase("write"):
+                for output_string in lines:
+                    print(output_string)
+                    save_file.write(output_string + "\n")
+
+        def write_curves(records):
+            with phase("write"):
+                for record in records:
+                    if record["curves"] is not None:
+                        curve_store.write(record["index"], *record["curves"])
+
+        sinks.append(write_text)
+        if campaign.get("curves", True) and kind != "single_equilibrium":
+            sinks.append(write_curves)
+
+        checkpoints = []
+
+        def run_round(round_points, checkpoint_path):
+            checkpoints.append(checkpoint_path)
+            run_pipeline(round_points, session, checkpoint_path, make_metrics(spec), sinks, processes,
+                         parallel.get("chunk_size"), parallel.get("batch_size", 50), settings=settings, pool=pool)
+
+        run_round(points, name + "_checkpoint.sqlite")
+        if adaptive is not None:
+            from adaptive_sampling import propose_points
+
+            # every round has its own checkpoint; the sampler is seeded, so a rerun proposes the same points
+            sampler = adaptive_sampler(spec)
+            acquisition = adaptive.get("acquisition", {})
+            for round_number in range(1, int(adaptive["rounds"]) + 1):
+                proposed = propose_points(sampler, collector.points, adaptive_targets(spec, collector),
+                                          int(adaptive["batch_size"]), len(points) + 1,
+                                          float(acquisition.get("min_distance", 0.05)))
+                if not proposed:
+                    break
+                print(f"Adaptive round {round_number}: {len(proposed)} new points")
+                run_round(proposed, f"{name}_checkpoint_round{round_number}.sqlite")
+                points = points + proposed
+    if parallel.get("profile", True):
+        completed = sum(checkpoint_completed(path) for path in checkpoints)
+        print(report(summarize(load_records(profile_directory), len(points), completed)))
+
+    # result store compositions are fractions of the calculation basis, the family records which
+    unit = calculation_unit(spec).split("_")[0] + "_fraction"
+    compositions = convert_composition([[point.x_Cr, point.x_Co, point.x_C_N] for point in collector.points],
+                                       calculation_unit(spec), unit)
+    columns = collector.columns()
+    if "temperatures" in spec["calculation"]:
+        columns = dict(temperature=[point.temperature for point in collector.points], **columns)
+    ResultStore(campaign.get("store", "result_store")).write_family(campaign.get("family", name), family_table(
+        [point.index for point in collector.points], compositions[:, 0], compositions[:, 1], compositions[:, 2],
+        columns, unit))
+    return columns
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run a sweep campaign from a TOML/YAML spec")
+    parser.add_argument("spec", help="campaign spec (.toml, .yaml)")
+    parser.add_argument("--processes", type=int, default=None, help="overrides parallel.processes")
+    parser.add_argument("--dry-run", action="store_true", help="validate the spec and list the points only")
+    parser.add_argument("--fake", action="store_true", help="run on the fake TC-Python backend (fake_tc_python.py)")
+    args = parser.parse_args()
+
+    spec = load_spec(args.spec)
+    validate_spec(spec)
+    if args.dry_run:
+        points = campaign_points(spec)
+        print(f"{spec['campaign']['name']}: {len(points)} points of {spec['calculation']['type']}, "
+              f"compositions in {calculation_unit(spec)} (spec in {spec['composition']['unit']})")
+        for point in points[:3] + points[-3:]:
+            print(f"  {point.index}: Cr = {point.x_Cr:.6g}, Co = {point.x_Co:.6g}, C/N = {point.x_C_N:.6g}"
+                  + (f", T = {point.temperature:g} K" if point.temperature is not None else ""))
+    else:
+        if args.fake:
+            import fake_tc_python
+            fake_tc_python.install()
+        run_campaign(spec, args.processes)
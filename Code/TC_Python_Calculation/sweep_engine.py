@@ -0,0 +1,281 @@
+"""
+Shared sweep engine for the Fe-Cr-Co-C-N composition grid.
+
+The grid is split into chunks which are handed to a process pool. Every worker owns one calculator
+session that is built once (for TC-Python: one TCPython() session and one configured calculation) and
+reused for all the chunks it receives. Results are merged back in grid index order. A SweepPool keeps the
+workers and their sessions alive over several sweeps, e.g. the rounds of an adaptive sweep.
+
+The calculator backend is pluggable: anything with __enter__/__exit__ and a calculate(point) method
+can be used as a session, e.g. TCPythonSession for the real calculations or FunctionSession for a
+local stand-in calculator.
+"""
+import math
+import multiprocessing as mp
+import os
+import threading
+import time
+from collections import namedtuple
+from multiprocessing import util
+
+import numpy as np
+
+from sweep_profiler import phase
+
+
+# temperature [K] of the point, None for the temperature configured in the calculation
+GridPoint = namedtuple("GridPoint", ["index", "x_Cr", "x_Co", "x_C_N", "temperature"], defaults=(None,))
+
+
+def composition_grid(list_of_x_Cr, list_of_x_Co, list_of_x_C_N, start_index=1):
+    """
+    Build the list of grid points in the same order as the original triple-nested loops
+    (Cr outermost, C/N innermost). The index starts at 1 like the text outputs.
+    """
+    points = []
+    index = start_index
+    for x_Cr in list_of_x_Cr:
+        for x_Co in list_of_x_Co:
+            for x_C_N in list_of_x_C_N:
+                points.append(GridPoint(index, float(x_Cr), float(x_Co), float(x_C_N)))
+                index += 1
+    return points
+
+
+def default_grid(scale=100):
+    """
+    The 19*11*6 = 1254 point grid used by the scripts. scale=100 gives mass percent, scale=1 mass fraction.
+    """
+    list_of_x_Cr = np.linspace(10e-2, 145e-3, 19)*scale # Cr: 19 levels (10-14.5 wt%)
+    list_of_x_Co = np.linspace(0, 5e-2, 11)*scale # Co: 11 levels (0-5 wt%)
+    list_of_x_C_N = np.linspace(15e-4, 4e-3, 6)*scale # C and N has the same percentage. C/N: 6 levels (0.15-0.4 wt%)
+    return composition_grid(list_of_x_Cr, list_of_x_Co, list_of_x_C_N)
+
+
+def temperature_grid(points, temperatures, start_index=1):
+    """
+    Repeat the composition points at every temperature [K], the temperature being the outermost loop so that
+    consecutive points keep the composition order. The points are renumbered from start_index.
+    """
+    return [point._replace(index=start_index + i*len(points) + j, temperature=float(temperature))
+            for i, temperature in enumerate(temperatures) for j, point in enumerate(points)]
+
+
+def chunk_points(points, chunk_size):
+    """
+    Split the points into consecutive chunks of at most chunk_size points.
+    """
+    return [points[i:i + chunk_size] for i in range(0, len(points), chunk_size)]
+
+
+class TCPythonSession:
+    """
+    One TCPython() session plus one calculation object built from the fluent configuration.
+
+    Args:
+        configure: function(start) -> calculation, receives the object returned by TCPython().__enter__()
+        evaluate: function(calculation, point) -> result, must return picklable data (floats, lists, dicts)
+
+    Both functions must be defined at module level so that they can be sent to the worker processes.
+    """
+
+    def __init__(self, configure, evaluate):
+        self.configure = configure
+        self.evaluate = evaluate
+        self.calculation = None
+        self.startup = {}
+        self._tc_python = None
+
+    def __enter__(self):
+        # startup cost in seconds, reported by ProfiledSession. A session entered lazily inside a profiled
+        # point (CachedSession) shows up as the "startup" phase of that point.
+        with phase("startup"):
+            started = time.perf_counter()
+            from tc_python import TCPython
+            imported = time.perf_counter()
+            self._tc_python = TCPython()
+            start = self._tc_python.__enter__()
+            connected = time.perf_counter()
+            self.calculation = self.configure(start)
+            self.startup = {"import": imported - started, "tc_python": connected - imported,
+                            "configure": time.perf_counter() - connected}
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.calculation = None
+        tc_python, self._tc_python = self._tc_python, None
+        if tc_python is not None:
+            return tc_python.__exit__(exc_type, exc_value, traceback)
+        return False
+
+    def calculate(self, point):
+        return self.evaluate(self.calculation, point)
+
+
+class FunctionSession:
+    """
+    Local calculator session: calls function(point) directly, without any TC-Python license.
+    """
+
+    def __init__(self, function):
+        self.function = function
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def calculate(self, point):
+        return self.function(point)
+
+
+# ---- worker side ------#
+_worker_session = None
+_worker_boot = None
+
+
+def worker_boot_seconds():
+    """
+    Time from the creation of the pool to the start of this worker's initializer (process start and, with the
+    spawn/forkserver start methods, the import of the main module), None outside a pool worker.
+    """
+    return _worker_boot
+
+
+def _close_worker_session():
+    global _worker_session
+    if _worker_session is not None:
+        _worker_session.__exit__(None, None, None)
+        _worker_session = None
+
+
+def _init_worker(session, created=None):
+    global _worker_session, _worker_boot
+    if created is not None:
+        _worker_boot = time.time() - created
+    _worker_session = session.__enter__()
+    # closed when the worker exits after pool.close()/pool.join()
+    util.Finalize(None, _close_worker_session, exitpriority=10)
+
+
+def _run_chunk(chunk):
+    return [(point.index, _worker_session.calculate(point)) for point in chunk]
+
+
+# ---- main side ------#
+class SweepPool:
+    """
+    Worker pool whose sessions are started once and reused by every sweep run on it:
+
+        with SweepPool(session, processes) as pool:
+            for points in rounds:
+                run_sweep(points, session, pool=pool)
+
+    With processes=1 the session is entered in this process instead.
+    """
+
+    def __init__(self, session, processes=None):
+        self.session = session
+        self.processes = max(1, processes or os.cpu_count() or 1)
+        self.pool = None
+        self.calculator = None
+
+    def __enter__(self):
+        if self.processes == 1:
+            self.calculator = self.session.__enter__()
+        else:
+            self.pool = mp.Pool(self.processes, initializer=_init_worker, initargs=(self.session, time.time()))
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        calculator, self.calculator = self.calculator, None
+        if calculator is not None:
+            return self.session.__exit__(exc_type, exc_value, traceback)
+        pool, self.pool = self.pool, None
+        if exc_type is None:
+            pool.close()
+        else:
+            pool.terminate()
+        pool.join()
+        return False
+
+
+def iter_sweep(points, session, processes=None, chunk_size=None, ordered=False, max_pending=None, pool=None):
+    """
+    Calculate every point and yield the results chunk by chunk as a list of (index, result).
+    Chunks are yielded in completion order, not in index order, unless ordered is set.
+
+    Args:
+        points: list of GridPoint
+        session: calculator session (TCPythonSession, FunctionSession, ...)
+        processes: number of worker processes, defaults to the number of cores. 1 runs in this process.
+        chunk_size: number of points per task, defaults to about four chunks per worker
+        ordered: yield the chunks in the order of the points
+        max_pending: at most this many chunks are submitted to the pool but not yet consumed by the caller,
+            so a slow consumer throttles the workers instead of piling up results in memory
+        pool: entered SweepPool of this session to run on (processes is then ignored), chunks submitted by a
+            sweep that is abandoned early are still calculated in the background
+    """
+    points = list(points)
+    if not points:
+        return
+    if pool is not None:
+        processes = pool.processes
+    elif processes is None:
+        processes = os.cpu_count() or 1
+    processes = max(1, min(processes, len(points)))
+    if chunk_size is None:
+        chunk_size = max(1, math.ceil(len(points) / (4*processes)))
+    chunks = chunk_points(points, chunk_size)
+
+    if pool is not None and pool.calculator is not None:
+        for chunk in chunks:
+            yield [(point.index, pool.calculator.calculate(point)) for point in chunk]
+        return
+    if pool is None and processes == 1:
+        with session as calculator:
+            for chunk in chunks:
+                yield [(point.index, calculator.calculate(point)) for point in chunk]
+        return
+
+    gate = threading.Semaphore(max_pending) if max_pending else None
+    stop = threading.Event()
+
+    def submitted_chunks():
+        # runs in the task handler thread of the pool, which blocks here while max_pending chunks are out
+        for chunk in chunks:
+            while gate is not None and not gate.acquire(timeout=0.1):
+                if stop.is_set():
+                    return
+            yield chunk
+
+    own_pool = pool is None
+    workers = mp.Pool(processes, initializer=_init_worker, initargs=(session, time.time())) if own_pool else pool.pool
+    try:
+        imap = workers.imap if ordered else workers.imap_unordered
+        for chunk_result in imap(_run_chunk, submitted_chunks()):
+            yield chunk_result
+            if gate is not None:
+                gate.release()
+        if own_pool:
+            workers.close()
+    except BaseException:
+        stop.set()
+        if own_pool:
+            workers.terminate()
+        raise
+    finally:
+        stop.set()
+        if own_pool:
+            workers.join()
+
+
+def run_sweep(points, session, processes=None, chunk_size=None, pool=None):
+    """
+    Calculate every point and return the list of (index, result) sorted by index.
+    """
+    results = {}
+    for chunk_result in iter_sweep(points, session, processes, chunk_size, pool=pool):
+        results.update(chunk_result)
+    return [(index, results[index]) for index in sorted(results)]
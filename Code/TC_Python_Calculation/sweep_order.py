@@ -0,0 +1,127 @@
+"""
+Visiting orders for composition sweeps in which consecutive points are neighbours, so that every
+equilibrium can start from the previous one (see WarmStartEvaluate).
+
+    serpentine_order  boustrophedon walk over a full factorial grid, every step changes one level
+    hilbert_order     3D Hilbert curve order for arbitrary (e.g. adaptive) compositions
+"""
+import time
+
+import numpy as np
+
+from result_cache import TIMING_KEY
+
+
+def serpentine_order(points, shape):
+    """
+    Reorder the points of composition_grid (Cr outermost, C/N innermost) so that the Co direction reverses
+    on every other Cr level and the C/N direction on every other Co line.
+
+    Args:
+        points: list of GridPoint in composition_grid order
+        shape: number of levels (Cr, Co, C/N), e.g. (19, 11, 6)
+    """
+    n_Cr, n_Co, n_C_N = shape
+    if len(points) != n_Cr * n_Co * n_C_N:
+        raise ValueError(f"{len(points)} points do not match a {shape} grid")
+    order = []
+    line = 0
+    for i in range(n_Cr):
+        for j in (range(n_Co) if i % 2 == 0 else reversed(range(n_Co))):
+            for k in (range(n_C_N) if line % 2 == 0 else reversed(range(n_C_N))):
+                order.append(points[(i*n_Co + j)*n_C_N + k])
+            line += 1
+    return order
+
+
+def hilbert_index(coordinates, bits):
+    """
+    Hilbert curve distance of integer coordinates (n, d) in [0, 2**bits), Skilling's transpose algorithm.
+    """
+    x = np.array(coordinates, dtype=np.int64)
+    n, d = x.shape
+    # inverse undo of the excess work
+    q = 1 << (bits - 1)
+    while q > 1:
+        p = q - 1
+        for i in range(d):
+            high = (x[:, i] & q) != 0
+            x[high, 0] ^= p
+            t = np.where(high, 0, (x[:, 0] ^ x[:, i]) & p)
+            x[:, 0] ^= t
+            x[:, i] ^= t
+        q >>= 1
+    # Gray encode
+    for i in range(1, d):
+        x[:, i] ^= x[:, i - 1]
+    t = np.zeros(n, dtype=np.int64)
+    q = 1 << (bits - 1)
+    while q > 1:
+        t = np.where((x[:, d - 1] & q) != 0, t ^ (q - 1), t)
+        q >>= 1
+    for i in range(d):
+        x[:, i] ^= t
+    # interleave the transposed bits into one distance
+    distance = np.zeros(n, dtype=np.int64)
+    for bit in range(bits - 1, -1, -1):
+        for i in range(d):
+            distance = (distance << 1) | ((x[:, i] >> bit) & 1)
+    return distance
+
+
+def hilbert_order(points, bits=10):
+    """
+    Reorder arbitrary points along a 3D Hilbert curve over their bounding box.
+    """
+    points = list(points)
+    if len(points) < 2:
+        return points
+    compositions = np.array([[point.x_Cr, point.x_Co, point.x_C_N] for point in points], dtype=float)
+    lower, upper = compositions.min(axis=0), compositions.max(axis=0)
+    span = np.where(upper > lower, upper - lower, 1.0)
+    coordinates = np.round((compositions - lower) / span * ((1 << bits) - 1)).astype(np.int64)
+    return [points[i] for i in np.argsort(hilbert_index(coordinates, bits), kind="stable")]
+
+
+class WarmStartEvaluate:
+    """
+    evaluate(calculation, point) for TCPythonSession that keeps global minimization disabled, so every solve
+    starts from the previous equilibrium of the same worker, and falls back to global minimization when the
+    set of stable phases changes (and for the first point of a worker).
+
+    Args:
+        calculate: function(calculation, point) -> equilibrium result of TC-Python
+        extract: function(result) -> picklable data of the point
+    Returns per point:
+        dictionary with "result", "phases" and "timing" = {"solve_time" [s], "global_minimization"}; the
+        timing is not stored by CachedSession, so a point answered from the cache has none
+    """
+
+    def __init__(self, calculate, extract):
+        self.calculate = calculate
+        self.extract = extract
+        self.previous_phases = None
+
+    def __call__(self, calculation, point):
+        start = time.perf_counter()
+        global_minimization = self.previous_phases is None
+        if global_minimization:
+            calc_result = self._calculate_with_global_minimization(calculation, point)
+        else:
+            calc_result = self.calculate(calculation, point)
+        phases = frozenset(calc_result.get_stable_phases())
+        if not global_minimization and phases != self.previous_phases:
+            global_minimization = True
+            calc_result = self._calculate_with_global_minimization(calculation, point)
+            phases = frozenset(calc_result.get_stable_phases())
+        self.previous_phases = phases
+        return {"result": self.extract(calc_result),
+                "phases": sorted(phases),
+                TIMING_KEY: {"solve_time": time.perf_counter() - start, "global_minimization": global_minimization}}
+
+    def _calculate_with_global_minimization(self, calculation, point):
+        calculation.enable_global_minimization()
+        try:
+            return self.calculate(calculation, point)
+        finally:
+            calculation.disable_global_minimization()
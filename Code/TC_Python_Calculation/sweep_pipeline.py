@@ -0,0 +1,181 @@
+"""
+Streaming sweep pipeline: calculator workers -> metric stage -> batched writers.
+
+    main thread     iterates the (checkpointed) sweep and puts batches of (point, result) into a bounded queue
+    metric thread   turns every batch into output records, e.g. density from BM/VM, HCS/GRF/SR, peak density
+    writer thread   hands every batch of records to the sinks (text files, curve store, plots, column collector)
+
+All queues are bounded and the pool keeps at most max_pending chunks of at most batch_size points in flight
+(see iter_sweep), so when writing or plotting falls behind the workers are throttled and memory stays flat
+however large the grid is. By default every worker has two chunks in flight, so a large pool is not starved.
+The solver never waits for matplotlib, and the writers see the records in the order of the points, so the
+text outputs keep their row order. Points already in the checkpoint are read back and streamed too.
+"""
+import math
+import os
+import queue
+import threading
+
+from checkpoint import SweepCheckpoint, checkpoint_fingerprint
+from sweep_engine import iter_sweep
+
+
+_DONE = object()
+
+
+def _put(box, item, stages):
+    """
+    Put into a bounded queue, but give up when a downstream stage failed (it no longer drains its inbox).
+    """
+    while True:
+        for stage in stages:
+            if stage.error is not None:
+                raise RuntimeError(f"{stage.name} failed") from stage.error
+        try:
+            box.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            pass
+
+
+class _Stage(threading.Thread):
+    """
+    Thread applying function to every item of inbox and putting the result into outbox (if any).
+    """
+
+    def __init__(self, name, function, inbox, outbox=None, downstream=()):
+        super().__init__(name=name, daemon=True)
+        self.function = function
+        self.inbox = inbox
+        self.outbox = outbox
+        self.downstream = downstream
+        self.error = None
+
+    def run(self):
+        try:
+            while True:
+                item = self.inbox.get()
+                if item is _DONE:
+                    break
+                output = self.function(item)
+                if self.outbox is not None:
+                    _put(self.outbox, output, self.downstream)
+        except BaseException as error:
+            self.error = error
+        if self.outbox is not None:
+            # also after an error, so the next stage stops
+            try:
+                _put(self.outbox, _DONE, self.downstream)
+            except RuntimeError:
+                pass
+
+
+class ColumnSink:
+    """
+    Sink collecting the scalar fields of the records into columns, e.g. for ResultStore.write_family.
+
+    Args:
+        fields: record keys to collect
+    """
+
+    def __init__(self, fields):
+        self.columns = {field: [] for field in fields}
+
+    def __call__(self, records):
+        for record in records:
+            for field, values in self.columns.items():
+                values.append(record[field])
+
+
+def _ordered_results(points, checkpoint, computed):
+    """
+    (point, result) in the order of the points; stored results come from the checkpoint, the others from the
+    ordered sweep (and are added to the checkpoint).
+    """
+    completed = checkpoint.completed_indices()
+    computed = (pair for chunk_result in computed for pair in chunk_result)
+    for point in points:
+        if point.index in completed:
+            yield point, checkpoint.get(point.index)
+            continue
+        index, result = next(computed)
+        if index != point.index:
+            raise RuntimeError(f"sweep returned index {index} for point {point.index}")
+        checkpoint.add(index, result)
+        yield point, result
+
+
+def run_pipeline(points, session, checkpoint_path, metrics, sinks, processes=None, chunk_size=None,
+                 batch_size=50, queue_size=4, max_pending=None, settings=None, pool=None):
+    """
+    Run a checkpointed sweep and stream its results through the metric stage into the sinks.
+
+    Args:
+        points: list of GridPoint in sweep order
+        session: calculator session
+        checkpoint_path: SQLite checkpoint of the sweep, see checkpoint.py
+        settings: calculation settings, part of the checkpoint fingerprint with the points
+        metrics: function(list of (point, result)) -> list of records, runs in the metric thread
+        sinks: functions(list of records), called in this order for every batch in the writer thread
+        batch_size: points per batch between the stages
+        processes: number of worker processes, defaults to the number of cores
+        chunk_size: points per pool task, defaults to about four chunks per worker but at most batch_size
+        queue_size: batches buffered between two stages
+        max_pending: chunks in flight in the pool, defaults to two per worker and at least twice the queue
+            size, i.e. at most max_pending * chunk_size results are held
+        pool: entered SweepPool of this session to run on, shared by several sweeps (processes is then ignored)
+    Returns:
+        number of points written
+    """
+    points = list(points)
+    raw_queue = queue.Queue(queue_size)
+    record_queue = queue.Queue(queue_size)
+
+    def write(records):
+        for sink in sinks:
+            sink(records)
+        return len(records)
+
+    writer = _Stage("writer", write, record_queue)
+    metric = _Stage("metrics", metrics, raw_queue, record_queue, (writer,))
+    stages = (metric, writer)
+    for stage in stages:
+        stage.start()
+
+    written = 0
+    try:
+        with SweepCheckpoint(checkpoint_path, batch_size, checkpoint_fingerprint(points, settings)) as checkpoint:
+            completed = checkpoint.completed_indices()
+            remaining = [point for point in points if point.index not in completed]
+            if remaining and len(remaining) < len(points):
+                print(f"Resuming: {len(points) - len(remaining)} of {len(points)} points already done")
+            workers = pool.processes if pool is not None else max(1, processes or os.cpu_count() or 1)
+            if chunk_size is None:
+                chunk_size = max(1, min(batch_size, math.ceil(len(remaining) / (4*workers))))
+            computed = iter_sweep(remaining, session, processes, chunk_size, ordered=True,
+                                  max_pending=max_pending or max(2*workers, 2*queue_size), pool=pool)
+            batch = []
+            for pair in _ordered_results(points, checkpoint, computed):
+                batch.append(pair)
+                if len(batch) >= batch_size:
+                    _put(raw_queue, batch, stages)
+                    written += len(batch)
+                    batch = []
+            if batch:
+                _put(raw_queue, batch, stages)
+                written += len(batch)
+            _put(raw_queue, _DONE, stages)
+    finally:
+        # stops the stages when the sweep itself failed (a no-op after the regular _DONE)
+        while metric.is_alive():
+            try:
+                raw_queue.put(_DONE, timeout=0.1)
+                break
+            except queue.Full:
+                pass
+        for stage in stages:
+            stage.join()
+    for stage in stages:
+        if stage.error is not None:
+            raise RuntimeError(f"{stage.name} failed") from stage.error
+    return written
@@ -0,0 +1,368 @@
+"""
+Per-point timing instrumentation for the sweeps.
+
+Every process (sweep workers and the main process) keeps one SweepProfiler. A point record holds the wall
+time of the point and of every phase timed inside it with phase(name), e.g. "calculate", "extract". Phases
+timed outside a point, e.g. "format", "write", "plot" in the writer stage of the pipeline, are stage
+records. The records are appended as JSON lines to one file per process in the run directory (new_run) of
+the sweep's profile directory, so every run is reported on its own and a running sweep can be inspected from
+another shell (the latest run by default):
+
+    python sweep_profiler.py pyex_02_..._profile --total 1254 --checkpoint pyex_02_..._checkpoint.sqlite
+
+The report merges the point records of all processes by grid index and gives percentiles per phase, the
+throughput in points per hour, the ETA and the time of every stage. The ETA is the time of the points not yet
+in the checkpoint at this run's throughput; a resumed or cached run has completed more points than it timed.
+Optionally every n-th point is profiled with cProfile (or pyinstrument when installed) and its stats are
+written next to the records.
+"""
+import contextlib
+import glob
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+
+_active = None
+
+
+def active_profiler():
+    return _active
+
+
+@contextlib.contextmanager
+def phase(name):
+    """
+    Time a phase of the current point of the active profiler of this process, no-op without one.
+    """
+    profiler = _active
+    if profiler is None:
+        yield
+        return
+    # a point is only timed in the thread that runs it, e.g. not in the writer thread of the pipeline
+    current = profiler.current if profiler.point_thread == threading.get_ident() else None
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if current is None:
+            profiler.record_stage(name, time.perf_counter() - start)
+        else:
+            phases = current["phases"]
+            phases[name] = phases.get(name, 0.0) + time.perf_counter() - start
+
+
+def new_run(directory):
+    """
+    Create the directory of a new run in a profile directory and return its path. Runs are numbered, so
+    their names sort in the order they were started.
+    """
+    os.makedirs(directory, exist_ok=True)
+    number = len(glob.glob(os.path.join(directory, "run-*"))) + 1
+    while True:
+        path = os.path.join(directory, f"run-{number:04d}-" + time.strftime("%Y%m%d-%H%M%S"))
+        try:
+            os.mkdir(path)
+            return path
+        except FileExistsError:
+            number += 1
+
+
+def latest_run(directory):
+    """
+    Latest run directory of a profile directory, the directory itself when it has no runs.
+    """
+    runs = sorted(path for path in glob.glob(os.path.join(directory, "run-*")) if os.path.isdir(path))
+    return runs[-1] if runs else directory
+
+
+class SweepProfiler:
+    """
+    Activated as a context manager in the main process, it records the stage phases of the pipeline.
+
+    Args:
+        directory: run directory shared by all processes of one sweep, see new_run
+        role: file name prefix, "worker" or "main"
+        profile_every: run cProfile/pyinstrument on every n-th point of this process, None to disable
+        backend: "cprofile" or "pyinstrument"
+        batch_size: records buffered before they are appended to the file
+    """
+
+    def __init__(self, directory, role="main", profile_every=None, backend="cprofile", batch_size=10):
+        self.directory = directory
+        self.role = role
+        self.profile_every = profile_every
+        self.backend = backend
+        self.batch_size = batch_size
+        self.current = None
+        self.point_thread = None
+        self.count = 0
+        self._pending = []
+        self._lock = threading.Lock()
+        self._sampler = None
+        self._previous = None
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"{role}-{os.getpid()}.jsonl")
+
+    def activate(self):
+        global _active
+        self._previous = _active
+        _active = self
+        return self
+
+    def deactivate(self):
+        global _active
+        self.flush()
+        if _active is self:
+            _active = self._previous
+        self._previous = None
+
+    def __enter__(self):
+        return self.activate()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.deactivate()
+        return False
+
+    @contextlib.contextmanager
+    def point(self, index):
+        """
+        Record one grid point; phases timed inside are attached to it.
+        """
+        self.current = {"index": int(index), "role": self.role, "pid": os.getpid(), "start": time.time(),
+                        "phases": {}}
+        self.point_thread = threading.get_ident()
+        sampled = self.profile_every is not None and self.count % self.profile_every == 0
+        if sampled:
+            self._start_sampler()
+        start = time.perf_counter()
+        try:
+            yield self.current
+        finally:
+            self.current["total"] = time.perf_counter() - start
+            if sampled:
+                self._stop_sampler(index)
+            self._append(self.current)
+            self.current = None
+            self.point_thread = None
+            self.count += 1
+
+    def record_startup(self, seconds, phases=None):
+        """
+        Record the session start (TC-Python start, database and system setup) of this process, with optional
+        parts of it, e.g. {"boot": ..., "import": ..., "tc_python": ..., "configure": ...}.
+        """
+        self._append({"index": None, "role": "startup", "pid": os.getpid(), "start": time.time() - seconds,
+                      "phases": dict(phases or {}), "total": seconds})
+
+    def record_stage(self, name, seconds):
+        """
+        Record a phase timed outside a point, e.g. writing a batch in the writer stage of the pipeline.
+        """
+        self._append({"index": None, "role": "stage", "pid": os.getpid(), "start": time.time() - seconds,
+                      "phases": {name: seconds}, "total": seconds})
+
+    def _append(self, record):
+        with self._lock:
+            self._pending.append(record)
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+            if pending:
+                with open(self.path, mode="a") as records_file:
+                    for record in pending:
+                        records_file.write(json.dumps(record) + "\n")
+
+    def _start_sampler(self):
+        if self.backend == "pyinstrument":
+            from pyinstrument import Profiler
+            self._sampler = Profiler()
+            self._sampler.start()
+        else:
+            import cProfile
+            self._sampler = cProfile.Profile()
+            self._sampler.enable()
+
+    def _stop_sampler(self, index):
+        sampler, self._sampler = self._sampler, None
+        if self.backend == "pyinstrument":
+            sampler.stop()
+            with open(os.path.join(self.directory, f"point-{index}.html"), mode="w") as html_file:
+                html_file.write(sampler.output_html())
+        else:
+            sampler.disable()
+            sampler.dump_stats(os.path.join(self.directory, f"point-{index}.prof"))
+
+
+class ProfiledSession:
+    """
+    Wrap a sweep session so that every point calculated by a worker is recorded (phases timed in the
+    evaluate function with phase(...) are attached to it).
+    """
+
+    def __init__(self, session, directory, profile_every=None, backend="cprofile"):
+        self.session = session
+        self.directory = directory
+        self.profile_every = profile_every
+        self.backend = backend
+        self.profiler = None
+        self._calculator = None
+
+    def __enter__(self):
+        from sweep_engine import worker_boot_seconds
+
+        self.profiler = SweepProfiler(self.directory, "worker", self.profile_every, self.backend).activate()
+        start = time.perf_counter()
+        self._calculator = self.session.__enter__()
+        elapsed = time.perf_counter() - start
+        phases = {"enter": elapsed}
+        boot = worker_boot_seconds()
+        if boot is not None:
+            phases["boot"] = boot
+        # parts of the startup of the innermost session that reports them (TCPythonSession.startup)
+        session = self.session
+        while session is not None:
+            if getattr(session, "startup", None):
+                phases.update(session.startup)
+                break
+            session = getattr(session, "session", None)
+        self.profiler.record_startup(elapsed + (boot or 0.0), phases)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.profiler.deactivate()
+        return self.session.__exit__(exc_type, exc_value, traceback)
+
+    def calculate(self, point):
+        with self.profiler.point(point.index):
+            return self._calculator.calculate(point)
+
+
+def load_records(directory):
+    records = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.jsonl"))):
+        with open(path) as records_file:
+            records.extend(json.loads(line) for line in records_file if line.strip())
+    return records
+
+
+def summarize(records, total_points=None, completed=None, percentiles=(50, 90, 99)):
+    """
+    Merge the records by grid index and summarize them.
+
+    Args:
+        records: point, stage and startup records of a run (load_records)
+        total_points: number of points of the sweep, for the ETA
+        completed: points of the sweep already done, e.g. the points in its checkpoint (checkpoint_completed),
+            by default the points timed in this run
+
+    Returns a dictionary with the number of points, the percentiles/mean/sum/share of every phase and of
+    the time spent on a point in all processes ("point"), the worker startup times, the calls and seconds of
+    every stage phase, the throughput in points per hour, the points remaining and the ETA [s].
+    """
+    points = {}
+    stages = {}
+    startup = []
+    startup_phases = {}
+    first, last = None, None
+    for record in records:
+        end = record["start"] + record["total"]
+        first = record["start"] if first is None else min(first, record["start"])
+        last = end if last is None else max(last, end)
+        if record["role"] == "startup":
+            startup.append(record["total"])
+            for name, seconds in record["phases"].items():
+                startup_phases.setdefault(name, []).append(seconds)
+            continue
+        if record["role"] == "stage":
+            for name, seconds in record["phases"].items():
+                stage = stages.setdefault(name, {"calls": 0, "sum": 0.0})
+                stage["calls"] += 1
+                stage["sum"] += seconds
+            continue
+        merged = points.setdefault(record["index"], {"point": 0.0})
+        merged["point"] += record["total"]
+        for name, seconds in record["phases"].items():
+            merged[name] = merged.get(name, 0.0) + seconds
+
+    names = sorted({name for merged in points.values() for name in merged})
+    phases = {}
+    total_time = sum(merged["point"] for merged in points.values())
+    for name in names:
+        values = np.array([merged.get(name, 0.0) for merged in points.values()])
+        stats = {f"p{p}": float(np.percentile(values, p)) for p in percentiles}
+        stats.update(mean=float(values.mean()), sum=float(values.sum()),
+                     share=float(values.sum() / total_time) if total_time else 0.0)
+        phases[name] = stats
+
+    done = len(points)
+    wall = (last - first) if done else 0.0
+    throughput = done / wall * 3600 if wall > 0 else 0.0
+    remaining, eta = None, None
+    if total_points is not None:
+        remaining = max(total_points - (done if completed is None else completed), 0)
+        if throughput > 0:
+            eta = remaining / throughput * 3600
+    # share of the worker time spent starting up, sessions entered lazily in a point included
+    startup_time = sum(startup) + phases.get("startup", {}).get("sum", 0.0)
+    startup_share = startup_time / (sum(startup) + total_time) if startup_time else 0.0
+    return {"points": done, "phases": phases, "stages": stages, "startup": startup,
+            "startup_phases": {name: float(np.mean(values)) for name, values in startup_phases.items()},
+            "startup_share": startup_share, "wall_time": wall, "points_per_hour": throughput,
+            "remaining": remaining, "eta": eta}
+
+
+def checkpoint_completed(path):
+    """
+    Number of points in a sweep checkpoint, 0 when it does not exist yet.
+    """
+    if not os.path.exists(path):
+        return 0
+    from checkpoint import SweepCheckpoint
+
+    with SweepCheckpoint(path) as checkpoint:
+        return len(checkpoint.completed_indices())
+
+
+def report(summary):
+    if summary["points"]:
+        lines = [f"Points: {summary['points']}, wall time = {summary['wall_time']:.1f} s, "
+                 f"throughput = {summary['points_per_hour']:.1f} points/h"]
+    else:
+        lines = ["Points: 0, no point calculated in this run (all from the checkpoint)"]
+    if summary["eta"] is not None:
+        lines.append(f"ETA: {summary['eta'] / 3600:.2f} h ({summary['remaining']} points remaining)")
+    if summary["startup"]:
+        parts = ", ".join(f"{name} = {seconds:.2f}" for name, seconds in summary["startup_phases"].items())
+        lines.append(f"Worker startup: {len(summary['startup'])} workers, mean = {np.mean(summary['startup']):.2f} s"
+                     + (f" ({parts} s)" if parts else ""))
+    if summary["startup_share"]:
+        lines.append(f"Startup share of the worker time: {100 * summary['startup_share']:.1f} %"
+                     + (", consider larger jobs or a SweepPool" if summary["startup_share"] > 0.2 else ""))
+    for name, stats in summary["phases"].items():
+        columns = ", ".join(f"{key} = {value:.4f}" for key, value in stats.items() if key != "share")
+        lines.append(f"  {name:<12} {columns} [s], share = {100 * stats['share']:.1f} %")
+    if summary.get("stages"):
+        lines.append("Stages (outside the points): " + ", ".join(
+            f"{name} = {stage['sum']:.2f} s" for name, stage in sorted(summary["stages"].items())))
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Timing report of a (running) sweep")
+    parser.add_argument("directory", help="profile directory of the sweep (its latest run) or a run directory")
+    parser.add_argument("--total", type=int, default=None, help="total number of points, for the ETA")
+    parser.add_argument("--checkpoint", default=None, help="checkpoint of the sweep, the points already done for "
+                        "the ETA (by default the points timed in the run)")
+    args = parser.parse_args()
+    completed = checkpoint_completed(args.checkpoint) if args.checkpoint else None
+    print(report(summarize(load_records(latest_run(args.directory)), args.total, completed)))
@@ -0,0 +1,31 @@
+"""
+The tests run the sweep modules on the fake TC-Python backend (fake_tc_python.py), in a temporary working
+directory because the sweeps write their cache, checkpoint and output files next to them.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fake_tc_python  # noqa: E402
+
+fake_tc_python.install()
+
+
+@pytest.fixture(autouse=True)
+def working_directory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def scheil_spec(C_N=(0.15, 0.4, 2), parallel=None, **campaign):
+    """
+    Small Scheil campaign (2 x 2 x 2 points) run in this process.
+    """
+    return {"campaign": dict({"name": "scheil", "family": "scheil"}, **campaign),
+            "composition": {"unit": "mass_percent", "Cr": [10.0, 14.5, 2], "Co": [0.0, 5.0, 2], "C_N": list(C_N)},
+            "calculation": {"type": "scheil", "databases": ["TCFE9"], "elements": ["Fe", "Cr", "Co", "C", "N"],
+                            "composition_unit": "mass_percent"},
+            "parallel": dict({"processes": 1}, **(parallel or {}))}
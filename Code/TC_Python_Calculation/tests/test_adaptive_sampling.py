@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from adaptive_sampling import BOUNDS, adaptive_sweep
+from conftest import scheil_spec
+from result_store import ResultStore
+from sweep_campaign import run_campaign, validate_spec
+from sweep_engine import FunctionSession
+
+
+def adaptive_spec(rounds=2, batch_size=4, **adaptive):
+    spec = scheil_spec()
+    composition = spec["composition"]
+    for name in ("Cr", "Co", "C_N"):
+        del composition[name]
+    composition.update(sampler="sobol", points=8, seed=3,
+                       bounds={"Cr": [10.0, 14.5], "Co": [0.0, 5.0], "C_N": [0.15, 0.4]})
+    spec["adaptive"] = dict({"rounds": rounds, "batch_size": batch_size, "targets": ["HCS", "GRF", "SR"],
+                             "acquisition": {"senses": [1, -1, 1], "candidates": 256}}, **adaptive)
+    return spec
+
+
+def test_campaign_runs_the_adaptive_rounds(capsys):
+    columns = run_campaign(adaptive_spec())
+    assert "Adaptive round 2: 4 new points" in capsys.readouterr().out
+    assert len(columns["HCS"]) == 8 + 2 * 4
+
+    table = ResultStore("result_store").read_family("scheil").to_pandas()
+    assert list(table["Index"]) == list(range(1, 17))
+    compositions = table[["Cr", "Co", "C"]].to_numpy()
+    # inside the bounds (mass fractions in the store), no composition twice
+    assert np.all(compositions >= BOUNDS[:, 0] / 100) and np.all(compositions <= BOUNDS[:, 1] / 100)
+    assert len(np.unique(compositions, axis=0)) == 16
+
+
+def test_rerun_proposes_the_same_points(capsys):
+    run_campaign(adaptive_spec())
+    first = ResultStore("result_store").read_family("scheil").to_pandas()
+    capsys.readouterr()
+    run_campaign(adaptive_spec())
+    # every round is resumed from its checkpoint
+    assert capsys.readouterr().out.count("Points: 0, no point calculated in this run") == 1
+    second = ResultStore("result_store").read_family("scheil").to_pandas()
+    np.testing.assert_array_equal(first[["Cr", "Co", "C", "HCS"]], second[["Cr", "Co", "C", "HCS"]])
+
+
+def test_unknown_target_is_reported():
+    with pytest.raises(ValueError, match=r"adaptive.targets \['PSC'\]"):
+        run_campaign(adaptive_spec(targets=["HCS", "PSC"], acquisition={}))
+
+
+@pytest.mark.parametrize("change, problem", [
+    (lambda spec: spec.update(composition=scheil_spec()["composition"]), "need a sampler design"),
+    (lambda spec: spec["adaptive"].update(rounds=0), "adaptive.rounds"),
+    (lambda spec: spec["adaptive"].update(targets=[]), "adaptive.targets"),
+    (lambda spec: spec["adaptive"]["acquisition"].update(senses=[1, -1]), "senses"),
+])
+def test_invalid_adaptive_spec_is_rejected(change, problem):
+    spec = adaptive_spec()
+    change(spec)
+    with pytest.raises(ValueError, match=problem):
+        validate_spec(spec)
+
+
+def bowl(point):
+    return {"HCS": (point.x_Cr - 12.0)**2 + point.x_Co, "GRF": point.x_C_N}
+
+
+def test_adaptive_sweep_stops_at_max_points():
+    calculated, sampler = adaptive_sweep(FunctionSession(bowl), lambda result: [result["HCS"], result["GRF"]],
+                                         n_initial=8, batch_size=4, max_points=18, processes=1, seed=0)
+    assert len(calculated) == 18
+    assert [point.index for point, _ in calculated] == list(range(1, 19))
+    assert [result for _, result in calculated] == [bowl(point) for point, _ in calculated]
+    mean, spread = sampler.predict(np.array([[12.0, 2.5, 0.3]]))
+    assert mean.shape == spread.shape == (1, 2)
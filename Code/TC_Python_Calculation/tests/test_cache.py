@@ -0,0 +1,74 @@
+import sqlite3
+
+import pytest
+
+from conftest import scheil_spec
+from result_cache import CachedSession, ResultCache
+from sweep_campaign import run_campaign, validate_spec
+from sweep_engine import FunctionSession, GridPoint
+
+
+TOLERANCE = {"Cr": 0.01, "Co": 0.01, "C_N": 0.002}
+
+
+def timed(point):
+    return {"result": point.x_Cr + point.x_Co, "timing": {"solve_time": 1.5}}
+
+
+def test_cache_hits_have_no_timing():
+    point = GridPoint(1, 12.0, 2.5, 0.2)
+    with CachedSession(FunctionSession(timed), "cache.sqlite", {"calculation": "test"}) as session:
+        assert session.calculate(point) == timed(point)
+    with CachedSession(FunctionSession(timed), "cache.sqlite", {"calculation": "test"}) as session:
+        assert session.calculate(point) == {"result": 14.5}
+
+
+def test_campaign_cache_tolerance_answers_near_points():
+    first = run_campaign(scheil_spec())
+    # C/N shifted by 0.001 wt%: within the tolerance, answered from the cache
+    near = run_campaign(scheil_spec(C_N=(0.151, 0.401, 2), parallel={"cache_tolerance": TOLERANCE}))
+    assert near["HCS"] == first["HCS"]
+    assert near["SR"] == first["SR"]
+    # outside the tolerance the points are calculated
+    far = run_campaign(scheil_spec(C_N=(0.16, 0.41, 2), parallel={"cache_tolerance": TOLERANCE}))
+    assert far["SR"] != first["SR"]
+
+
+def test_near_hits_are_counted_apart():
+    settings = {"calculation": "test"}
+    tolerance = {"Cr": 0.01, "Co": 0.01, "C": 0.002, "N": 0.002}
+    with CachedSession(FunctionSession(timed), "cache.sqlite", settings, tolerance=tolerance) as session:
+        session.calculate(GridPoint(1, 12.0, 2.5, 0.2))
+    with CachedSession(FunctionSession(timed), "cache.sqlite", settings, tolerance=tolerance) as session:
+        for point in (GridPoint(1, 12.0, 2.5, 0.2), GridPoint(2, 12.005, 2.5, 0.2), GridPoint(3, 13.0, 2.5, 0.2)):
+            session.calculate(point)
+    with ResultCache("cache.sqlite") as cache:
+        stats = cache.stats()
+    assert (stats["hits"], stats["near_hits"], stats["misses"]) == (1, 1, 2)
+    assert stats["hit_rate"] == 0.25 and stats["entries"] == 2
+
+
+def test_last_access_is_written_on_eviction_and_close():
+    def last_access():
+        with sqlite3.connect("cache.sqlite") as connection:
+            return dict(connection.execute("SELECT key, last_access FROM results").fetchall())
+
+    with ResultCache("cache.sqlite", max_entries=2) as cache:
+        cache.put("a", 1)
+        cache.put("b", 2)
+        stored = last_access()
+        assert cache.get("a") == 1
+        # the hit is not written until the cache evicts
+        assert last_access() == stored
+        cache.put("c", 3)
+        assert "a" in cache and "b" not in cache
+        stored = last_access()
+        assert cache.get("a") == 1 and cache.get("b") is None
+    assert last_access()["a"] > stored["a"]
+    with ResultCache("cache.sqlite") as cache:
+        assert (cache.stats()["hits"], cache.stats()["misses"]) == (2, 1)
+
+
+def test_cache_tolerance_is_validated():
+    with pytest.raises(ValueError, match="cache_tolerance"):
+        validate_spec(scheil_spec(parallel={"cache_tolerance": {"Cr": 0.01, "C_N": 0.002}}))
@@ -0,0 +1,104 @@
+import glob
+import os
+import sys
+
+import pytest
+
+from conftest import scheil_spec
+from result_store import ResultStore, composition_unit
+from sweep_campaign import load_spec, run_campaign, validate_spec
+
+
+CAMPAIGNS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "campaigns")
+
+
+def test_mole_campaign_stores_mole_fractions():
+    spec = scheil_spec()
+    spec["composition"]["unit"] = "mole_percent"
+    spec["calculation"]["composition_unit"] = "mole_fraction"
+    run_campaign(spec)
+
+    table = ResultStore("result_store").read_family("scheil")
+    assert composition_unit(table) == "mole_fraction"
+    assert sorted(set(table.column("Cr").to_pylist())) == pytest.approx([0.1, 0.145])
+    assert sorted(set(table.column("C").to_pylist())) == pytest.approx([0.0015, 0.004])
+
+
+def test_mass_and_mole_families_are_not_joined():
+    run_campaign(scheil_spec())
+    spec = scheil_spec(name="scheil_mole", family="scheil_mole")
+    spec["composition"]["unit"] = "mole_percent"
+    spec["calculation"]["composition_unit"] = "mole_percent"
+    run_campaign(spec)
+
+    store = ResultStore("result_store")
+    assert composition_unit(store.read_family("scheil")) == "mass_fraction"
+    with pytest.raises(ValueError, match="composition units"):
+        store.join(["scheil", "scheil_mole"])
+
+
+def test_profile_reports_only_the_current_run(capsys):
+    run_campaign(scheil_spec())
+    first = capsys.readouterr().out
+    assert "Points: 8," in first
+    assert "format = " in first and "write = " in first
+
+    # fully resumed from the checkpoint: nothing calculated in this run
+    run_campaign(scheil_spec())
+    second = capsys.readouterr().out
+    assert "Points: 0, no point calculated in this run" in second
+    assert len(os.listdir("scheil_profile")) == 2
+
+
+@pytest.mark.parametrize("path", sorted(glob.glob(os.path.join(CAMPAIGNS, "*"))))
+def test_shipped_specs_are_valid(path):
+    validate_spec(load_spec(path))
+
+
+def test_toml_spec_without_tomllib(monkeypatch):
+    import tomllib
+
+    path = os.path.join(CAMPAIGNS, "scheil_adaptive.toml")
+    expected = load_spec(path)
+    # Python < 3.11: tomllib is the standard library copy of tomli
+    monkeypatch.setitem(sys.modules, "tomllib", None)
+    monkeypatch.setitem(sys.modules, "tomli", tomllib)
+    assert load_spec(path) == expected
+
+
+@pytest.mark.parametrize("change, problem", [
+    (lambda spec: spec["composition"].update(unit="ppm"), "composition.unit must be one of"),
+    (lambda spec: spec["calculation"].update(composition_unit="mole_fraction"), "mix mass and mole units"),
+    (lambda spec: spec["calculation"].update(elements=["Fe", "Cr", "C"]), r"lacks \['Co', 'N'\]"),
+    (lambda spec: spec["calculation"].update(databases=["TCFE9", "MOBFE5"]), "needs one database"),
+    (lambda spec: spec["calculation"].update(temperatures=[800.0]), "has no temperature axis"),
+    (lambda spec: spec["composition"].update(Cr=[10.0, 60.0, 2], Co=[0.0, 45.0, 2]), "no Fe balance"),
+    (lambda spec: spec["composition"].update(C_N=[0.15, 0.4]), r"\[start, stop, levels\]"),
+    (lambda spec: spec["parallel"].update(processes=0), "parallel.processes"),
+])
+def test_invalid_spec_is_rejected(change, problem):
+    spec = scheil_spec()
+    change(spec)
+    with pytest.raises(ValueError, match=problem):
+        validate_spec(spec)
+
+
+def test_every_problem_is_listed():
+    spec = scheil_spec()
+    del spec["campaign"]["name"]
+    spec["calculation"]["type"] = "dilatometry"
+    spec["parallel"]["processes"] = 0
+    with pytest.raises(ValueError) as error:
+        validate_spec(spec)
+    message = str(error.value)
+    assert "campaign.name is missing" in message
+    assert "calculation.type must be one of" in message
+    assert "parallel.processes must be at least 1" in message
+
+
+def test_invalid_spec_calculates_nothing():
+    spec = scheil_spec()
+    spec["composition"]["unit"] = "ppm"
+    with pytest.raises(ValueError):
+        run_campaign(spec)
+    assert not os.path.exists("result_store")
@@ -0,0 +1,86 @@
+import numpy as np
+
+from checkpoint import SweepCheckpoint, checkpoint_fingerprint, run_checkpointed_sweep
+from conftest import scheil_spec
+from result_store import ResultStore
+from sweep_campaign import run_campaign
+from sweep_engine import FunctionSession, composition_grid
+from sweep_pipeline import run_pipeline
+
+
+class CountingFunction:
+    """
+    Picklable calculator counting its calls (only meaningful with processes=1).
+    """
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, point):
+        self.calls += 1
+        return point.x_Cr + 10 * point.x_Co + 100 * point.x_C_N
+
+
+def grid(C_N=(0.15, 0.4)):
+    return composition_grid([10.0, 12.0], [0.0, 5.0], np.linspace(C_N[0], C_N[1], 3))
+
+
+def test_resume_only_calculates_missing_points():
+    points = grid()
+    function = CountingFunction()
+    with SweepCheckpoint("sweep.sqlite", fingerprint=checkpoint_fingerprint(points)) as checkpoint:
+        for point in points[:5]:
+            checkpoint.add(point.index, function(point))
+    function.calls = 0
+    results = run_checkpointed_sweep(points, FunctionSession(function), "sweep.sqlite", processes=1)
+    assert function.calls == len(points) - 5
+    assert [index for index, _ in results] == [point.index for point in points]
+    assert [value for _, value in results] == [CountingFunction()(point) for point in points]
+
+
+def test_points_are_stored_once():
+    with SweepCheckpoint("sweep.sqlite", batch_size=2) as checkpoint:
+        for value in range(5):
+            checkpoint.add(7, value)
+        checkpoint.add(8, 1.0)
+        assert checkpoint.completed_indices() == {7, 8}
+        assert checkpoint.get(7) == 4
+        assert checkpoint.results() == [(7, 4), (8, 1.0)]
+
+
+def test_changed_grid_discards_the_checkpoint():
+    function = CountingFunction()
+    run_checkpointed_sweep(grid(), FunctionSession(function), "sweep.sqlite", processes=1)
+    # same indices, other compositions
+    points = grid(C_N=(0.05, 0.2))
+    function.calls = 0
+    results = run_checkpointed_sweep(points, FunctionSession(function), "sweep.sqlite", processes=1)
+    assert function.calls == len(points)
+    assert [value for _, value in results] == [CountingFunction()(point) for point in points]
+
+
+def test_changed_settings_discard_the_checkpoint():
+    points = grid()
+    function = CountingFunction()
+    records = []
+    run_pipeline(points, FunctionSession(function), "sweep.sqlite", lambda batch: batch, [records.extend],
+                 processes=1, settings={"temperature": 300})
+    function.calls = 0
+    run_pipeline(points, FunctionSession(function), "sweep.sqlite", lambda batch: batch, [records.extend],
+                 processes=1, settings={"temperature": 300})
+    assert function.calls == 0
+    run_pipeline(points, FunctionSession(function), "sweep.sqlite", lambda batch: batch, [records.extend],
+                 processes=1, settings={"temperature": 400})
+    assert function.calls == len(points)
+
+
+def test_campaign_rerun_with_another_grid(working_directory, tmp_path_factory, monkeypatch):
+    run_campaign(scheil_spec(C_N=(0.15, 0.4, 2)))
+    changed = run_campaign(scheil_spec(C_N=(0.05, 0.2, 2)))
+    stored = ResultStore("result_store").read_family("scheil").to_pandas()
+
+    monkeypatch.chdir(tmp_path_factory.mktemp("fresh"))
+    fresh = run_campaign(scheil_spec(C_N=(0.05, 0.2, 2)))
+    np.testing.assert_array_equal(changed["HCS"], fresh["HCS"])
+    np.testing.assert_array_equal(stored["HCS"], fresh["HCS"])
+    np.testing.assert_allclose(sorted(set(stored["C"])), [0.0005, 0.002])
@@ -0,0 +1,132 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from composition_index import CompositionIndex, LatticeInterpolator
+
+
+SCALE = np.array([0.01, 0.01, 0.001])
+
+
+def compositions(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.uniform([0.10, 0.0, 0.0015], [0.145, 0.05, 0.004], (n, 3))
+
+
+def scaled_distances(queries, points, p):
+    difference = (queries[:, None, :] - points[None, :, :]) / SCALE
+    return np.max(np.abs(difference), axis=2) if p == np.inf else np.linalg.norm(difference, ord=p, axis=2)
+
+
+@pytest.mark.parametrize("p", [1, 2, np.inf])
+def test_nearest_and_within_match_brute_force(p):
+    points, queries = compositions(300), compositions(50, seed=1)
+    index = CompositionIndex(points, scale=SCALE, p=p)
+    distances = scaled_distances(queries, points, p)
+
+    nearest_distance, nearest = index.nearest(queries)
+    np.testing.assert_array_equal(nearest, np.argmin(distances, axis=1))
+    np.testing.assert_allclose(nearest_distance, distances.min(axis=1))
+
+    k_distances, k_positions = index.nearest(queries, k=4)
+    np.testing.assert_array_equal(k_positions, np.argsort(distances, axis=1)[:, :4])
+    np.testing.assert_allclose(k_distances, np.sort(distances, axis=1)[:, :4])
+
+    for row, positions in enumerate(index.within(queries, 1.5)):
+        np.testing.assert_array_equal(positions, np.flatnonzero(distances[row] <= 1.5))
+
+
+def test_missing_neighbours():
+    points = compositions(3)
+    index = CompositionIndex(points, scale=SCALE)
+    distances, positions = index.nearest(points[:1] + 10 * SCALE, max_distance=1.0)
+    assert np.isinf(distances[0]) and positions[0] == len(index)
+    distances, positions = index.nearest(points[:1], k=5)
+    assert np.isinf(distances[0, 3:]).all() and (positions[0, 3:] == len(index)).all()
+
+
+def test_empty_index():
+    index = CompositionIndex(np.empty((0, 3)))
+    assert len(index) == 0
+    distances, positions = index.nearest(compositions(4))
+    assert distances.shape == positions.shape == (4,)
+    assert np.isinf(distances).all()
+    distances, positions = index.nearest(compositions(4), k=3)
+    assert distances.shape == (4, 3) and np.isinf(distances).all()
+    assert [len(positions) for positions in index.within(compositions(2), 1.0)] == [0, 0]
+
+
+def test_composition_dictionaries_and_default_scale():
+    points = compositions(20)
+    index = CompositionIndex([dict(zip(["Cr", "Co", "C"], row)) for row in points])
+    np.testing.assert_allclose(index.scale, np.ptp(points, axis=0))
+    assert index.nearest([{"Cr": points[7, 0], "Co": points[7, 1], "C": points[7, 2]}])[1][0] == 7
+
+
+def test_index_save_and_load():
+    points = compositions(30)
+    values = np.arange(60.0).reshape(30, 2)
+    index = CompositionIndex(points, values, scale={"Cr": 0.01, "Co": 0.01, "C": 0.001}, p=np.inf)
+    index.save("index.npz")
+    loaded = CompositionIndex.load("index.npz")
+
+    np.testing.assert_array_equal(loaded.compositions, index.compositions)
+    np.testing.assert_array_equal(loaded.values, values)
+    np.testing.assert_array_equal(loaded.scale, index.scale)
+    assert loaded.elements == index.elements and loaded.p == np.inf
+    queries = compositions(10, seed=2)
+    np.testing.assert_array_equal(loaded.nearest(queries)[1], index.nearest(queries)[1])
+    # without values
+    CompositionIndex(points).save("plain.npz")
+    assert CompositionIndex.load("plain.npz").values is None
+
+
+# ---- lattice ------#
+AXES = [np.linspace(0.10, 0.145, 4), np.linspace(0.0, 0.05, 3), np.linspace(0.0015, 0.004, 5)]
+
+
+def linear(rows):
+    # trilinear interpolation reproduces functions that are linear in every element
+    rows = np.asarray(rows)
+    return np.column_stack([1 + 10 * rows[:, 0] - 3 * rows[:, 1] + 200 * rows[:, 2],
+                            rows[:, 0] * rows[:, 1] * rows[:, 2]])
+
+
+def lattice_rows():
+    return np.array(list(itertools.product(*AXES)))
+
+
+def test_lattice_from_shuffled_rows():
+    rows = lattice_rows()
+    shuffled = rows[np.random.default_rng(0).permutation(len(rows))]
+    lattice = LatticeInterpolator.from_points(shuffled, linear(shuffled))
+
+    for axis, expected in zip(lattice.axes, AXES):
+        np.testing.assert_allclose(axis, expected)
+    np.testing.assert_allclose(lattice(rows), linear(rows))
+    queries = np.random.default_rng(1).uniform([0.10, 0.0, 0.0015], [0.145, 0.05, 0.004], (100, 3))
+    np.testing.assert_allclose(lattice(queries), linear(queries))
+    # outside the lattice: clamped
+    np.testing.assert_allclose(lattice([[0.2, 0.05, 0.004]]), linear([[0.145, 0.05, 0.004]]))
+
+
+def test_incomplete_lattice_is_rejected():
+    rows = lattice_rows()
+    with pytest.raises(ValueError, match="do not fill"):
+        LatticeInterpolator.from_points(rows[1:], linear(rows[1:]))
+    # right number of rows, but one composition twice
+    duplicated = np.concatenate([rows[1:], rows[-1:]])
+    with pytest.raises(ValueError, match="duplicate"):
+        LatticeInterpolator.from_points(duplicated, linear(duplicated))
+
+
+def test_lattice_save_and_load():
+    rows = lattice_rows()
+    lattice = LatticeInterpolator.from_points(rows, linear(rows))
+    lattice.save("lattice.npz")
+    loaded = LatticeInterpolator.load("lattice.npz")
+    assert loaded.elements == lattice.elements
+    np.testing.assert_array_equal(loaded.values, lattice.values)
+    queries = np.random.default_rng(2).uniform([0.10, 0.0, 0.0015], [0.145, 0.05, 0.004], (20, 3))
+    np.testing.assert_array_equal(loaded(queries), lattice(queries))
@@ -0,0 +1,36 @@
+import h5py
+import numpy as np
+
+from conftest import scheil_spec
+from curve_store import CurveStore, compact
+from sweep_campaign import run_campaign
+
+
+def stored_rows(path):
+    with h5py.File(path, "r") as store_file:
+        return len(store_file["index"])
+
+
+def test_rerun_does_not_grow_the_store():
+    run_campaign(scheil_spec())
+    size = stored_rows("scheil_curves.h5")
+    run_campaign(scheil_spec())
+    assert stored_rows("scheil_curves.h5") == size == 8
+
+
+def test_compact_keeps_the_last_write_of_every_index():
+    with CurveStore("curves.h5", batch_size=3) as store:
+        for repeat in range(3):
+            for index in (5, 1, 3):
+                store.write(index, {"time": np.arange(index + repeat), "number_density": np.full(index, repeat)},
+                            f"run {repeat}")
+    assert stored_rows("curves.h5") == 9
+
+    assert compact("curves.h5") == (9, 3)
+    with CurveStore("curves.h5", mode="r") as store:
+        assert store.indices() == [1, 3, 5]
+        curves, label = store.read(3)
+        assert label == "run 2"
+        assert np.array_equal(curves["time"], np.arange(5))
+        assert np.array_equal(curves["number_density"], np.full(3, 2.0))
+    assert stored_rows("curves.h5") == 3
@@ -0,0 +1,139 @@
+"""
+The vectorized Scheil and kinetics metrics against the scalar formulas of the original scripts (pyex_03 and
+pyex_04 before the sweeps were batched), on the curves of the fake backend.
+"""
+import os
+
+import numpy as np
+import pytest
+
+import fake_tc_python
+from conftest import scheil_spec
+from kinetics_metrics import kinetics_metrics
+from scheil_metrics import curve_from_sections, scheil_metrics
+from result_store import ResultStore
+from sweep_campaign import load_spec, run_campaign
+
+
+# ---- original formulas ------#
+def hot_cracking_susceptibility(x_mole_fraction_list, y_temperature_list):
+    y_interp_09 = round(np.interp(0.9, x_mole_fraction_list, y_temperature_list), 4)
+    y_interp_10 = round(np.interp(1.0, x_mole_fraction_list, y_temperature_list), 4)
+    y_interp_04 = round(np.interp(0.4, x_mole_fraction_list, y_temperature_list), 4)
+    y_interp_00 = round(np.interp(0, x_mole_fraction_list, y_temperature_list), 4)
+
+    t_09 = (y_interp_00 - y_interp_09)/100
+    t_10 = (y_interp_00 - y_interp_10)/100
+    t_04 = (y_interp_00 - y_interp_04)/100
+    hcs = (t_09 - t_10)/(t_04 - t_09)
+    return hcs
+
+
+def growth_restriction_factor(x_mole_fraction_list, y_temperature_list):
+    y_interp_005 = round(np.interp(0.05, x_mole_fraction_list, y_temperature_list), 4)
+    y_interp_00 = round(np.interp(0, x_mole_fraction_list, y_temperature_list), 4)
+    grf = (y_interp_005 - y_interp_00)/0.05
+    return abs(grf)
+
+
+def solidification_range(x_mole_fraction_list, y_temperature_list):
+    return round(np.interp(0, x_mole_fraction_list, y_temperature_list), 4) - \
+        round(np.interp(1.0, x_mole_fraction_list, y_temperature_list), 4)
+
+
+def precipitation_speed(time_2, number_density_HCP_A3):
+    return max(number_density_HCP_A3)/time_2[number_density_HCP_A3.index(max(number_density_HCP_A3))]
+
+
+# ---- fake backend curves ------#
+def scheil_sections(Cr, Co, C_N):
+    """
+    {label: (x, y)} sections of the fake Scheil curve of a mass fraction composition.
+    """
+    calculation = fake_tc_python.ScheilCalculation(["Fe", "Cr", "Co", "C", "N"]) \
+        .set_composition_unit(fake_tc_python.CompositionUnit.MASS_FRACTION)
+    for element, value in (("Cr", Cr), ("Co", Co), ("C", C_N), ("N", C_N)):
+        calculation = calculation.set_composition(element, value)
+    curve = calculation.calculate().get_values_grouped_by_stable_phases_of("NS", "T")
+    return {label: (curve[label].x, curve[label].y) for label in curve}
+
+
+def number_density(Cr, Co, C_N, simulation_time=600.0):
+    """
+    Time and number density lists of the fake HCP_A3#2 precipitation of a mass fraction composition.
+    """
+    w = {"Cr": Cr, "Co": Co, "C": C_N, "N": C_N}
+    return fake_tc_python.PrecipitationResult(w, ["HCP_A3#2"], 763.15, simulation_time) \
+        .get_number_density_of("HCP_A3#2")
+
+
+COMPOSITIONS = [(Cr, Co, C_N) for Cr in (0.10, 0.1225, 0.145) for Co in (0.0, 0.05) for C_N in (0.0015, 0.004)]
+
+
+def test_scheil_metrics_match_the_original_formulas():
+    sections = [scheil_sections(*composition) for composition in COMPOSITIONS]
+    # the curves of a batch differ in length
+    assert len({len(curve_from_sections(curve)[0]) for curve in sections}) > 1
+    metrics = scheil_metrics(sections, decimals=4)
+
+    for row, curve in enumerate(sections):
+        x, y = curve_from_sections(curve)
+        assert metrics["HCS"][row] == pytest.approx(hot_cracking_susceptibility(x, y), rel=1e-12)
+        assert metrics["GRF"][row] == pytest.approx(growth_restriction_factor(x, y), rel=1e-12)
+        assert metrics["SR"][row] == pytest.approx(solidification_range(x, y), rel=1e-12)
+
+
+def test_scheil_metrics_do_not_depend_on_the_section_order():
+    sections = [scheil_sections(*composition) for composition in COMPOSITIONS[:3]]
+    reversed_sections = [dict(reversed(list(curve.items()))) for curve in sections]
+    expected = scheil_metrics(sections, decimals=4)
+    metrics = scheil_metrics(reversed_sections, decimals=4)
+    for name in ("HCS", "GRF", "SR"):
+        np.testing.assert_array_equal(metrics[name], expected[name])
+
+
+def test_kinetics_metrics_match_the_original_formulas():
+    curves = [number_density(*composition, simulation_time=simulation_time)
+              for composition, simulation_time in zip(COMPOSITIONS, [600.0, 300.0] * len(COMPOSITIONS))]
+    # ragged batch: cut every other curve short
+    curves = [(time[:len(time) - 30 * (row % 2)], density[:len(density) - 30 * (row % 2)])
+              for row, (time, density) in enumerate(curves)]
+    metrics = kinetics_metrics([time for time, _ in curves], [density for _, density in curves])
+
+    for row, (time, density) in enumerate(curves):
+        assert metrics["peak_number_density"][row] == max(density)
+        assert metrics["time_to_peak"][row] == time[density.index(max(density))]
+        assert metrics["peak_speed"][row] == pytest.approx(precipitation_speed(time, density), rel=1e-12)
+
+
+def test_degenerate_kinetics_curves():
+    metrics = kinetics_metrics([[1.0, 2.0, 3.0], [], [0.0, 1.0]], [[0.0, 0.0, 0.0], [], [5.0, 1.0]])
+    assert metrics["peak_number_density"][0] == 0.0 and metrics["peak_speed"][0] == 0.0
+    assert np.isnan(metrics["time_to_peak"][0]) and np.isnan(metrics["incubation_time"][0])
+    assert all(np.isnan(values[1]) for values in metrics.values())
+    # peak at t = 0: no speed
+    assert metrics["peak_number_density"][2] == 5.0 and np.isnan(metrics["peak_speed"][2])
+    with pytest.raises(ValueError, match="differ in length"):
+        kinetics_metrics([[1.0, 2.0]], [[1.0]])
+
+
+# ---- campaigns ------#
+def test_scheil_campaign_matches_the_original_formulas():
+    run_campaign(scheil_spec())
+    columns = ResultStore("result_store").read_family("scheil").to_pandas()
+    for row, composition in enumerate(zip(columns["Cr"], columns["Co"], columns["C"])):
+        x, y = curve_from_sections(scheil_sections(*composition))
+        assert columns["HCS"][row] == pytest.approx(hot_cracking_susceptibility(x, y), rel=1e-9)
+        assert columns["GRF"][row] == pytest.approx(growth_restriction_factor(x, y), rel=1e-9)
+
+
+def test_precipitation_campaign_matches_the_original_formulas():
+    spec = load_spec(os.path.join(os.path.dirname(fake_tc_python.__file__), "campaigns", "precipitation_HCP_A3.yaml"))
+    spec["composition"].update({"Cr": [0.10, 0.145, 2], "Co": [0.0, 0.05, 2], "C_N": [0.0005, 0.002, 2]})
+    spec["parallel"]["processes"] = 1
+    run_campaign(spec)
+    columns = ResultStore("result_store").read_family("precipitation_HCP_A3#2_kinetics").to_pandas()
+    for row, composition in enumerate(zip(columns["Cr"], columns["Co"], columns["C"])):
+        time, density = number_density(*composition)
+        assert columns["HCP_A3#2_peak_number_density"][row] == pytest.approx(max(density), rel=1e-9)
+        assert columns["HCP_A3#2_peak_speed"][row] == pytest.approx(precipitation_speed(time, density), rel=1e-9)
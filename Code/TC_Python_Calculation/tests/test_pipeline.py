@@ -0,0 +1,33 @@
+import numpy as np
+
+import sweep_pipeline
+from sweep_engine import FunctionSession, composition_grid, iter_sweep
+from sweep_pipeline import ColumnSink, run_pipeline
+
+
+def value(point):
+    return point.x_Cr + 10 * point.x_Co + 100 * point.x_C_N
+
+
+def metrics(batch):
+    return [{"index": point.index, "value": result} for point, result in batch]
+
+
+def test_large_pool_keeps_every_worker_busy(monkeypatch):
+    calls = []
+
+    def recording_iter_sweep(points, session, processes=None, chunk_size=None, ordered=False, max_pending=None,
+                             pool=None):
+        calls.append({"processes": processes, "chunk_size": chunk_size, "max_pending": max_pending})
+        return iter_sweep(points, session, 1, chunk_size, ordered, max_pending)
+
+    monkeypatch.setattr(sweep_pipeline, "iter_sweep", recording_iter_sweep)
+    points = composition_grid(np.linspace(10, 14.5, 10), np.linspace(0, 5, 10), np.linspace(0.15, 0.4, 10))
+    columns = ColumnSink(["index", "value"])
+    run_pipeline(points, FunctionSession(value), "sweep.sqlite", metrics, [columns], processes=32, batch_size=10,
+                 queue_size=4)
+
+    assert calls[0]["max_pending"] >= 2 * 32
+    assert calls[0]["chunk_size"] <= 10
+    assert columns.columns["index"] == [point.index for point in points]
+    assert columns.columns["value"] == [value(point) for point in points]
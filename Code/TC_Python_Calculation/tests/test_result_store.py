@@ -0,0 +1,96 @@
+"""
+ALL_data.csv export from result store families shaped like the real sweeps: pyex_01/03 on the C/N grid
+0.15-0.4 wt%, pyex_04 (or the precipitation_HCP_A3 campaign) on 0.05-0.2 wt%, every script numbering its own
+points.
+"""
+import itertools
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from result_store import ResultStore, export_all_data_csv, family_table
+
+
+CR = np.linspace(10, 14.5, 4)
+CO = np.linspace(0, 5, 3)
+C_N_PYEX_01 = np.linspace(0.15, 0.4, 6)     # wt%, shared by pyex_01 and pyex_03
+C_N_PYEX_04 = np.linspace(0.0005, 0.002, 6)  # mass fraction, overlaps the other grid at 0.2 wt% only
+
+
+def grid(C_N):
+    return np.array(list(itertools.product(CR, CO, C_N)))
+
+
+def write_families(store, precipitation_family="precipitation_HCP_A3#2"):
+    percent = grid(C_N_PYEX_01)
+    index = np.arange(1, len(percent) + 1)
+    # pyex_01/03 divide their mass percent grid by 100
+    store.write_family("equilibrium", family_table(
+        index, percent[:, 0]/100, percent[:, 1]/100, percent[:, 2]/100,
+        {"Density": 7000 + percent[:, 2], "BCC_A2#1": percent[:, 0]/100, "BCC_A2#2": percent[:, 1]/100,
+         "M23C6#1": percent[:, 2]/100}))
+    store.write_family("scheil", family_table(
+        index, percent[:, 0]/100, percent[:, 1]/100, percent[:, 2]/100,
+        {"HCS": percent[:, 0], "GRF": percent[:, 1], "SR": percent[:, 2]}))
+    # pyex_04 sweeps in mass fraction
+    mass = grid(C_N_PYEX_04) * [0.01, 0.01, 1]
+    if precipitation_family == "precipitation_HCP_A3#2":
+        columns = {"max_number_density": 1e20 * mass[:, 2], "precipitation_speed": 1e17 * mass[:, 2]}
+    else:
+        columns = {"HCP_A3#2_peak_number_density": 1e20 * mass[:, 2], "HCP_A3#2_peak_speed": 1e17 * mass[:, 2],
+                   "HCP_A3#2_time_to_peak": np.full(len(mass), 300.0)}
+    store.write_family(precipitation_family, family_table(
+        np.arange(1, len(mass) + 1), mass[:, 0], mass[:, 1], mass[:, 2], columns))
+
+
+@pytest.mark.parametrize("precipitation_family", ["precipitation_HCP_A3#2", "precipitation_HCP_A3#2_kinetics"])
+def test_export_joins_the_families_on_the_composition(precipitation_family):
+    store = ResultStore("result_store")
+    write_families(store, precipitation_family)
+    export_all_data_csv(store, "ALL_data.csv")
+
+    with open("ALL_data.csv") as csv_file:
+        assert csv_file.readline().strip() == ("Index,Cr,Co,C,Density,BCC_A2#1,BCC_A2#2,M23C6#1,HCS,GRF,SR,"
+                                               "Maximum nunmber density,Precipitation speed")
+    data = pd.read_csv("ALL_data.csv")
+    # inner join: only the C/N level shared by both grids
+    assert len(data) == len(CR) * len(CO)
+    assert not data.isna().any().any()
+    assert list(data["Index"]) == list(range(1, len(data) + 1))
+    assert np.allclose(data["C"], 0.002)
+    assert np.allclose(data["Maximum nunmber density"], 1e20 * data["C"])
+    assert np.allclose(data["HCS"], 100 * data["Cr"])
+    assert np.allclose(data["GRF"], 100 * data["Co"])
+    assert data[["Cr", "Co", "C"]].equals(data[["Cr", "Co", "C"]].sort_values(["Cr", "Co", "C"]))
+
+
+def test_outer_join_keeps_every_composition():
+    store = ResultStore("result_store")
+    write_families(store)
+    table = export_all_data_csv(store, "ALL_data.csv", how="outer").to_pandas()
+
+    assert len(table) == len(CR) * len(CO) * (len(C_N_PYEX_01) + len(C_N_PYEX_04) - 1)
+    assert table["SR"].isna().sum() == len(CR) * len(CO) * (len(C_N_PYEX_04) - 1)
+    assert table["Precipitation speed"].isna().sum() == len(CR) * len(CO) * (len(C_N_PYEX_01) - 1)
+
+
+def test_missing_family_is_reported():
+    store = ResultStore("result_store")
+    write_families(store)
+    os.remove(store.path("scheil"))
+    with pytest.raises(ValueError, match="none of the column families scheil"):
+        export_all_data_csv(store, "ALL_data.csv")
+
+
+def test_repeated_composition_is_rejected():
+    store = ResultStore("result_store")
+    write_families(store)
+    scheil = store.read_family("scheil").to_pandas()
+    scheil["Index"] += len(scheil)
+    store.write_family("scheil_800K", family_table(
+        np.concatenate([scheil["Index"] - len(scheil), scheil["Index"]]), np.tile(scheil["Cr"], 2),
+        np.tile(scheil["Co"], 2), np.tile(scheil["C"], 2), {"T": np.repeat([700.0, 800.0], len(scheil))}))
+    with pytest.raises(ValueError, match="more than once"):
+        store.join(["equilibrium", "scheil_800K"])
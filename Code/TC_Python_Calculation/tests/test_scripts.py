@@ -0,0 +1,58 @@
+"""
+The pyex sweep scripts, imported without running their main block (see benchmark.load_script).
+"""
+import os
+import types
+
+import pytest
+
+import fake_tc_python
+from benchmark import grid_unit, load_script, script_points
+from result_store import ResultStore
+from sweep_campaign import load_spec, run_campaign
+from sweep_engine import GridPoint, TCPythonSession, composition_grid
+from sweep_pipeline import ColumnSink, run_pipeline
+
+
+CAMPAIGNS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "campaigns")
+
+
+def test_equilibrium_conditions_are_mass_fractions():
+    module = load_script("equilibrium")
+    # joined with the mass fraction Scheil and precipitation families in ALL_data.csv
+    assert module.settings["composition_unit"] == "mass_percent"
+    with fake_tc_python.TCPython() as start:
+        calculation = module.configure(start)
+        module.calculate_point(calculation, GridPoint(1, 12.0, 2.5, 0.2))
+    assert calculation.conditions == pytest.approx({"T": 300, "W(Cr)": 0.12, "W(Co)": 0.025, "W(C)": 0.002,
+                                                    "W(N)": 0.002})
+
+
+def test_precipitation_script_and_campaign_families_do_not_collide():
+    spec = load_spec(os.path.join(CAMPAIGNS, "precipitation_HCP_A3.yaml"))
+    spec["composition"].update({"Cr": [0.10, 0.145, 2], "Co": [0.0, 0.05, 2], "C_N": [0.0005, 0.002, 2]})
+    spec["parallel"]["processes"] = 1
+    run_campaign(spec)
+    store = ResultStore("result_store")
+    campaign_family = store.read_family(spec["campaign"]["family"])
+
+    module = load_script("precipitation_HCP_A3")
+    assert spec["campaign"]["family"] not in module.FAMILIES
+    points = composition_grid([0.10, 0.145], [0.0, 0.05], [0.0005, 0.002])
+    columns = ColumnSink([name for names in module.FAMILIES.values() for name in names])
+    run_pipeline(points, TCPythonSession(module.configure, module.evaluate), "pyex_04_checkpoint.sqlite",
+                 module.metrics, [columns], processes=1, settings=module.settings)
+    module.write_families(store, points, columns.columns)
+
+    assert store.read_family(spec["campaign"]["family"]).equals(campaign_family)
+    for family, names in module.FAMILIES.items():
+        assert store.read_family(family).column_names[4:] == names
+
+
+@pytest.mark.parametrize("name, unit", [("equilibrium", "mass_percent"), ("precipitation_M23C6", "mass_percent"),
+                                        ("scheil", "mass_percent"), ("precipitation_HCP_A3", "mass_fraction")])
+def test_benchmark_grid_is_in_the_unit_of_the_script(name, unit):
+    points = script_points(load_script(name), 3)
+    assert grid_unit(points) == unit and len(points) == 3
+    with pytest.raises(ValueError, match="no default grid"):
+        script_points(types.SimpleNamespace(__name__=name, settings={"composition_unit": "mole_fraction"}), 3)
@@ -0,0 +1,102 @@
+import itertools
+
+import numpy as np
+import pytest
+
+import fake_tc_python
+from sweep_engine import GridPoint, composition_grid
+from sweep_order import WarmStartEvaluate, hilbert_index, hilbert_order, serpentine_order
+
+
+@pytest.mark.parametrize("shape", [(3, 4, 5), (2, 1, 3), (19, 11, 6), (1, 1, 1)])
+def test_serpentine_steps_change_one_level(shape):
+    # the compositions are the level numbers
+    points = composition_grid(*[np.arange(n, dtype=float) for n in shape])
+    order = serpentine_order(points, shape)
+
+    assert sorted(point.index for point in order) == [point.index for point in points]
+    levels = np.array([[point.x_Cr, point.x_Co, point.x_C_N] for point in order])
+    steps = np.abs(np.diff(levels, axis=0))
+    assert np.all(steps.sum(axis=1) == 1)
+    assert np.all(np.count_nonzero(steps, axis=1) == 1)
+
+
+def test_serpentine_rejects_another_shape():
+    with pytest.raises(ValueError, match="do not match"):
+        serpentine_order(composition_grid([1.0, 2.0], [1.0], [1.0, 2.0]), (2, 2, 2))
+
+
+@pytest.mark.parametrize("dimensions, bits", [(2, 1), (2, 4), (3, 1), (3, 3)])
+def test_hilbert_index_is_a_bijection_with_unit_steps(dimensions, bits):
+    cube = np.array(list(itertools.product(range(1 << bits), repeat=dimensions)))
+    distance = hilbert_index(cube, bits)
+
+    np.testing.assert_array_equal(np.sort(distance), np.arange(len(cube)))
+    walk = cube[np.argsort(distance)]
+    assert np.all(np.abs(np.diff(walk, axis=0)).sum(axis=1) == 1)
+
+
+def test_hilbert_order_is_a_permutation():
+    rng = np.random.default_rng(0)
+    points = [GridPoint(index, *composition) for index, composition in enumerate(rng.uniform(size=(200, 3)), 1)]
+    order = hilbert_order(points, bits=4)
+    assert sorted(point.index for point in order) == list(range(1, 201))
+
+    # neighbours on the curve are close: the walk is much shorter than the random order
+    def length(walk):
+        values = np.array([[point.x_Cr, point.x_Co, point.x_C_N] for point in walk])
+        return np.linalg.norm(np.diff(values, axis=0), axis=1).sum()
+
+    assert length(order) < 0.5 * length(points)
+
+
+class RecordingCalculation(fake_tc_python.SingleEquilibriumCalculation):
+    """
+    Fake equilibrium calculation with a global minimization switch.
+    """
+
+    def __init__(self):
+        super().__init__(["Fe", "Cr", "Co", "C", "N"])
+        self.global_minimization = True
+
+    def enable_global_minimization(self):
+        self.global_minimization = True
+        return self
+
+    def disable_global_minimization(self):
+        self.global_minimization = False
+        return self
+
+
+def test_warm_start_falls_back_to_global_minimization():
+    solves = []
+
+    def calculate(calculation, point):
+        solves.append((point.index, calculation.global_minimization))
+        for element, value in (("Cr", point.x_Cr), ("Co", point.x_Co), ("C", point.x_C_N), ("N", point.x_C_N)):
+            calculation.set_condition(f"W({element})", value)
+        return calculation.calculate()
+
+    evaluate = WarmStartEvaluate(calculate, lambda result: sorted(result.get_stable_phases()))
+    calculation = RecordingCalculation().disable_global_minimization()
+    # SIGMA becomes stable above 13.5 wt% Cr
+    points = [GridPoint(1, 0.12, 0.0, 0.002), GridPoint(2, 0.125, 0.0, 0.002), GridPoint(3, 0.14, 0.0, 0.002),
+              GridPoint(4, 0.145, 0.0, 0.002)]
+    values = [evaluate(calculation, point) for point in points]
+
+    assert [value["timing"]["global_minimization"] for value in values] == [True, False, True, False]
+    # the phase change is solved again with global minimization
+    assert solves == [(1, True), (2, False), (3, False), (3, True), (4, False)]
+    assert "SIGMA" in values[2]["phases"] and "SIGMA" not in values[1]["phases"]
+    assert values[2]["result"] == values[2]["phases"]
+    assert not calculation.global_minimization
+
+
+def test_warm_start_restores_the_state_after_an_error():
+    def failing(calculation, point):
+        raise RuntimeError("no convergence")
+
+    calculation = RecordingCalculation().disable_global_minimization()
+    with pytest.raises(RuntimeError):
+        WarmStartEvaluate(failing, None)(calculation, GridPoint(1, 0.12, 0.0, 0.002))
+    assert not calculation.global_minimization
@@ -0,0 +1,47 @@
+import sqlite3
+
+import pytest
+
+from checkpoint import SweepCheckpoint
+from conftest import scheil_spec
+from sweep_campaign import run_campaign
+from sweep_profiler import checkpoint_completed, report, summarize
+
+
+def point_records(indices, seconds=10.0):
+    # one point every `seconds`, one after the other: 360 points/h
+    return [{"index": index, "role": "worker", "pid": 1, "start": position * seconds, "total": seconds,
+             "phases": {"calculate": seconds}} for position, index in enumerate(indices)]
+
+
+def test_eta_of_a_resumed_sweep():
+    records = point_records(range(61, 71))
+    summary = summarize(records, total_points=100)
+    assert summary["points_per_hour"] == pytest.approx(360)
+    # without the checkpoint only the 10 points timed in this run count as done
+    assert summary["remaining"] == 90 and summary["eta"] == pytest.approx(900)
+    # 60 points were done before the resume
+    summary = summarize(records, total_points=100, completed=70)
+    assert summary["remaining"] == 30 and summary["eta"] == pytest.approx(300)
+    assert "ETA: 0.08 h (30 points remaining)" in report(summary)
+    assert summarize(records)["eta"] is None
+
+
+def test_checkpoint_completed():
+    assert checkpoint_completed("missing.sqlite") == 0
+    with SweepCheckpoint("checkpoint.sqlite") as checkpoint:
+        for index in (1, 2, 5):
+            checkpoint.add(index, None)
+    assert checkpoint_completed("checkpoint.sqlite") == 3
+
+
+def test_resumed_campaign_has_nothing_remaining(capsys):
+    run_campaign(scheil_spec())
+    with sqlite3.connect("scheil_checkpoint.sqlite") as connection:
+        connection.execute("DELETE FROM points WHERE point_index > 4")
+    capsys.readouterr()
+    run_campaign(scheil_spec())
+    output = capsys.readouterr().out
+    # 4 points timed in the resumed run, the other 4 from the checkpoint
+    assert "Resuming: 4 of 8 points already done" in output and "Points: 4," in output
+    assert "(0 points remaining)" in output
@@ -0,0 +1,217 @@
+"""
+Incremental dataset assembly and surrogate updates for newly calculated sweep points.
+
+New points are read from the result store of the sweeps (joined column families, see
+TC_Python_Calculation/result_store.py) and merged into ALL_data.csv on the composition key, i.e. Cr, Co, C
+rounded to `decimals`: unknown compositions are appended with new indices, known ones are replaced.
+
+The surrogate bundle of surrogate.py is then updated instead of retrained from scratch. The feature scaling of
+the bundle is kept, so the models stay consistent with each other:
+
+    KNN       refitted on all the rows (inserting into the neighbour index is all a KNN fit does)
+    RF        warm-started: new trees are grown on all the rows and added to the forest
+    DT, ...   kept as long as their error on the new points (which they have not seen) stays within
+              `tolerance` of their cross-validated error, retrained on all the rows otherwise
+
+A full retrain (new scaling, new reference errors) happens when known compositions were replaced or the forest
+outgrows `max_trees`.
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import KFold
+
+from surrogate import DATA_PATH, FEATURES, MODELS, TARGETS, load_data, save_surrogates, tabulate, train_surrogates
+
+
+STORE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "TC_Python_Calculation", "result_store")
+
+
+def composition_key(data, decimals=9):
+    return [tuple(row) for row in np.round(data[FEATURES].to_numpy(dtype=np.float64), decimals)]
+
+
+def rows_from_store(store_path=STORE_PATH):
+    """
+    New rows in the layout of ALL_data.csv from the ALL_data families of a result store, joined on the
+    composition (see result_store.all_data_table).
+    """
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "TC_Python_Calculation"))
+    from result_store import ResultStore, all_data_table
+
+    return all_data_table(ResultStore(store_path)).to_pandas()
+
+
+def merge_rows(data, new_rows, decimals=9):
+    """
+    Merge new rows into the data set on the composition key.
+
+    Returns the merged data, the number of appended and of replaced rows. Appended rows keep their order and
+    get indices after the last index of the data; the existing rows keep their position. Columns of the data
+    missing from the new rows are NaN in the appended rows and unchanged in the replaced ones.
+    """
+    new_rows = new_rows[[column for column in data.columns if column in new_rows.columns]].copy()
+    new_rows = new_rows.drop_duplicates(subset=FEATURES, keep="last")
+    positions = {key: position for position, key in enumerate(composition_key(data, decimals))}
+    new_positions = np.array([positions.get(key, -1) for key in composition_key(new_rows, decimals)])
+
+    merged = data.copy()
+    known = new_positions >= 0
+    if known.any():
+        columns = [column for column in new_rows.columns if column != "Index"]
+        merged.loc[merged.index[new_positions[known]], columns] = new_rows.loc[known, columns].to_numpy()
+    appended = new_rows.loc[~known].copy()
+    if len(appended):
+        appended["Index"] = np.arange(len(appended)) + int(data["Index"].max()) + 1
+        merged = pd.concat([merged, appended.reindex(columns=data.columns)], ignore_index=True)
+    return merged, int((~known).sum()), int(known.sum())
+
+
+def merge_complete_rows(data, new_rows, decimals=9):
+    """
+    Merge the new rows like merge_rows, leaving out those that would give a row with a missing feature or
+    target value (e.g. a composition missing from one of the joined families).
+
+    Returns the merged data, the number of appended, of replaced and of skipped new rows.
+    """
+    required = FEATURES + [column for column in TARGETS.values() if column in data.columns]
+    merged, n_appended, n_replaced = merge_rows(data, new_rows, decimals)
+    incomplete = set(composition_key(merged[merged[required].isna().any(axis=1)], decimals))
+    skipped = np.array([key in incomplete for key in composition_key(new_rows, decimals)], dtype=bool) | \
+        new_rows[FEATURES].isna().any(axis=1).to_numpy()
+    if skipped.any():
+        merged, n_appended, n_replaced = merge_rows(data, new_rows[~skipped], decimals)
+    return merged, n_appended, n_replaced, int(skipped.sum())
+
+
+def append_to_csv(data, n_appended, path=DATA_PATH):
+    """
+    Write the merged data: only the appended rows when nothing else changed, the whole file otherwise.
+    """
+    if 0 < n_appended and os.path.exists(path) and len(pd.read_csv(path, encoding="utf-8-sig", usecols=["Index"])) \
+            == len(data) - n_appended:
+        data.iloc[len(data) - n_appended:].to_csv(path, mode="a", header=False, index=False)
+    else:
+        data.to_csv(path, index=False, encoding="utf-8-sig")
+
+
+# ---- model updates ------#
+def _scaled(bundle, data):
+    return (data[FEATURES].to_numpy(dtype=np.float64) - bundle["mean"]) / bundle["scale"]
+
+
+def _rmse(model, x, y):
+    return float(np.sqrt(np.mean((model.predict(x) - y)**2)))
+
+
+def reference_errors(bundle, data, models=("DT", "AdaBoost"), n_splits=5, seed=42, keys=None):
+    """
+    Cross-validated RMSE of the models without incremental update, the reference for the drift check.
+    keys restricts it to some (model, target).
+    """
+    x = _scaled(bundle, data)
+    errors = {}
+    for (model_name, target) in bundle["models"]:
+        if model_name not in models or (keys is not None and (model_name, target) not in keys):
+            continue
+        y = data[TARGETS[target]].to_numpy(dtype=np.float64)
+        fold_errors = [_rmse(MODELS[model_name](seed).fit(x[train], y[train]), x[test], y[test])
+                       for train, test in KFold(n_splits, shuffle=True, random_state=seed).split(x)]
+        errors[(model_name, target)] = float(np.mean(fold_errors))
+    return errors
+
+
+def retrain(data, models=tuple(MODELS), targets=tuple(TARGETS), seed=42):
+    """
+    Full training (new scaling) plus the reference errors and the row count of the incremental updates.
+    """
+    bundle = train_surrogates(data, models, targets, seed)
+    bundle["reference_errors"] = reference_errors(bundle, data, seed=seed)
+    bundle["n_samples"] = len(data)
+    return bundle
+
+
+def update_surrogates(bundle, data, tolerance=0.2, new_trees=None, max_trees=500, seed=42):
+    """
+    Update the bundle with the rows of data after bundle["n_samples"] (see the module docstring).
+
+    Returns the bundle and the action taken for every (model, target): "inserted", "warm_started", "kept",
+    "retrained" or "unchanged".
+    """
+    n_old = bundle.get("n_samples", len(data))
+    actions = {key: "unchanged" for key in bundle["models"]}
+    if len(data) <= n_old:
+        return bundle, actions
+    x = _scaled(bundle, data)
+    x_new = x[n_old:]
+    references = bundle.setdefault("reference_errors", {})
+    for (model_name, target), model in bundle["models"].items():
+        y = data[TARGETS[target]].to_numpy(dtype=np.float64)
+        if model_name == "KNN":
+            model.fit(x, y)
+            actions[(model_name, target)] = "inserted"
+        elif model_name == "RF":
+            # grow the forest in proportion to the new rows
+            grow = new_trees or max(10, int(np.ceil(model.n_estimators * (len(data) - n_old) / n_old)))
+            if model.n_estimators + grow > max_trees:
+                bundle["models"][(model_name, target)] = MODELS[model_name](seed).fit(x, y)
+                actions[(model_name, target)] = "retrained"
+            else:
+                model.set_params(warm_start=True, n_estimators=model.n_estimators + grow)
+                model.fit(x, y)
+                actions[(model_name, target)] = "warm_started"
+        else:
+            error = _rmse(model, x_new, y[n_old:])
+            reference = references.get((model_name, target))
+            if reference is not None and error <= (1 + tolerance) * reference:
+                actions[(model_name, target)] = "kept"
+                continue
+            bundle["models"][(model_name, target)] = MODELS[model_name](seed).fit(x, y)
+            actions[(model_name, target)] = "retrained"
+    retrained = [key for key, action in actions.items() if action == "retrained"]
+    if retrained:
+        references.update(reference_errors(bundle, data, seed=seed, keys=retrained))
+    bundle["lower"] = np.minimum(bundle["lower"], data[FEATURES].min().to_numpy(dtype=np.float64))
+    bundle["upper"] = np.maximum(bundle["upper"], data[FEATURES].max().to_numpy(dtype=np.float64))
+    # interpolation tables of updated models are stale
+    for model_name in list(bundle["tables"]):
+        if any(action != "kept" for (name, target), action in actions.items() if name == model_name):
+            tabulate(bundle, model_name, bundle["tables"][model_name]["targets"])
+    bundle["n_samples"] = len(data)
+    return bundle, actions
+
+
+if __name__ == "__main__":
+    import argparse
+    import joblib
+
+    parser = argparse.ArgumentParser(description="Merge new sweep points into ALL_data.csv and update the surrogates")
+    parser.add_argument("surrogates", help="joblib file of surrogate.py, updated in place (created when missing)")
+    parser.add_argument("--store", default=STORE_PATH, help="result store with the new points")
+    parser.add_argument("--data", default=DATA_PATH, help="data set to merge into")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative error drift of DT/AdaBoost")
+    parser.add_argument("--max-trees", type=int, default=500, help="forest size that triggers a full retrain")
+    args = parser.parse_args()
+
+    data = load_data(args.data)
+    data, n_appended, n_replaced, n_skipped = merge_complete_rows(data, rows_from_store(args.store))
+    if n_skipped:
+        print(f"{n_skipped} new rows with missing values skipped")
+    # checked before writing, so incomplete rows never reach the data set
+    incomplete = int(data[FEATURES + list(TARGETS.values())].isna().any(axis=1).sum())
+    if incomplete:
+        sys.exit(f"{incomplete} rows of {args.data} have missing values, nothing written and the surrogates are "
+                 f"not updated")
+    append_to_csv(data, n_appended, args.data)
+    print(f"{n_appended} rows appended, {n_replaced} rows replaced, {len(data)} rows in {args.data}")
+    if n_replaced or not os.path.exists(args.surrogates):
+        bundle = retrain(data)
+        print("all models retrained")
+    else:
+        bundle, actions = update_surrogates(joblib.load(args.surrogates), data, args.tolerance,
+                                            max_trees=args.max_trees)
+        for (model_name, target), action in sorted(actions.items()):
+            print(f"  {model_name:<9}{target:<6}{action}")
+    save_surrogates(bundle, args.surrogates)
@@ -0,0 +1,241 @@
+"""
+Cross-validated selection of the DT/KNN/RF/AdaBoost surrogates (result_images/accuracy_summary.png and
+mae_summary(MAE).png) in parallel, with the fitted folds cached on disk.
+
+ALL_data.csv is loaded once and saved as a NumPy matrix (features, then targets) in the cache directory; the
+pool workers memory-map it read-only instead of every job parsing the CSV. Every (model, target,
+hyperparameters, fold) is one job. Its fitted model and test fold predictions are cached under
+
+    <cache>/<data hash>/<job key>.joblib
+
+where the data hash covers the features, the column of the job's target and the folds, and the job key the
+estimator parameters. A run only computes the jobs missing from the cache, so adding a model, a target or a
+hyperparameter value trains only the new jobs, and changing a value of a target only retrains that target. The
+summary tables and figures are computed from the cached predictions.
+"""
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import KFold
+from sklearn.preprocessing import StandardScaler
+
+from surrogate import DATA_PATH, FEATURES, MODELS, TARGETS, load_data
+
+
+# hyperparameter values tried per model, on top of the MODELS defaults
+GRIDS = {"DT": {"max_depth": [None, 8, 16]},
+         "KNN": {"n_neighbors": [3, 5, 10]},
+         "RF": {"n_estimators": [100, 300]},
+         "AdaBoost": {"n_estimators": [50, 100], "learning_rate": [0.5, 1.0]}}
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "model_selection_cache")
+
+
+def parameter_sets(grid):
+    """
+    Every combination of a grid, as sorted tuples of (name, value).
+    """
+    sets = [()]
+    for name, values in sorted(grid.items()):
+        sets = [parameters + ((name, value),) for parameters in sets for value in values]
+    return sets
+
+
+def make_model(model_name, parameters, seed=42):
+    return MODELS[model_name](seed).set_params(**dict(parameters))
+
+
+def job_key(model_name, target, parameters, fold, seed=42):
+    """
+    File name of a job in the cache: the estimator parameters (n_jobs excluded, it does not change the fit),
+    the target and the fold.
+    """
+    estimator = {name: repr(value) for name, value in make_model(model_name, parameters, seed).get_params().items()
+                 if not name.endswith("n_jobs")}
+    text = repr((model_name, target, sorted(estimator.items()), fold))
+    return f"{model_name}_{target}_{fold}_" + hashlib.sha1(text.encode()).hexdigest()[:16]
+
+
+# ---- shared data ------#
+def feature_matrix(data, targets=tuple(TARGETS)):
+    return data[FEATURES + [TARGETS[target] for target in targets]].to_numpy(dtype=np.float64)
+
+
+def data_hash(features, target, folds):
+    """
+    Hash of the data a job sees: the feature columns, its target column and the test indices of the folds.
+    """
+    digest = hashlib.sha1(np.ascontiguousarray(features).tobytes())
+    digest.update(np.ascontiguousarray(target).tobytes())
+    for test in folds:
+        digest.update(np.asarray(test, dtype=np.int64).tobytes())
+    return digest.hexdigest()[:16]
+
+
+def prepare(data, cache_path=CACHE_PATH, targets=tuple(TARGETS), n_splits=5, seed=42):
+    """
+    Save the feature matrix for the workers. Returns the path of the matrix, the test indices of every fold
+    and the cache directory of every target.
+    """
+    matrix = feature_matrix(data, targets)
+    folds = [test for _, test in KFold(n_splits, shuffle=True, random_state=seed).split(matrix)]
+    features = matrix[:, :len(FEATURES)]
+    directories = {target: os.path.join(cache_path, data_hash(features, matrix[:, column], folds))
+                   for column, target in enumerate(targets, start=len(FEATURES))}
+    matrix_path = os.path.join(cache_path, "matrix-" + hashlib.sha1(matrix.tobytes()).hexdigest()[:16] + ".npy")
+    os.makedirs(cache_path, exist_ok=True)
+    if not os.path.exists(matrix_path):
+        np.save(matrix_path + ".tmp.npy", matrix)
+        os.replace(matrix_path + ".tmp.npy", matrix_path)
+    return matrix_path, folds, directories
+
+
+# ---- process pool ------#
+_worker_matrix = None
+_worker_folds = None
+
+
+def _init_worker(matrix_path, folds):
+    global _worker_matrix, _worker_folds
+    _worker_matrix = np.load(matrix_path, mmap_mode="r")
+    _worker_folds = folds
+
+
+def _run_job(job):
+    """
+    Fit one fold and cache the fitted model with its test predictions. Returns the cache path.
+    """
+    model_name, target, parameters, fold, column, seed, path, n_jobs = job
+    test = _worker_folds[fold]
+    train = np.setdiff1d(np.arange(len(_worker_matrix)), test)
+    x = _worker_matrix[:, :len(FEATURES)]
+    y = _worker_matrix[:, column]
+    scaler = StandardScaler().fit(x[train])
+    model = make_model(model_name, parameters, seed)
+    if "n_jobs" in model.get_params():
+        model.set_params(n_jobs=n_jobs)
+    model.fit(scaler.transform(x[train]), y[train])
+    result = {"model_name": model_name, "target": target, "parameters": parameters, "fold": fold,
+              "test": test, "y": np.array(y[test]), "prediction": model.predict(scaler.transform(x[test])),
+              "model": model, "scaler": scaler}
+    joblib.dump(result, path + ".tmp", compress=3)
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def run_selection(data=None, models=tuple(MODELS), targets=tuple(TARGETS), grids=GRIDS, n_splits=5, seed=42,
+                  cache_path=CACHE_PATH, processes=None):
+    """
+    Run the jobs missing from the cache. Returns the cache paths of all the jobs and the number computed.
+    """
+    if data is None:
+        data = load_data()
+    matrix_path, folds, directories = prepare(data, cache_path, targets, n_splits, seed)
+    for directory in directories.values():
+        os.makedirs(directory, exist_ok=True)
+    jobs, paths = [], []
+    for model_name in models:
+        for parameters in parameter_sets(grids.get(model_name, {})):
+            for column, target in enumerate(targets, start=len(FEATURES)):
+                for fold in range(n_splits):
+                    path = os.path.join(directories[target],
+                                        job_key(model_name, target, parameters, fold, seed) + ".joblib")
+                    paths.append(path)
+                    if not os.path.exists(path):
+                        jobs.append((model_name, target, parameters, fold, column, seed, path,
+                                     -1 if processes == 1 else 1))
+    if processes == 1 or len(jobs) <= 1:
+        _init_worker(matrix_path, folds)
+        list(map(_run_job, jobs))
+    else:
+        with ProcessPoolExecutor(processes, initializer=_init_worker, initargs=(matrix_path, folds)) as pool:
+            list(pool.map(_run_job, jobs))
+    return paths, len(jobs)
+
+
+# ---- summaries ------#
+def fold_scores(paths):
+    """
+    R2 and MAE of every cached fold, one row per job.
+    """
+    rows = []
+    for path in paths:
+        result = joblib.load(path)
+        y, prediction = result["y"], result["prediction"]
+        rows.append({"model": result["model_name"], "target": result["target"],
+                     "parameters": ", ".join(f"{name}={value}" for name, value in result["parameters"]),
+                     "fold": result["fold"],
+                     "R2": 1 - np.sum((y - prediction)**2) / np.sum((y - y.mean())**2),
+                     "MAE": float(np.mean(np.abs(y - prediction)))})
+    return pd.DataFrame(rows)
+
+
+def summarize(scores):
+    """
+    Mean and standard deviation over the folds of every (model, target, parameters), and the selected
+    parameters (best mean R2) of every (model, target).
+    """
+    table = scores.groupby(["model", "target", "parameters"], sort=False)[["R2", "MAE"]].agg(["mean", "std"])
+    table.columns = [f"{metric}_{statistic}" for metric, statistic in table.columns]
+    table = table.reset_index()
+    selected = table.loc[table.groupby(["model", "target"], sort=False)["R2_mean"].idxmax()]
+    return table, selected.reset_index(drop=True)
+
+
+def plot_summary(selected, metric, path, ylabel, log=False):
+    """
+    Grouped bars of a metric of the selected models, one group per model and one bar per target.
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    models = list(dict.fromkeys(selected["model"]))
+    targets = list(dict.fromkeys(selected["target"]))
+    width = 0.8 / len(targets)
+    fig, ax = plt.subplots(figsize=(6, 4.5), dpi=300)
+    for position, target in enumerate(targets):
+        rows = selected[selected["target"] == target].set_index("model").reindex(models)
+        ax.bar(np.arange(len(models)) + (position - (len(targets) - 1) / 2) * width, rows[f"{metric}_mean"],
+               width, yerr=rows[f"{metric}_std"], capsize=2, edgecolor="black", label=target)
+    ax.set_xticks(np.arange(len(models)))
+    ax.set_xticklabels(models)
+    ax.set_ylabel(ylabel)
+    if log:
+        ax.set_yscale("log")
+    ax.legend(fontsize=8)
+    fig.savefig(path, bbox_inches="tight")
+    plt.close(fig)
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Parallel cross-validated model selection of the surrogates")
+    parser.add_argument("--data", default=DATA_PATH)
+    parser.add_argument("--models", nargs="+", default=list(MODELS), choices=list(MODELS))
+    parser.add_argument("--targets", nargs="+", default=list(TARGETS), choices=list(TARGETS))
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--defaults", action="store_true", help="only the MODELS defaults, no hyperparameter grid")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--cache", default=CACHE_PATH, help="cache directory of the fitted folds")
+    parser.add_argument("--output", default=".", help="directory of the summary tables and figures")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    paths, n_computed = run_selection(load_data(args.data), args.models, args.targets, {} if args.defaults else GRIDS,
+                                      args.folds, args.seed, args.cache, args.processes)
+    print(f"{n_computed} of {len(paths)} folds computed, {len(paths) - n_computed} from the cache "
+          f"({time.perf_counter() - start:.1f} s)")
+    table, selected = summarize(fold_scores(paths))
+    os.makedirs(args.output, exist_ok=True)
+    table.to_csv(os.path.join(args.output, "model_selection.csv"), index=False)
+    selected.to_csv(os.path.join(args.output, "model_selection_best.csv"), index=False)
+    plot_summary(selected, "R2", os.path.join(args.output, "accuracy_summary.png"), "$R^2$ score")
+    plot_summary(selected, "MAE", os.path.join(args.output, "mae_summary(MAE).png"), "MAE", log=True)
+    print(selected.to_string(index=False))
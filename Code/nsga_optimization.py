@@ -0,0 +1,122 @@
+"""
+NSGA-II/NSGA-III optimization of the Cr, Co, C composition on the surrogate models.
+
+AlloyDesignProblem is a vectorized pymoo Problem: the whole population is scored with one batched surrogate
+call per generation. Independent runs (seeds, algorithms, reference direction sets) can be spread over a
+process pool; every worker loads the surrogate file once.
+
+Objectives: minimize HCS and SR, maximize GRF and the precipitation speed PSC (pymoo minimizes, so the
+maximized objectives are negated internally and restored in the returned front).
+"""
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from pymoo.algorithms.moo.nsga2 import NSGA2
+from pymoo.algorithms.moo.nsga3 import NSGA3
+from pymoo.core.problem import Problem
+from pymoo.optimize import minimize
+from pymoo.util.ref_dirs import get_reference_directions
+
+from surrogate import FEATURES, SurrogateModels
+
+
+OBJECTIVES = ("HCS", "GRF", "SR", "PSC")
+SENSES = np.array([1.0, -1.0, 1.0, -1.0])  # +1 minimize, -1 maximize
+
+
+class AlloyDesignProblem(Problem):
+    """
+    Args:
+        surrogates: SurrogateModels
+        model_name: surrogate used for the objectives ("RF", "DT", "KNN", "AdaBoost")
+        tabulated: use the interpolation table of the surrogate instead of the model itself
+    """
+
+    def __init__(self, surrogates, model_name="RF", tabulated=False):
+        self.surrogates = surrogates
+        self.model_name = model_name
+        self.tabulated = tabulated
+        bundle = surrogates.bundle
+        super().__init__(n_var=len(FEATURES), n_obj=len(OBJECTIVES), xl=bundle["lower"], xu=bundle["upper"])
+
+    def _evaluate(self, x, out, *args, **kwargs):
+        out["F"] = self.surrogates.predict(x, self.model_name, OBJECTIVES, self.tabulated) * SENSES
+
+
+def make_algorithm(name, pop_size, n_partitions=6):
+    if name == "NSGA2":
+        return NSGA2(pop_size=pop_size)
+    if name == "NSGA3":
+        ref_dirs = get_reference_directions("das-dennis", len(OBJECTIVES), n_partitions=n_partitions)
+        return NSGA3(ref_dirs=ref_dirs, pop_size=max(pop_size, len(ref_dirs)))
+    raise ValueError(f"unknown algorithm {name}")
+
+
+def run_optimization(surrogates, algorithm="NSGA2", pop_size=100, n_gen=200, seed=1, n_partitions=6,
+                     model_name="RF", tabulated=False):
+    """
+    Run one optimization and return its Pareto front as a DataFrame (HCS, GRF, SR, PSC, Cr, Co, C).
+    """
+    problem = AlloyDesignProblem(surrogates, model_name, tabulated)
+    result = minimize(problem, make_algorithm(algorithm, pop_size, n_partitions), ("n_gen", n_gen), seed=seed,
+                      verbose=False)
+    front = pd.DataFrame(np.atleast_2d(result.F) * SENSES, columns=list(OBJECTIVES))
+    for column, name in enumerate(FEATURES):
+        front[name] = np.atleast_2d(result.X)[:, column]
+    return front
+
+
+# ---- process pool ------#
+_worker_surrogates = None
+
+
+def _init_worker(surrogate_path):
+    global _worker_surrogates
+    _worker_surrogates = SurrogateModels(surrogate_path)
+
+
+def _run_config(config):
+    return run_optimization(_worker_surrogates, **config)
+
+
+def run_many(surrogate_path, configs, processes=None):
+    """
+    Run independent optimizations, e.g. [{"algorithm": "NSGA3", "seed": s, "n_partitions": p}, ...].
+    Returns the fronts in the order of the configs.
+    """
+    configs = list(configs)
+    if processes == 1 or len(configs) == 1:
+        _init_worker(surrogate_path)
+        return [_run_config(config) for config in configs]
+    with ProcessPoolExecutor(processes, initializer=_init_worker, initargs=(surrogate_path,)) as pool:
+        return list(pool.map(_run_config, configs))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="NSGA-II/III optimization on the surrogate models")
+    parser.add_argument("surrogates", help="joblib file written by surrogate.py")
+    parser.add_argument("--algorithm", choices=["NSGA2", "NSGA3"], default="NSGA2")
+    parser.add_argument("--model", default="RF", help="surrogate model")
+    parser.add_argument("--tabulated", action="store_true", help="use the interpolation table of the model")
+    parser.add_argument("--pop-size", type=int, default=100)
+    parser.add_argument("--n-gen", type=int, default=200)
+    parser.add_argument("--seeds", type=int, nargs="+", default=[1])
+    parser.add_argument("--partitions", type=int, nargs="+", default=[6], help="NSGA3 reference direction sets")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--output", default=None, help="CSV of the merged fronts, pareto_front_<algorithm>.csv by default")
+    args = parser.parse_args()
+
+    # reference directions only matter for NSGA3
+    partition_sets = args.partitions if args.algorithm == "NSGA3" else args.partitions[:1]
+    configs = [{"algorithm": args.algorithm, "pop_size": args.pop_size, "n_gen": args.n_gen, "seed": seed,
+                "n_partitions": partitions, "model_name": args.model, "tabulated": args.tabulated}
+               for seed in args.seeds for partitions in partition_sets]
+    fronts = run_many(args.surrogates, configs, args.processes)
+    for config, front in zip(configs, fronts):
+        front["seed"] = config["seed"]
+        front["n_partitions"] = config["n_partitions"]
+    output = args.output or f"pareto_front_{args.algorithm.lower()}.csv"
+    pd.concat(fronts, ignore_index=True).to_csv(output)
@@ -0,0 +1,297 @@
+"""
+Pareto fronts of the alloy properties and their hypervolume, for the computed data (ALL_data.csv) as well as
+for millions of surrogate-sampled compositions.
+
+All objectives are minimized; as_minimization flips the maximized ones (GRF and the precipitation speed PSC),
+like nsga_optimization.py does for pymoo.
+
+    non_dominated   Kung-style presorted filter: sorted by the normalized objective sum no point can be dominated
+                    by a later one, so the candidates are checked in vectorized blocks against the front found so
+                    far, strongest members first, and the front is never revised. Two objectives use an
+                    O(n log n) sweep.
+    ParetoFront     incrementally updated front (insert batches of new points, dominated members are dropped)
+    hypervolume     exact dimension-sweep hypervolume, or a Monte Carlo estimate for large fronts
+    compare_fronts  hypervolume and mutual coverage of several fronts, normalized on their common ideal and
+                    nadir points so fronts from different sources (surrogate, TC-Python) compare directly
+"""
+import numpy as np
+import pandas as pd
+
+from surrogate import DATA_PATH, FEATURES, TARGETS
+
+
+OBJECTIVES = ("HCS", "GRF", "SR", "PSC")
+SENSES = np.array([1.0, -1.0, 1.0, -1.0])  # +1 minimize, -1 maximize
+
+
+def as_minimization(data, objectives=OBJECTIVES, senses=SENSES):
+    """
+    (n, m) objective array to minimize from a DataFrame with target columns (ALL_data.csv names or short names).
+    """
+    columns = [objective if objective in data.columns else TARGETS[objective] for objective in objectives]
+    return data[columns].to_numpy(dtype=np.float64) * senses
+
+
+def _dominated_by(front, candidates, chunk_size=64):
+    """
+    Mask of the candidates dominated by at least one point of front. The front is walked in chunks and the
+    candidates already dominated are dropped, so a front sorted with its strongest points first ends early.
+    """
+    dominated = np.zeros(len(candidates), dtype=bool)
+    alive = np.arange(len(candidates))
+    for start in range(0, len(front), chunk_size):
+        if not len(alive):
+            break
+        members = front[start:start + chunk_size]
+        remaining = candidates[alive]
+        no_worse = np.ones((len(members), len(alive)), dtype=bool)
+        better = np.zeros((len(members), len(alive)), dtype=bool)
+        for column in range(front.shape[1]):
+            member, candidate = members[:, column, None], remaining[None, :, column]
+            no_worse &= member <= candidate
+            better |= member < candidate
+        hit = np.any(no_worse & better, axis=0)
+        dominated[alive[hit]] = True
+        alive = alive[~hit]
+    return dominated
+
+
+def _block_size(front_size, n_objectives, max_elements=1 << 22):
+    return max(1, max_elements // (max(front_size, 1) * n_objectives))
+
+
+def _dominance_order(values):
+    """
+    Order in which no point is dominated by a later one: by the sum of the objectives normalized to [0, 1]
+    (strong, dominating points first), ties broken lexicographically.
+    """
+    lower, upper = values.min(axis=0), values.max(axis=0)
+    normalized = (values - lower) / np.where(upper > lower, upper - lower, 1.0)
+    return np.lexsort(tuple(values.T[::-1]) + (normalized.sum(axis=1),))
+
+
+def non_dominated(objectives, block_size=4096):
+    """
+    Boolean mask of the non-dominated rows of an (n, m) array (all objectives minimized). Duplicated
+    non-dominated points are all kept; rows with NaN are never on the front.
+    """
+    objectives = np.asarray(objectives, dtype=np.float64)
+    n, m = objectives.shape
+    mask = np.zeros(n, dtype=bool)
+    finite = np.flatnonzero(np.all(np.isfinite(objectives), axis=1))
+    if not len(finite):
+        return mask
+    values = objectives[finite]
+    order = np.lexsort(tuple(values.T[::-1])) if m <= 2 else _dominance_order(values)
+    values = values[order]
+    # duplicates are adjacent after the sort, the front is searched among the unique rows
+    first = np.concatenate([[True], np.any(values[1:] != values[:-1], axis=1)])
+    duplicate_of = np.cumsum(first) - 1
+    values = values[first]
+    if m == 1:
+        keep = np.arange(len(values)) == 0
+    elif m == 2:
+        # sweep in lexicographic order: dominated when an earlier point has a second objective <= this one
+        best_before = np.minimum.accumulate(np.concatenate([[np.inf], values[:-1, 1]]))
+        keep = values[:, 1] < best_before
+    else:
+        # no point can be dominated by a later one, so the front found so far is final
+        keep = np.zeros(len(values), dtype=bool)
+        front = np.empty((0, m))
+        for start in range(0, len(values), block_size):
+            block = values[start:start + block_size]
+            survivors = np.flatnonzero(~_dominated_by(front, block))
+            candidates = block[survivors]
+            survivors = survivors[~_dominated_by(candidates, candidates)]
+            keep[start + survivors] = True
+            front = np.concatenate([front, block[survivors]])
+    # duplicates of a front point are on the front too
+    mask[finite[order]] = keep[duplicate_of]
+    return mask
+
+
+class ParetoFront:
+    """
+    Non-dominated set that grows by batches: insert() keeps the new points that no member dominates and drops
+    the members they dominate.
+
+    Args:
+        n_objectives: number of (minimized) objectives
+    """
+
+    def __init__(self, n_objectives):
+        self.objectives = np.empty((0, n_objectives))
+        self.data = None
+        self.inserted = 0
+
+    def __len__(self):
+        return len(self.objectives)
+
+    def insert(self, objectives, data=None):
+        """
+        Insert a batch of points, data is an optional DataFrame with one row per point (compositions, ...)
+        kept along with the front, given with every batch or with none. Returns the mask of the batch points that entered the front.
+        """
+        objectives = np.asarray(objectives, dtype=np.float64).reshape(-1, self.objectives.shape[1])
+        accepted = non_dominated(objectives)
+        candidates = np.flatnonzero(accepted)
+        accepted[candidates[_dominated_by(self.objectives, objectives[candidates])]] = False
+        stale = _dominated_by(objectives[accepted], self.objectives)
+        members = np.concatenate([self.objectives[~stale], objectives[accepted]])
+        # strongest members first, so that later insertions are rejected early
+        order = _dominance_order(members) if len(members) else np.zeros(0, dtype=np.int64)
+        self.objectives = members[order]
+        if data is not None:
+            rows = data.iloc[np.flatnonzero(accepted)]
+            if self.data is not None:
+                rows = pd.concat([self.data[~stale], rows], ignore_index=True)
+            self.data = rows.iloc[order].reset_index(drop=True)
+        self.inserted += len(objectives)
+        return accepted
+
+    def hypervolume(self, reference, samples=None, seed=0):
+        return hypervolume(self.objectives, reference, samples, seed)
+
+
+# ---- hypervolume ------#
+def _hypervolume_2d(points, reference):
+    points = points[np.all(points < reference, axis=1)]
+    if not len(points):
+        return 0.0
+    points = points[np.lexsort((points[:, 1], points[:, 0]))]
+    best = np.minimum.accumulate(points[:, 1])
+    steps = np.diff(np.concatenate([points[:, 0], [reference[0]]]))
+    return float(np.sum(steps * (reference[1] - best)))
+
+
+def _hypervolume_exact(points, reference):
+    points = points[np.all(points < reference, axis=1)]
+    if not len(points):
+        return 0.0
+    if points.shape[1] == 2:
+        return _hypervolume_2d(points, reference)
+    # sweep the last objective: between two consecutive values, the dominated region is the hypervolume of the
+    # points below in the remaining objectives
+    points = points[np.argsort(points[:, -1])]
+    levels = np.concatenate([points[:, -1], [reference[-1]]])
+    volume = 0.0
+    for row in range(len(points)):
+        thickness = levels[row + 1] - levels[row]
+        if thickness > 0:
+            below = points[:row + 1, :-1]
+            volume += thickness * _hypervolume_exact(below[non_dominated(below)], reference[:-1])
+    return volume
+
+
+def hypervolume(objectives, reference, samples=None, seed=0):
+    """
+    Hypervolume dominated by the (minimized) objectives up to the reference point.
+
+    The exact dimension sweep costs about n^(m-2) two-dimensional sweeps, fine for the few hundred points of an
+    NSGA front in four objectives. For larger fronts pass samples, the number of uniform Monte Carlo samples
+    in the box between the ideal point and the reference (standard error ~ volume / sqrt(samples)).
+    """
+    points = np.asarray(objectives, dtype=np.float64)
+    reference = np.asarray(reference, dtype=np.float64)
+    points = points[np.all(points < reference, axis=1)]
+    if not len(points):
+        return 0.0
+    points = points[non_dominated(points)]
+    if samples is None:
+        return _hypervolume_exact(points, reference)
+    rng = np.random.default_rng(seed)
+    ideal = points.min(axis=0)
+    box = float(np.prod(reference - ideal))
+    dominated = 0
+    batch = _block_size(len(points), points.shape[1])
+    for start in range(0, samples, batch):
+        sample = rng.uniform(ideal, reference, (min(batch, samples - start), len(reference)))
+        dominated += int(np.any(np.all(points[:, None, :] <= sample[None, :, :], axis=2), axis=0).sum())
+    return box * dominated / samples
+
+
+def compare_fronts(fronts, margin=0.1, samples=None):
+    """
+    Compare fronts given as {name: (n, m) minimized objectives}.
+
+    Every objective is normalized to [0, 1] between the ideal and nadir points of the union of the fronts, the
+    reference point is 1 + margin. Returns a DataFrame with the size, the normalized hypervolume and the
+    fraction of the points of every front dominated by the union of the other fronts.
+    """
+    fronts = {name: np.asarray(front, dtype=np.float64) for name, front in fronts.items()}
+    union = np.concatenate(list(fronts.values()))
+    ideal, nadir = union.min(axis=0), union.max(axis=0)
+    span = np.where(nadir > ideal, nadir - ideal, 1.0)
+    reference = np.full(union.shape[1], 1.0 + margin)
+    rows = []
+    for name, front in fronts.items():
+        normalized = (front - ideal) / span
+        others = [other for other_name, other in fronts.items() if other_name != name]
+        others = (np.concatenate(others) - ideal) / span if others else np.empty((0, union.shape[1]))
+        rows.append({"front": name, "points": len(front),
+                     "hypervolume": hypervolume(normalized, reference, samples),
+                     "dominated_by_others": float(_dominated_by(others, normalized).mean()) if len(front) else 0.0})
+    return pd.DataFrame(rows).set_index("front")
+
+
+def computed_front(data, objectives=OBJECTIVES, senses=SENSES):
+    """
+    Non-dominated rows of the computed data (ALL_data.csv layout).
+    """
+    return data[non_dominated(as_minimization(data, objectives, senses))].reset_index(drop=True)
+
+
+def sampled_front(surrogates, n_samples, model_name="RF", tabulated=False, batch_size=1 << 20, seed=0,
+                  objectives=OBJECTIVES, senses=SENSES):
+    """
+    Front of n_samples uniform random compositions inside the training bounds, predicted with the surrogate
+    and inserted batch by batch. Returns a DataFrame with the objectives and the compositions.
+    """
+    rng = np.random.default_rng(seed)
+    bundle = surrogates.bundle
+    front = ParetoFront(len(objectives))
+    for start in range(0, n_samples, batch_size):
+        compositions = rng.uniform(bundle["lower"], bundle["upper"], (min(batch_size, n_samples - start),
+                                                                      len(FEATURES)))
+        predicted = surrogates.predict(compositions, model_name, objectives, tabulated)
+        front.insert(predicted * senses, pd.DataFrame(compositions, columns=FEATURES))
+    result = pd.DataFrame(front.objectives * senses, columns=list(objectives))
+    for name in FEATURES:
+        result[name] = front.data[name].to_numpy()
+    return result
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from surrogate import SurrogateModels, load_data
+
+    parser = argparse.ArgumentParser(description="Pareto fronts of the computed data, NSGA fronts and surrogate "
+                                                 "samples, with their hypervolumes")
+    parser.add_argument("--data", default=DATA_PATH, help="computed data (ALL_data.csv)")
+    parser.add_argument("--fronts", nargs="*", default=[], help="front CSV files, e.g. pareto_front_nsga2.csv")
+    parser.add_argument("--surrogates", default=None, help="joblib file of surrogate.py, to sample a front")
+    parser.add_argument("--samples", type=int, default=1000000, help="surrogate-sampled compositions")
+    parser.add_argument("--model", default="RF")
+    parser.add_argument("--tabulated", action="store_true", help="use the interpolation table of the model")
+    parser.add_argument("--mc-samples", type=int, default=None, help="Monte Carlo hypervolume samples "
+                        "(exact by default)")
+    parser.add_argument("--output", default="pareto_front_computed.csv", help="CSV of the computed front")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    data = load_data(args.data)
+    computed = computed_front(data)
+    computed.to_csv(args.output, index=False)
+    print(f"computed front: {len(computed)} of {len(data)} points ({time.perf_counter() - start:.2f} s), "
+          f"saved to {args.output}")
+    fronts = {"computed": as_minimization(computed)}
+    for path in args.fronts:
+        fronts[path] = as_minimization(pd.read_csv(path))
+    if args.surrogates:
+        start = time.perf_counter()
+        sampled = sampled_front(SurrogateModels(args.surrogates), args.samples, args.model, args.tabulated)
+        print(f"surrogate front: {len(sampled)} of {args.samples} samples ({time.perf_counter() - start:.2f} s)")
+        fronts[f"{args.model} samples"] = as_minimization(sampled)
+    print(compare_fronts(fronts, samples=args.mc_samples).to_string())
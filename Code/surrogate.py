@@ -0,0 +1,164 @@
+"""
+Persisted DT/KNN/RF/AdaBoost surrogate models and a batched prediction API.
+
+The models are trained on ALL_data.csv (features Cr, Co, C in mass fraction) for HCS, GRF, SR, the M23C6
+phase fraction and the precipitation speed, and saved together with their feature scaling in one joblib
+file. SurrogateModels loads that file lazily on the first prediction.
+
+Predictions are made in large batches on the scaled NumPy array. For bulk queries (optimization, 3D views)
+a model can also be tabulated once on a fine regular grid over the training bounds; the prediction is then
+a vectorized trilinear interpolation, millions of compositions per second on one CPU core.
+"""
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import AdaBoostRegressor, RandomForestRegressor
+from sklearn.neighbors import KNeighborsRegressor
+from sklearn.preprocessing import StandardScaler
+from sklearn.tree import DecisionTreeRegressor
+
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ALL_data.csv")
+FEATURES = ["Cr", "Co", "C"]
+# short target name -> column of ALL_data.csv
+TARGETS = {"HCS": "HCS",
+           "GRF": "GRF",
+           "SR": "SR",
+           "M23C6": "M23C6#1",
+           "PSC": "Precipitation speed"}
+MODELS = {"DT": lambda seed: DecisionTreeRegressor(random_state=seed),
+          "KNN": lambda seed: KNeighborsRegressor(n_neighbors=5, weights="distance"),
+          "RF": lambda seed: RandomForestRegressor(n_estimators=100, random_state=seed, n_jobs=-1),
+          "AdaBoost": lambda seed: AdaBoostRegressor(DecisionTreeRegressor(max_depth=8), n_estimators=50,
+                                                     random_state=seed)}
+
+
+def load_data(path=DATA_PATH):
+    return pd.read_csv(path, encoding="utf-8-sig")
+
+
+def trilinear(table, lower, upper, x):
+    """
+    Trilinear interpolation of a regular (n1, n2, n3, k) table spanning [lower, upper] at the rows of x,
+    points outside the box are clamped to it. Returns an (n, k) array.
+    """
+    shape = np.array(table.shape[:3])
+    position = (np.asarray(x) - lower) / (upper - lower) * (shape - 1)
+    position = np.clip(position, 0, shape - 1)
+    base = np.minimum(position.astype(np.int64), shape - 2)
+    weight = position - base
+    flat_table = table.reshape(-1, table.shape[3])
+    stride = np.array([shape[1]*shape[2], shape[2], 1])
+    origin = base @ stride
+    output = np.zeros((len(origin), table.shape[3]))
+    # sum over the 8 corners of the cell, weighted by the opposite sub-volume
+    for corner in np.ndindex(2, 2, 2):
+        corner = np.array(corner)
+        corner_weight = np.prod(np.where(corner, weight, 1 - weight), axis=1)
+        output += flat_table[origin + corner @ stride] * corner_weight[:, None]
+    return output
+
+
+def train_surrogates(data=None, models=tuple(MODELS), targets=tuple(TARGETS), seed=42):
+    """
+    Fit every (model, target) pair on the full data set and return the bundle that save_surrogates writes.
+    """
+    if data is None:
+        data = load_data()
+    x = data[FEATURES].to_numpy(dtype=np.float64)
+    scaler = StandardScaler().fit(x)
+    x_scaled = scaler.transform(x)
+    fitted = {}
+    for model_name in models:
+        for target in targets:
+            model = MODELS[model_name](seed).fit(x_scaled, data[TARGETS[target]].to_numpy(dtype=np.float64))
+            fitted[(model_name, target)] = model
+    return {"features": FEATURES, "mean": scaler.mean_, "scale": scaler.scale_, "models": fitted,
+            "lower": x.min(axis=0), "upper": x.max(axis=0), "tables": {}}
+
+
+def tabulate(bundle, model_name, targets=tuple(TARGETS), resolution=(91, 51, 61)):
+    """
+    Evaluate a model once on a regular grid over the training bounds and keep the table in the bundle,
+    so SurrogateModels.predict(..., tabulated=True) only needs a trilinear interpolation.
+    """
+    axes = [np.linspace(low, high, n) for low, high, n in zip(bundle["lower"], bundle["upper"], resolution)]
+    grid = np.stack(np.meshgrid(*axes, indexing="ij"), axis=-1).reshape(-1, 3)
+    x_scaled = (grid - bundle["mean"]) / bundle["scale"]
+    table = np.stack([bundle["models"][(model_name, target)].predict(x_scaled) for target in targets], axis=-1)
+    bundle["tables"][model_name] = {"targets": list(targets), "table": table.reshape(*resolution, len(targets))}
+    return bundle
+
+
+def save_surrogates(bundle, path):
+    joblib.dump(bundle, path, compress=3)
+
+
+class SurrogateModels:
+    """
+    Lazily loaded surrogate bundle with a batched predict.
+
+    Args:
+        path: joblib file written by save_surrogates
+        batch_size: rows evaluated per vectorized step, bounds the temporary memory
+    """
+
+    def __init__(self, path, batch_size=262144):
+        self.path = path
+        self.batch_size = batch_size
+        self._bundle = None
+
+    @property
+    def bundle(self):
+        if self._bundle is None:
+            self._bundle = joblib.load(self.path)
+        return self._bundle
+
+    def available(self):
+        return sorted(self.bundle["models"])
+
+    def scale(self, compositions):
+        compositions = np.asarray(compositions, dtype=np.float64).reshape(-1, len(self.bundle["features"]))
+        return (compositions - self.bundle["mean"]) / self.bundle["scale"]
+
+    def predict(self, compositions, model_name="RF", targets=tuple(TARGETS), tabulated=False):
+        """
+        Predict the targets for an (n, 3) array of Cr, Co, C mass fractions.
+        Returns an (n, len(targets)) array in the order of `targets`.
+
+        tabulated=True interpolates the table stored by tabulate() (compositions are clamped to the training
+        bounds) instead of evaluating the model, which is much faster for large batches.
+        """
+        compositions = np.asarray(compositions, dtype=np.float64).reshape(-1, len(self.bundle["features"]))
+        output = np.empty((len(compositions), len(targets)))
+        if tabulated:
+            tabulated = self.bundle["tables"][model_name]
+            columns = [tabulated["targets"].index(target) for target in targets]
+            for start in range(0, len(compositions), self.batch_size):
+                batch = compositions[start:start + self.batch_size]
+                output[start:start + len(batch)] = trilinear(tabulated["table"][..., columns], self.bundle["lower"],
+                                                             self.bundle["upper"], batch)
+            return output
+        for start in range(0, len(compositions), self.batch_size):
+            batch = self.scale(compositions[start:start + self.batch_size])
+            for column, target in enumerate(targets):
+                output[start:start + len(batch), column] = self.bundle["models"][(model_name, target)].predict(batch)
+        return output
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Train the surrogate models on ALL_data.csv and save them")
+    parser.add_argument("output", nargs="?", default="surrogates.joblib", help="output joblib file")
+    parser.add_argument("--data", default=DATA_PATH, help="training data")
+    parser.add_argument("--models", nargs="+", default=list(MODELS), choices=list(MODELS))
+    parser.add_argument("--tabulate", action="store_true", help="also store interpolation tables")
+    args = parser.parse_args()
+    bundle = train_surrogates(load_data(args.data), args.models)
+    if args.tabulate:
+        for model_name in args.models:
+            tabulate(bundle, model_name)
+    save_surrogates(bundle, args.output)
@@ -0,0 +1,46 @@
+"""
+The tests of the surrogate, optimization and data set modules run on a small synthetic data set in the layout of
+ALL_data.csv, in a temporary working directory.
+"""
+import itertools
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def working_directory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def synthetic_rows(compositions, first_index=1):
+    """
+    Rows of ALL_data.csv with smooth synthetic values for an (n, 3) array of Cr, Co, C mass fractions.
+    """
+    Cr, Co, C = np.asarray(compositions, dtype=np.float64).T
+    return pd.DataFrame({"Index": np.arange(first_index, first_index + len(Cr)), "Cr": Cr, "Co": Co, "C": C,
+                         "Density": 7874 - 900 * Cr + 1100 * Co - 8000 * C,
+                         "BCC_A2#1": 0.9 - 2 * C, "BCC_A2#2": 0.05 + Co, "M23C6#1": 5.5 * C + 0.05 * Cr,
+                         "HCS": 1 + 10 * Cr - 5 * Co + 100 * C, "GRF": 5 + 2000 * C + 20 * Cr,
+                         "SR": 40 + 100 * Cr + 10000 * C, "Maximum nunmber density": 1e24 * (1 + 100 * C),
+                         "Precipitation speed": 1e20 * (1 + 100 * C + 5 * Co)})
+
+
+@pytest.fixture
+def data():
+    """
+    5 x 4 x 4 grid over the ranges of the sweeps.
+    """
+    grid = itertools.product(np.linspace(0.10, 0.145, 5), np.linspace(0.0, 0.05, 4), np.linspace(0.001, 0.004, 4))
+    return synthetic_rows(list(grid))
+
+
+@pytest.fixture
+def make_rows():
+    return synthetic_rows
@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from incremental_training import append_to_csv, merge_complete_rows, merge_rows, retrain, update_surrogates
+from surrogate import load_data
+
+
+TARGETS = ("HCS", "SR")
+
+
+def new_compositions(n, offset=0.0):
+    """
+    Compositions between the grid levels of the data fixture.
+    """
+    return np.column_stack([np.linspace(0.105, 0.14, n), np.full(n, 0.02 + offset), np.linspace(0.0015, 0.0035, n)])
+
+
+def test_merge_appends_new_and_replaces_known_compositions(data, make_rows):
+    known = data.iloc[[3, 10]].copy()
+    known["HCS"] = [-1.0, -2.0]
+    known["Index"] = [900, 901]  # the indices of the store are ignored
+    unknown = make_rows(new_compositions(3), first_index=1)
+    merged, n_appended, n_replaced = merge_rows(data, pd.concat([known, unknown]))
+
+    assert (n_appended, n_replaced) == (3, 2)
+    assert len(merged) == len(data) + 3
+    assert list(merged["Index"]) == list(data["Index"]) + [81, 82, 83]
+    assert list(merged["HCS"].iloc[[3, 10]]) == [-1.0, -2.0]
+    assert list(merged["Index"].iloc[[3, 10]]) == [4, 11]
+    np.testing.assert_allclose(merged[["Cr", "Co", "C"]].iloc[-3:], new_compositions(3))
+
+
+def test_missing_columns_are_nan_in_appended_rows_only(data, make_rows):
+    new_rows = pd.concat([data.iloc[[5]], make_rows(new_compositions(2))]).drop(columns=["Density"])
+    new_rows["HCS"] = 0.0
+    merged, n_appended, n_replaced = merge_rows(data, new_rows)
+
+    assert list(merged.columns) == list(data.columns)
+    assert merged["Density"].iloc[-2:].isna().all()
+    assert merged["Density"].iloc[5] == data["Density"].iloc[5]
+    assert merged["HCS"].iloc[5] == 0.0
+
+
+def test_incomplete_rows_are_skipped(data, make_rows):
+    new_rows = pd.concat([data.iloc[[5]], make_rows(new_compositions(2))])
+    new_rows = new_rows.drop(columns=["Precipitation speed"])
+    merged, n_appended, n_replaced, n_skipped = merge_complete_rows(data, new_rows)
+
+    # the known composition keeps its precipitation speed, the new ones would have none
+    assert (n_appended, n_replaced, n_skipped) == (0, 1, 2)
+    assert not merged.isna().any().any()
+    pd.testing.assert_frame_equal(merged, data)
+
+
+def test_append_to_csv(data, make_rows):
+    data.to_csv("ALL_data.csv", index=False, encoding="utf-8-sig")
+    merged, n_appended, _ = merge_rows(data, make_rows(new_compositions(3)))
+    append_to_csv(merged, n_appended, "ALL_data.csv")
+    pd.testing.assert_frame_equal(load_data("ALL_data.csv"), merged, check_dtype=False)
+
+    # replaced rows: the whole file is written again
+    replaced = data.iloc[[0]].copy()
+    replaced["SR"] = 1.0
+    merged, n_appended, _ = merge_rows(merged, replaced)
+    append_to_csv(merged, n_appended, "ALL_data.csv")
+    pd.testing.assert_frame_equal(load_data("ALL_data.csv"), merged, check_dtype=False)
+
+
+@pytest.fixture
+def bundle(data):
+    return retrain(data, targets=TARGETS)
+
+
+def test_update_actions(bundle, data, make_rows):
+    merged, _, _ = merge_rows(data, make_rows(new_compositions(8)))
+    n_trees = bundle["models"][("RF", "HCS")].n_estimators
+    bundle, actions = update_surrogates(bundle, merged, tolerance=10.0)
+
+    assert {key: action for key, action in actions.items() if key[0] in ("KNN", "RF")} == \
+        {("KNN", "HCS"): "inserted", ("KNN", "SR"): "inserted", ("RF", "HCS"): "warm_started",
+         ("RF", "SR"): "warm_started"}
+    assert bundle["models"][("RF", "HCS")].n_estimators > n_trees
+    assert bundle["n_samples"] == len(merged)
+    # HCS: the new points lie inside the data, DT and AdaBoost stay within 10 times their reference error.
+    # SR does not depend on Co, every test fold has an exact neighbour on the grid: zero reference error, but
+    # the new points lie between the Cr and C levels
+    assert {model_name: actions[(model_name, "HCS")] for model_name in ("DT", "AdaBoost")} == \
+        {"DT": "kept", "AdaBoost": "kept"}
+    assert {model_name: actions[(model_name, "SR")] for model_name in ("DT", "AdaBoost")} == \
+        {"DT": "retrained", "AdaBoost": "retrained"}
+
+    # nothing new
+    bundle, actions = update_surrogates(bundle, merged)
+    assert set(actions.values()) == {"unchanged"}
+
+
+def test_update_retrains_drifted_and_oversized_models(bundle, data, make_rows):
+    # other compositions with other values: every error exceeds the reference
+    far = make_rows(new_compositions(8, offset=0.02))
+    far[["HCS", "SR"]] *= 3
+    merged, _, _ = merge_rows(data, far)
+    bundle, actions = update_surrogates(bundle, merged, tolerance=0.0, max_trees=100)
+
+    assert {actions[(model_name, target)] for model_name in ("DT", "AdaBoost", "RF") for target in TARGETS} == \
+        {"retrained"}
+    assert bundle["models"][("RF", "HCS")].n_estimators == 100
+    assert set(bundle["reference_errors"]) == {(model_name, target) for model_name in ("DT", "AdaBoost")
+                                               for target in TARGETS}
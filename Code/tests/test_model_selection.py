@@ -0,0 +1,79 @@
+import os
+
+import joblib
+import numpy as np
+import pytest
+
+from model_selection import data_hash, fold_scores, job_key, prepare, run_selection, summarize
+from surrogate import FEATURES, TARGETS
+
+
+MODELS = ("DT", "KNN")
+GRIDS = {"DT": {"max_depth": [None, 4]}, "KNN": {"n_neighbors": [3, 5]}}
+SELECTED = ("HCS", "SR")
+
+
+def run(data, targets=SELECTED):
+    return run_selection(data, MODELS, targets, GRIDS, n_splits=3, cache_path="cache", processes=1)
+
+
+def test_job_key():
+    key = job_key("RF", "HCS", (("n_estimators", 100),), 0)
+    assert key.startswith("RF_HCS_0_") and key == job_key("RF", "HCS", (("n_estimators", 100),), 0)
+    # n_jobs does not change the fit
+    assert key == job_key("RF", "HCS", (("n_estimators", 100), ("n_jobs", 4)), 0)
+    others = [job_key("RF", "SR", (("n_estimators", 100),), 0), job_key("RF", "HCS", (("n_estimators", 300),), 0),
+              job_key("RF", "HCS", (("n_estimators", 100),), 1), job_key("RF", "HCS", (("n_estimators", 100),), 0, 7),
+              job_key("DT", "HCS", (), 0)]
+    assert len({key, *others}) == 6
+
+
+def test_cache_directory_of_a_target_only_depends_on_its_column(data):
+    _, folds, directories = prepare(data, "cache", SELECTED, n_splits=3)
+    assert sorted(np.concatenate(folds).tolist()) == list(range(len(data)))
+    features = data[FEATURES].to_numpy(dtype=np.float64)
+    assert directories["SR"] == os.path.join("cache", data_hash(features, data[TARGETS["SR"]].to_numpy(), folds))
+
+    # another subset of targets keeps the directories
+    assert prepare(data, "cache", ("SR", "GRF", "HCS"), n_splits=3)[2]["SR"] == directories["SR"]
+    changed = data.copy()
+    changed[TARGETS["SR"]] *= 2
+    changed_directories = prepare(changed, "cache", SELECTED, n_splits=3)[2]
+    assert changed_directories["HCS"] == directories["HCS"] and changed_directories["SR"] != directories["SR"]
+    # other folds, other data
+    assert prepare(data, "cache", SELECTED, n_splits=4)[2]["HCS"] != directories["HCS"]
+
+
+def test_run_selection_caches_the_folds(data):
+    paths, n_computed = run(data)
+    jobs = 2 * 2 * len(SELECTED) * 3
+    assert n_computed == jobs and len(set(paths)) == jobs and all(os.path.exists(path) for path in paths)
+    assert run(data) == (paths, 0)
+
+    # the cached predictions are those of the fold
+    result = joblib.load(paths[0])
+    np.testing.assert_array_equal(result["y"], data[TARGETS[result["target"]]].to_numpy()[result["test"]])
+    np.testing.assert_allclose(result["model"].predict(result["scaler"].transform(
+        data[FEATURES].to_numpy()[result["test"]])), result["prediction"])
+
+    # a subset of the targets is cached, a new target only trains its own jobs
+    assert run(data, ("SR",))[1] == 0
+    assert run(data, ("GRF",) + SELECTED)[1] == jobs // len(SELECTED)
+
+    # changing one target column only retrains that target
+    changed = data.copy()
+    changed[TARGETS["SR"]] += 1.0
+    changed_paths, n_computed = run(changed)
+    assert n_computed == jobs // len(SELECTED)
+    assert [path for path in changed_paths if "_HCS_" in path] == [path for path in paths if "_HCS_" in path]
+
+
+def test_summary(data):
+    paths, _ = run(data)
+    scores = fold_scores(paths)
+    assert len(scores) == len(paths) and set(scores["target"]) == set(SELECTED)
+    table, selected = summarize(scores)
+    assert len(table) == 2 * 2 * len(SELECTED) and len(selected) == len(MODELS) * len(SELECTED)
+    for _, row in selected.iterrows():
+        candidates = table[(table["model"] == row["model"]) & (table["target"] == row["target"])]
+        assert row["R2_mean"] == pytest.approx(candidates["R2_mean"].max())
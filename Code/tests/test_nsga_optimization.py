@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from nsga_optimization import OBJECTIVES, SENSES, AlloyDesignProblem, run_many, run_optimization
+from surrogate import FEATURES, SurrogateModels, save_surrogates, tabulate, train_surrogates
+
+
+@pytest.fixture
+def surrogates(data):
+    bundle = train_surrogates(data, ("DT", "KNN"))
+    tabulate(bundle, "KNN", resolution=(6, 5, 5))
+    save_surrogates(bundle, "surrogates.joblib")
+    return SurrogateModels("surrogates.joblib")
+
+
+@pytest.mark.parametrize("model_name, tabulated", [("DT", False), ("KNN", False), ("KNN", True)])
+def test_batch_evaluation_equals_row_evaluation(surrogates, model_name, tabulated):
+    problem = AlloyDesignProblem(surrogates, model_name, tabulated)
+    bundle = surrogates.bundle
+    x = np.random.default_rng(0).uniform(bundle["lower"], bundle["upper"], (64, len(FEATURES)))
+
+    batch = {}
+    problem._evaluate(x, batch)
+    rows = []
+    for row in x:
+        out = {}
+        problem._evaluate(row[None, :], out)
+        rows.append(out["F"][0])
+    assert batch["F"].shape == (64, len(OBJECTIVES))
+    np.testing.assert_allclose(batch["F"], np.array(rows))
+    # maximized objectives are negated for pymoo
+    np.testing.assert_allclose(batch["F"] * SENSES, surrogates.predict(x, model_name, OBJECTIVES, tabulated))
+    np.testing.assert_allclose(problem.evaluate(x, return_values_of=["F"]), batch["F"])
+
+
+@pytest.mark.parametrize("algorithm", ["NSGA2", "NSGA3"])
+def test_front_objectives_are_restored(surrogates, algorithm):
+    front = run_optimization(surrogates, algorithm, pop_size=12, n_gen=3, seed=1, n_partitions=2, model_name="DT")
+
+    assert list(front.columns) == list(OBJECTIVES) + FEATURES
+    compositions = front[FEATURES].to_numpy()
+    bundle = surrogates.bundle
+    assert np.all(compositions >= bundle["lower"] - 1e-12) and np.all(compositions <= bundle["upper"] + 1e-12)
+    np.testing.assert_allclose(front[list(OBJECTIVES)].to_numpy(), surrogates.predict(compositions, "DT", OBJECTIVES))
+
+
+def test_run_many_in_order(surrogates):
+    configs = [{"pop_size": 8, "n_gen": 2, "seed": seed, "model_name": "KNN"} for seed in (1, 2)]
+    fronts = run_many("surrogates.joblib", configs, processes=1)
+    for config, front in zip(configs, fronts):
+        expected = run_optimization(surrogates, **config)
+        np.testing.assert_allclose(front.to_numpy(), expected.to_numpy())
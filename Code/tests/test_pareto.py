@@ -0,0 +1,109 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pareto import ParetoFront, compare_fronts, hypervolume, non_dominated
+
+
+def brute_force_front(objectives):
+    objectives = np.asarray(objectives, dtype=np.float64)
+    finite = np.all(np.isfinite(objectives), axis=1)
+    mask = np.zeros(len(objectives), dtype=bool)
+    for i in np.flatnonzero(finite):
+        others = objectives[finite]
+        dominated = np.all(others <= objectives[i], axis=1) & np.any(others < objectives[i], axis=1)
+        mask[i] = not dominated.any()
+    return mask
+
+
+def sorted_rows(values):
+    values = np.asarray(values)
+    return values[np.lexsort(values.T[::-1])]
+
+
+@pytest.mark.parametrize("n_objectives", [1, 2, 3, 4])
+@pytest.mark.parametrize("integer", [False, True])
+def test_non_dominated_matches_brute_force(n_objectives, integer):
+    rng = np.random.default_rng(n_objectives)
+    # integer values give ties and duplicated points
+    objectives = rng.integers(0, 6, (300, n_objectives)).astype(float) if integer else \
+        rng.normal(size=(300, n_objectives))
+    objectives[::37] = np.nan
+    expected = brute_force_front(objectives)
+    np.testing.assert_array_equal(non_dominated(objectives), expected)
+    # several blocks
+    np.testing.assert_array_equal(non_dominated(objectives, block_size=16), expected)
+
+
+def test_anticorrelated_front():
+    # points on a simplex are all non-dominated
+    rng = np.random.default_rng(0)
+    objectives = rng.dirichlet(np.ones(4), 500)
+    assert non_dominated(objectives).all()
+    assert non_dominated(np.vstack([objectives, objectives.mean(axis=0) + 1])).sum() == 500
+
+
+@pytest.mark.parametrize("n_objectives", [2, 3, 4])
+def test_incremental_insert_matches_the_batch_front(n_objectives):
+    rng = np.random.default_rng(n_objectives)
+    objectives = rng.integers(0, 8, (400, n_objectives)).astype(float)
+    front = ParetoFront(n_objectives)
+    for batch in np.array_split(np.arange(len(objectives)), 7):
+        front.insert(objectives[batch], pd.DataFrame({"row": batch}))
+
+    assert front.inserted == len(objectives)
+    np.testing.assert_array_equal(sorted_rows(front.objectives),
+                                  sorted_rows(objectives[non_dominated(objectives)]))
+    # the data rows stay aligned with their objectives
+    np.testing.assert_array_equal(objectives[front.data["row"].to_numpy()], front.objectives)
+
+
+def test_insert_returns_the_accepted_points():
+    front = ParetoFront(2)
+    np.testing.assert_array_equal(front.insert([[1.0, 3.0], [3.0, 1.0], [3.0, 3.0]]), [True, True, False])
+    np.testing.assert_array_equal(front.insert([[0.5, 0.5], [2.0, 2.0]]), [True, False])
+    np.testing.assert_array_equal(front.objectives, [[0.5, 0.5]])
+
+
+def test_known_hypervolumes():
+    assert hypervolume([[1.0, 3.0], [2.0, 2.0], [3.0, 1.0]], [4.0, 4.0]) == pytest.approx(6.0)
+    assert hypervolume([[1.0, 1.0, 1.0]], [2.0, 3.0, 4.0]) == pytest.approx(6.0)
+    # two boxes of 4 and 2 overlapping in a unit cube
+    assert hypervolume([[0.0, 0.0, 1.0], [1.0, 1.0, 0.0]], [2.0, 2.0, 2.0]) == pytest.approx(5.0)
+    # dominated and out of reference points add nothing
+    assert hypervolume([[1.0, 1.0, 1.0], [1.5, 1.5, 1.5], [0.0, 0.0, 5.0]], [2.0, 3.0, 4.0]) == pytest.approx(6.0)
+    assert hypervolume([[5.0, 5.0]], [4.0, 4.0]) == 0.0
+
+
+def cell_count(points, reference):
+    """
+    Hypervolume of integer points by counting the unit cells whose lower corner some point dominates.
+    """
+    cells = np.array(list(itertools.product(*[range(int(bound)) for bound in reference])), dtype=float)
+    return int(np.any(np.all(points[:, None, :] <= cells[None, :, :], axis=2), axis=0).sum())
+
+
+@pytest.mark.parametrize("n_objectives", [2, 3, 4])
+def test_exact_hypervolume_matches_cell_count(n_objectives):
+    rng = np.random.default_rng(n_objectives)
+    points = rng.integers(0, 6, (40, n_objectives)).astype(float)
+    reference = np.full(n_objectives, 6.0)
+    assert hypervolume(points, reference) == pytest.approx(cell_count(points, reference))
+
+
+def test_monte_carlo_hypervolume():
+    rng = np.random.default_rng(1)
+    points = rng.dirichlet(np.ones(3), 50)
+    exact = hypervolume(points, [1.0, 1.0, 1.0])
+    assert hypervolume(points, [1.0, 1.0, 1.0], samples=200000) == pytest.approx(exact, rel=0.02)
+
+
+def test_compare_fronts():
+    better = np.array([[0.0, 1.0], [1.0, 0.0]])
+    worse = better + 0.5
+    table = compare_fronts({"better": better, "worse": worse})
+    assert table.loc["better", "dominated_by_others"] == 0.0
+    assert table.loc["worse", "dominated_by_others"] == 1.0
+    assert table.loc["better", "hypervolume"] > table.loc["worse", "hypervolume"]
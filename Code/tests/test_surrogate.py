@@ -0,0 +1,61 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from surrogate import FEATURES, SurrogateModels, save_surrogates, tabulate, train_surrogates, trilinear
+
+
+MODELS = ("DT", "KNN", "RF")
+
+
+@pytest.fixture
+def bundle(data):
+    return train_surrogates(data, MODELS)
+
+
+def test_trilinear_reproduces_multilinear_functions():
+    lower, upper = np.array([0.10, 0.0, 0.001]), np.array([0.145, 0.05, 0.004])
+    axes = [np.linspace(low, high, n) for low, high, n in zip(lower, upper, (5, 4, 6))]
+    grid = np.stack(np.meshgrid(*axes, indexing="ij"), axis=-1)
+
+    def function(x):
+        return np.stack([1 + 10 * x[..., 0] - 3 * x[..., 1] + 200 * x[..., 2],
+                         x[..., 0] * x[..., 1] * x[..., 2]], axis=-1)
+
+    queries = np.random.default_rng(0).uniform(lower, upper, (500, 3))
+    np.testing.assert_allclose(trilinear(function(grid), lower, upper, queries), function(queries), atol=1e-12)
+    # outside the box: clamped to it
+    np.testing.assert_allclose(trilinear(function(grid), lower, upper, [upper + 1]), function(upper[None, :]))
+
+
+@pytest.mark.parametrize("model_name", MODELS)
+def test_table_matches_the_model_on_its_nodes(bundle, model_name):
+    resolution = (4, 3, 5)
+    tabulate(bundle, model_name, ("HCS", "SR"), resolution)
+    save_surrogates(bundle, "surrogates.joblib")
+    surrogates = SurrogateModels("surrogates.joblib")
+    nodes = np.array(list(itertools.product(*[np.linspace(low, high, n) for low, high, n in
+                                              zip(bundle["lower"], bundle["upper"], resolution)])))
+
+    exact = surrogates.predict(nodes, model_name, ("SR", "HCS"))
+    np.testing.assert_allclose(surrogates.predict(nodes, model_name, ("SR", "HCS"), tabulated=True), exact,
+                               rtol=1e-10)
+
+
+def test_save_and_load(bundle, data):
+    save_surrogates(bundle, "surrogates.joblib")
+    surrogates = SurrogateModels("surrogates.joblib", batch_size=7)
+    assert surrogates._bundle is None
+    assert surrogates.available() == sorted((model_name, target) for model_name in MODELS
+                                            for target in ("HCS", "GRF", "SR", "M23C6", "PSC"))
+
+    x = data[FEATURES].to_numpy()
+    scaled = (x - bundle["mean"]) / bundle["scale"]
+    for model_name in MODELS:
+        expected = np.column_stack([bundle["models"][(model_name, target)].predict(scaled)
+                                    for target in ("PSC", "HCS")])
+        # batched in chunks of 7 rows
+        np.testing.assert_allclose(surrogates.predict(x, model_name, ("PSC", "HCS")), expected)
+    np.testing.assert_array_equal(surrogates.bundle["lower"], x.min(axis=0))
+    np.testing.assert_array_equal(surrogates.bundle["upper"], x.max(axis=0))
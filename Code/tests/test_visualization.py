@@ -0,0 +1,109 @@
+import base64
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from visualization import BinnedColumns, load_columns, pairwise_view, render_views, scatter3d_view
+
+
+def decode(spec):
+    values = np.frombuffer(base64.b64decode(spec["bdata"]), dtype=np.dtype(spec["dtype"]).newbyteorder("<"))
+    if "shape" in spec:
+        values = values.reshape([int(size) for size in spec["shape"].split(",")])
+    return values
+
+
+@pytest.fixture
+def columns():
+    rng = np.random.default_rng(0)
+    n = 20000
+    hcs = rng.normal(1.0, 0.2, n)
+    return {"HCS": hcs.astype(np.float32),
+            "GRF": (3.0 * hcs + rng.normal(0.0, 0.5, n)).astype(np.float32),
+            "SR": rng.uniform(20.0, 80.0, n).astype(np.float32),
+            "PSC": (10.0**rng.uniform(10.0, 16.0, n)).astype(np.float32)}
+
+
+@pytest.mark.parametrize("log", [(), ("PSC",)])
+def test_pairwise_binning_keeps_the_points(columns, log):
+    binned = BinnedColumns(columns, bins=50, log=log)
+    for name, values in columns.items():
+        # every point in a bin, the extreme values in the first and last one
+        assert binned.codes[name].min() == 0 and binned.codes[name].max() == 49
+        assert binned.edges[name][0] == pytest.approx(values.min(), rel=1e-5)
+        assert binned.edges[name][-1] == pytest.approx(values.max(), rel=1e-5)
+        centers = binned.centers(name)
+        assert np.all(np.diff(centers) > 0) and values.min() <= centers[0] and centers[-1] <= values.max()
+
+    counts, cells = binned.counts("GRF", "PSC")
+    assert counts.shape == (50, 50) and counts.sum() == len(binned)
+    np.testing.assert_array_equal(counts.reshape(-1), np.bincount(cells, minlength=2500))
+    np.testing.assert_array_equal(counts.sum(axis=0), np.bincount(binned.codes["GRF"], minlength=50))
+    np.testing.assert_array_equal(counts.sum(axis=1), np.bincount(binned.codes["PSC"], minlength=50))
+
+    positions = binned.sparse_points("GRF", "PSC", sparse=4)
+    assert np.all(counts.reshape(-1)[cells[positions]] <= 4)
+    assert len(positions) == np.sum(counts.reshape(-1)[cells] <= 4)
+
+
+def test_voxels_keep_the_points_and_ranges(columns):
+    binned = BinnedColumns(columns, bins=64)
+    means, counts = binned.voxels("SR", "HCS", "GRF", "PSC", bins=8)
+    assert counts.sum() == len(binned) and np.all(counts > 0) and len(counts) <= 8**3
+    for name, values in zip(("SR", "HCS", "GRF", "PSC"), means):
+        assert len(values) == len(counts)
+        tolerance = 1e-6 * np.abs(columns[name]).max()
+        assert np.all(values >= columns[name].min() - tolerance) and np.all(values <= columns[name].max() + tolerance)
+    # the weighted means of the voxels are the means of the columns
+    for name, values in zip(("SR", "HCS", "GRF"), means):
+        assert np.sum(values * counts) / len(binned) == pytest.approx(columns[name].mean(dtype=np.float64), rel=1e-5)
+
+
+def test_views_above_max_points(columns):
+    binned = BinnedColumns(columns, bins=50)
+    figure = pairwise_view(binned, "HCS", "SR", max_points=1000, sparse=2)
+    heatmap, points = figure["data"]
+    density = decode(heatmap["z"])
+    counts, _ = binned.counts("HCS", "SR")
+    assert density.shape == (50, 50)
+    np.testing.assert_allclose(np.nan_to_num(10.0**density), counts, rtol=1e-5)
+    x, y = decode(points["x"]), decode(points["y"])
+    assert len(x) == len(y) <= 1000
+    assert columns["HCS"].min() <= x.min() and x.max() <= columns["HCS"].max()
+    assert columns["SR"].min() <= y.min() and y.max() <= columns["SR"].max()
+
+    figure = scatter3d_view(binned, "SR", "HCS", "GRF", "PSC", bins=8, max_points=1000)
+    trace = figure["data"][0]
+    assert sum(int(text.split()[0]) for text in trace["text"]) == len(binned)
+    assert len(decode(trace["x"])) == len(trace["text"])
+
+    # below max_points every point is drawn
+    figure = pairwise_view(binned, "HCS", "SR", max_points=len(binned))
+    assert [trace["type"] for trace in figure["data"]] == ["scattergl"]
+    np.testing.assert_array_equal(decode(figure["data"][0]["x"]), columns["HCS"])
+
+
+def test_load_columns_drops_non_finite_rows():
+    # ALL_data.csv names
+    table = pd.DataFrame({"HCS": [1.0, np.nan, 3.0, 4.0], "GRF": [1.0, 2.0, np.inf, 4.0],
+                          "SR": [10.0, 20.0, 30.0, 40.0], "Precipitation speed": [1e12, 2e12, 3e12, 4e12]})
+    table.to_csv("data.csv", index=False)
+    table.to_parquet("data.parquet")
+    for path in ("data.csv", "data.parquet"):
+        columns = load_columns(path)
+        assert list(columns) == ["HCS", "GRF", "SR", "PSC"]
+        np.testing.assert_array_equal(columns["SR"], np.array([10.0, 40.0], dtype=np.float32))
+        assert all(values.dtype == np.float32 for values in columns.values())
+
+
+def test_render_views(columns):
+    pages = render_views(columns, "views", bins=20, bins_3d=4, max_points=500)
+    assert len(pages) == 7 and all(os.path.isfile(page) for page in pages)
+    assert os.path.isfile(os.path.join("views", "index.html"))
+    with open(pages[-1], encoding="utf-8") as file:
+        html = file.read()
+    data = json.loads(html.split('Plotly.newPlot("view", ')[1].split(", {")[0])
+    assert sum(int(text.split()[0]) for text in data[0]["text"]) == len(columns["HCS"])
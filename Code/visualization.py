@@ -0,0 +1,340 @@
+"""
+Interactive pairwise and 3D views of the alloy properties that stay responsive for millions of points.
+
+The Plotly exports in this directory ("3D scatter visualization.html", ../html/NSGA-*.html) embed plotly.js and
+every point as JSON text, several MB for a few thousand points. The views written here instead
+
+    - render with WebGL (scattergl, scatter3d) and load plotly.js once, from the CDN or one shared local copy
+    - are binned on the server: above max_points a pairwise view is a density heatmap of the counts, with the
+      points of the sparse bins (the fringe of the cloud, where the interesting alloys are) drawn individually,
+      and the 3D view draws one point per occupied voxel at the mean position and mean color of the voxel
+    - store the arrays base64-encoded as typed arrays ({"dtype": "f4", "bdata": ...}, plotly.js >= 2.28)
+
+Every column is binned once and all the views are built from these integer codes, so the data are read and
+binned in a single pass whatever the number of views. The pairwise views can also be saved as PNG from the same
+bins (the "<X> vs <Y>.png" images of this directory).
+"""
+import base64
+import itertools
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from surrogate import DATA_PATH, FEATURES, TARGETS
+
+
+OBJECTIVES = ("HCS", "GRF", "SR", "PSC")
+NAMES = {"HCS": "Hot Cracking Susceptibility",
+         "GRF": "Growth Restriction Factor",
+         "SR": "Solidification Range",
+         "PSC": "M23C6 Precipitation Speed",
+         "M23C6": "M23C6 Phase Fraction"}
+# axes (x, y, z) and color of the 3D view, as in "3D scatter visualization.html"
+VIEW_3D = ("SR", "HCS", "GRF", "PSC")
+PLOTLYJS_CDN = "https://cdn.plot.ly/plotly-2.35.2.min.js"
+
+
+def load_columns(path, columns=OBJECTIVES):
+    """
+    float32 arrays of the columns of a CSV or Parquet file (ALL_data.csv names or short names), rows with
+    non-finite values dropped.
+    """
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        header = pq.read_schema(path).names
+    else:
+        header = pd.read_csv(path, encoding="utf-8-sig", nrows=0).columns
+    names = [column if column in header else TARGETS[column] for column in columns]
+    if path.endswith(".parquet"):
+        table = pd.read_parquet(path, columns=names)
+    else:
+        table = pd.read_csv(path, encoding="utf-8-sig", usecols=names)
+    values = table[names].to_numpy(dtype=np.float32)
+    values = values[np.all(np.isfinite(values), axis=1)]
+    return {column: values[:, position] for position, column in enumerate(columns)}
+
+
+def sample_columns(surrogates, n_samples, model_name="RF", tabulated=True, columns=OBJECTIVES,
+                   batch_size=1 << 20, seed=0):
+    """
+    float32 predictions of the surrogate at n_samples uniform random compositions inside the training bounds.
+    """
+    rng = np.random.default_rng(seed)
+    bundle = surrogates.bundle
+    values = np.empty((n_samples, len(columns)), dtype=np.float32)
+    for start in range(0, n_samples, batch_size):
+        compositions = rng.uniform(bundle["lower"], bundle["upper"], (min(batch_size, n_samples - start),
+                                                                      len(FEATURES)))
+        values[start:start + len(compositions)] = surrogates.predict(compositions, model_name, columns, tabulated)
+    return {column: values[:, position] for position, column in enumerate(columns)}
+
+
+def typed_array(values, dtype="f4"):
+    """
+    Base64 typed array spec of plotly.js, 2D arrays (heatmap z) keep their shape.
+    """
+    values = np.ascontiguousarray(values, dtype=np.dtype(dtype).newbyteorder("<"))
+    spec = {"dtype": dtype, "bdata": base64.b64encode(values.tobytes()).decode("ascii")}
+    if values.ndim > 1:
+        spec["shape"] = ",".join(map(str, values.shape))
+    return spec
+
+
+# ---- binning ------#
+class BinnedColumns:
+    """
+    Every column cut once into `bins` equal-width bins over its range (log10 range for the columns in log).
+
+    Args:
+        columns: dictionary of equally long arrays
+        bins: bins per column of the pairwise views
+        log: columns binned and shown on a log scale
+    """
+
+    def __init__(self, columns, bins=200, log=()):
+        self.columns = columns
+        self.bins = bins
+        self.log = set(log)
+        self.codes, self.edges = {}, {}
+        for name, values in columns.items():
+            scaled = np.log10(np.maximum(values, np.finfo(np.float32).tiny)) if name in self.log else values
+            lower, upper = float(scaled.min()), float(scaled.max())
+            width = (upper - lower) / bins or 1.0
+            self.codes[name] = np.minimum(((scaled - lower) / width).astype(np.int32), bins - 1)
+            edges = lower + width * np.arange(bins + 1)
+            self.edges[name] = 10**edges if name in self.log else edges
+
+    def __len__(self):
+        return len(next(iter(self.columns.values())))
+
+    def centers(self, name):
+        edges = self.edges[name]
+        return np.sqrt(edges[1:] * edges[:-1]) if name in self.log else (edges[1:] + edges[:-1]) / 2
+
+    def counts(self, x, y):
+        """
+        (bins, bins) point counts of the pair, indexed [y bin, x bin], and the bin of every point.
+        """
+        cells = self.codes[y].astype(np.int64) * self.bins + self.codes[x]
+        return np.bincount(cells, minlength=self.bins**2).reshape(self.bins, self.bins), cells
+
+    def sparse_points(self, x, y, sparse=4, max_points=100000):
+        """
+        Positions of the points in bins with at most `sparse` points, thinned to max_points.
+        """
+        counts, cells = self.counts(x, y)
+        positions = np.flatnonzero(counts.reshape(-1)[cells] <= sparse)
+        if len(positions) > max_points:
+            positions = positions[np.linspace(0, len(positions) - 1, max_points).astype(np.int64)]
+        return positions
+
+    def voxels(self, x, y, z, color, bins):
+        """
+        Mean x, y, z, color and the count of every occupied voxel of a coarser (bins^3) grid.
+        """
+        factor = self.bins / bins
+        cells = np.zeros(len(self), dtype=np.int64)
+        for name in (x, y, z):
+            cells = cells * bins + (self.codes[name] / factor).astype(np.int64)
+        occupied, cells = np.unique(cells, return_inverse=True)
+        counts = np.bincount(cells.reshape(-1), minlength=len(occupied))
+        means = [np.bincount(cells.reshape(-1), weights=self.columns[name], minlength=len(occupied)) / counts
+                 for name in (x, y, z, color)]
+        return means, counts
+
+
+# ---- views ------#
+def _axis(name, log):
+    axis = {"title": {"text": NAMES.get(name, name)}}
+    if name in log:
+        axis["type"] = "log"
+    return axis
+
+
+def _front_trace(front, names, scene=False):
+    trace = {"type": "scatter3d" if scene else "scattergl", "mode": "markers", "name": "Pareto front",
+             "marker": {"color": "red", "size": 4 if scene else 6, "symbol": "diamond"}}
+    for axis, name in zip("xyz", names):
+        trace[axis] = typed_array(front[name])
+    return trace
+
+
+def pairwise_view(binned, x, y, max_points=100000, sparse=4, front=None):
+    """
+    Plotly figure (dictionary) of y against x: all points up to max_points, a density heatmap with the points
+    of the sparse bins beyond.
+    """
+    traces = []
+    if len(binned) <= max_points:
+        positions = np.arange(len(binned))
+        title = f"{NAMES.get(x, x)} vs {NAMES.get(y, y)} ({len(binned)} points)"
+    else:
+        counts, _ = binned.counts(x, y)
+        density = np.where(counts > 0, np.log10(np.maximum(counts, 1)), np.nan)
+        traces.append({"type": "heatmap", "name": "density", "x": typed_array(binned.centers(x)),
+                       "y": typed_array(binned.centers(y)), "z": typed_array(density), "colorscale": "Viridis",
+                       "colorbar": {"title": {"text": "log10 points"}}, "hoverongaps": False})
+        positions = binned.sparse_points(x, y, sparse, max_points)
+        title = (f"{NAMES.get(x, x)} vs {NAMES.get(y, y)} ({len(binned)} points, "
+                 f"{binned.bins}x{binned.bins} bins, {len(positions)} sparse points shown)")
+    traces.append({"type": "scattergl", "mode": "markers", "name": "points",
+                   "x": typed_array(binned.columns[x][positions]), "y": typed_array(binned.columns[y][positions]),
+                   "marker": {"size": 3, "color": "#636efa", "opacity": 0.6}})
+    if front is not None:
+        traces.append(_front_trace(front, (x, y)))
+    layout = {"title": {"text": title}, "xaxis": _axis(x, binned.log), "yaxis": _axis(y, binned.log),
+              "template": "plotly_white"}
+    return {"data": traces, "layout": layout}
+
+
+def scatter3d_view(binned, x, y, z, color, bins=48, max_points=100000, front=None):
+    """
+    Plotly figure (dictionary) of the 3D view: all points up to max_points, one point per occupied voxel beyond.
+    """
+    if len(binned) <= max_points:
+        values = [binned.columns[name] for name in (x, y, z, color)]
+        counts = None
+        title = f"3D Scatter Plot ({len(binned)} points)"
+    else:
+        values, counts = binned.voxels(x, y, z, color, bins)
+        title = f"3D Scatter Plot ({len(binned)} points, {len(counts)} occupied {bins}^3 voxels)"
+    marker = {"size": 2, "color": typed_array(np.log10(values[3]) if color in binned.log else values[3]),
+              "colorscale": "Viridis", "opacity": 0.8,
+              "colorbar": {"title": {"text": ("log10 " if color in binned.log else "") + color}}}
+    trace = {"type": "scatter3d", "mode": "markers", "name": "points", "x": typed_array(values[0]),
+             "y": typed_array(values[1]), "z": typed_array(values[2]), "marker": marker}
+    if counts is not None:
+        trace["text"] = [f"{count} points" for count in counts.tolist()]
+    traces = [trace]
+    if front is not None:
+        traces.append(_front_trace(front, (x, y, z), scene=True))
+    scene = {axis + "axis": _axis(name, binned.log) for axis, name in zip("xyz", (x, y, z))}
+    scene["camera"] = {"eye": {"x": 1.5, "y": 1.5, "z": 1.5}}
+    layout = {"title": {"text": title}, "scene": scene, "template": "plotly_white"}
+    return {"data": traces, "layout": layout}
+
+
+def write_html(figure, path, plotlyjs=PLOTLYJS_CDN):
+    """
+    Standalone HTML page of a figure, plotly.js loaded from plotlyjs (URL or path relative to the page).
+    """
+    title = figure["layout"]["title"]["text"]
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(f'<!DOCTYPE html>\n<html>\n<head>\n<meta charset="utf-8" />\n<title>{title}</title>\n'
+                   f'<script src="{plotlyjs}" charset="utf-8"></script>\n</head>\n<body>\n'
+                   f'<div id="view" style="width:100%;height:95vh;"></div>\n<script>\n'
+                   f'Plotly.newPlot("view", {json.dumps(figure["data"])}, {json.dumps(figure["layout"])}, '
+                   f'{{"responsive": true}});\n</script>\n</body>\n</html>\n')
+
+
+def save_png(binned, x, y, path, max_points=100000, sparse=4, front=None):
+    """
+    Matplotlib image of a pairwise view from the same bins.
+    """
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(8, 6))
+    if len(binned) <= max_points:
+        positions = np.arange(len(binned))
+    else:
+        counts, _ = binned.counts(x, y)
+        image = ax.pcolormesh(binned.edges[x], binned.edges[y], np.ma.masked_equal(counts, 0),
+                              norm="log", cmap="viridis")
+        fig.colorbar(image, ax=ax, label="points")
+        positions = binned.sparse_points(x, y, sparse, max_points)
+    ax.scatter(binned.columns[x][positions], binned.columns[y][positions], s=2, alpha=0.6)
+    if front is not None:
+        ax.scatter(front[x], front[y], s=12, c="red", marker="D", label="Pareto front")
+        ax.legend()
+    for name, set_scale in ((x, ax.set_xscale), (y, ax.set_yscale)):
+        if name in binned.log:
+            set_scale("log")
+    ax.set_xlabel(NAMES.get(x, x))
+    ax.set_ylabel(NAMES.get(y, y))
+    ax.set_title(f"{NAMES.get(x, x)} vs {NAMES.get(y, y)}")
+    fig.savefig(path, dpi=150, bbox_inches="tight")
+    plt.close(fig)
+
+
+def render_views(columns, output_dir, objectives=OBJECTIVES, view_3d=VIEW_3D, bins=200, bins_3d=48,
+                 max_points=100000, sparse=4, log=(), front=None, plotlyjs=PLOTLYJS_CDN, png=False):
+    """
+    Write all the pairwise views of the objectives, the 3D view and an index page into output_dir.
+
+    Args:
+        columns: dictionary of equally long arrays, e.g. from load_columns or sample_columns
+        front: optional dictionary of arrays (Pareto front) overlaid on every view
+        plotlyjs: CDN URL, or path of a local plotly.min.js copied once into output_dir
+        png: also save the pairwise views as PNG
+
+    Returns the paths of the pages written.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    if os.path.isfile(plotlyjs):
+        shutil.copyfile(plotlyjs, os.path.join(output_dir, os.path.basename(plotlyjs)))
+        plotlyjs = os.path.basename(plotlyjs)
+    if png:
+        import matplotlib
+        matplotlib.use("Agg")
+    binned = BinnedColumns(columns, bins, log)
+    pages = []
+    for x, y in itertools.combinations(objectives, 2):
+        name = f"{NAMES.get(x, x)} vs {NAMES.get(y, y)}"
+        write_html(pairwise_view(binned, x, y, max_points, sparse, front), os.path.join(output_dir, name + ".html"),
+                   plotlyjs)
+        pages.append(name + ".html")
+        if png:
+            save_png(binned, x, y, os.path.join(output_dir, name + ".png"), max_points, sparse, front)
+    if view_3d is not None:
+        write_html(scatter3d_view(binned, *view_3d, bins_3d, max_points, front),
+                   os.path.join(output_dir, "3D scatter visualization.html"), plotlyjs)
+        pages.append("3D scatter visualization.html")
+    with open(os.path.join(output_dir, "index.html"), "w", encoding="utf-8") as file:
+        links = "\n".join(f'<li><a href="{page}">{page[:-5]}</a></li>' for page in pages)
+        file.write(f'<!DOCTYPE html>\n<html>\n<head><meta charset="utf-8" /><title>Views</title></head>\n<body>\n'
+                   f'<p>{len(binned)} points</p>\n<ul>\n{links}\n</ul>\n</body>\n</html>\n')
+    return [os.path.join(output_dir, page) for page in pages]
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from surrogate import SurrogateModels
+
+    parser = argparse.ArgumentParser(description="WebGL pairwise and 3D views of the computed data or of "
+                                                 "surrogate-sampled compositions")
+    parser.add_argument("--data", default=DATA_PATH, help="CSV or Parquet data set (ALL_data.csv)")
+    parser.add_argument("--surrogates", default=None, help="joblib file of surrogate.py, views of surrogate "
+                        "samples instead of the data set")
+    parser.add_argument("--samples", type=int, default=1000000, help="surrogate-sampled compositions")
+    parser.add_argument("--model", default="RF")
+    parser.add_argument("--exact", action="store_true", help="evaluate the surrogate instead of its "
+                        "interpolation table")
+    parser.add_argument("--front", default=None, help="Pareto front CSV to overlay, e.g. pareto_front_nsga2.csv")
+    parser.add_argument("--output", default="views", help="output directory")
+    parser.add_argument("--bins", type=int, default=200, help="bins per axis of the pairwise density")
+    parser.add_argument("--bins-3d", type=int, default=48, help="voxels per axis of the 3D view")
+    parser.add_argument("--max-points", type=int, default=100000, help="points drawn individually")
+    parser.add_argument("--sparse", type=int, default=4, help="bins with at most this many points are drawn "
+                        "as points")
+    parser.add_argument("--log", nargs="*", default=[], help="columns on a log scale, e.g. PSC")
+    parser.add_argument("--plotlyjs", default=PLOTLYJS_CDN, help="plotly.js URL or local plotly.min.js")
+    parser.add_argument("--png", action="store_true", help="also save the pairwise views as PNG")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.surrogates:
+        columns = sample_columns(SurrogateModels(args.surrogates), args.samples, args.model, not args.exact)
+    else:
+        columns = load_columns(args.data)
+    print(f"{len(columns['HCS'])} points loaded ({time.perf_counter() - start:.2f} s)")
+    front = load_columns(args.front) if args.front else None
+    start = time.perf_counter()
+    pages = render_views(columns, args.output, bins=args.bins, bins_3d=args.bins_3d, max_points=args.max_points,
+                         sparse=args.sparse, log=args.log, front=front, plotlyjs=args.plotlyjs, png=args.png)
+    size = sum(os.path.getsize(page) for page in pages)
+    print(f"{len(pages)} views written to {args.output} ({size / 1e6:.2f} MB, {time.perf_counter() - start:.2f} s)")